@@ -1,8 +1,14 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-from parser import extract_metrics, extract_top_sql
-from rules import generate_recommendations
+from archives import UPLOAD_TYPES, index_report, is_archive
+from baseline import baseline_for, format_deviation, ingest, score_history
+from cache import cached_parse, content_hash, parse_many, parse_report, report_cache, report_digest
+from chartdata import TOP_SQL_BARS, TREND_POINTS, downsample, top_n
+from parser import METRIC_SECTIONS
+from profiling import Profile, active, stage
+from store import UNKNOWN_DB, default_store
+from rac import instance_recommendations, snapshot_rows
+from records import FIELD_INDEX, MetricBatch
+from rules import NO_ISSUES, generate_recommendations, severity
 from datetime import datetime
 import re
 
@@ -32,23 +38,197 @@ st.caption("Upload your Automatic Workload Repository (AWR) report for performan
 
 # File uploader
 with st.container():
-    st.subheader("📤 Upload AWR Report", divider='blue')
-    uploaded_file = st.file_uploader(
-        "Drag and drop your AWR HTML report here",
-        type=["html", "htm"],
-        accept_multiple_files=False,
-        help="Max file size: 200MB",
+    st.subheader("📤 Upload AWR Reports", divider='blue')
+    uploaded_files = st.file_uploader(
+        "Drag and drop your AWR reports (HTML or text) here",
+        type=UPLOAD_TYPES,
+        accept_multiple_files=True,
+        help="Max file size: 200MB per file. Reports may be gzip, xz or zstd compressed, "
+             "or bundled in a zip. Upload several reports to compare them",
         label_visibility="collapsed"
     )
 
+# Profiling switches; results appear in the Debugging Tools panel
+with st.sidebar:
+    st.subheader("🐞 Profiling")
+    profiling_enabled = st.checkbox("Record stage timings", help="Times each parsing, rules and chart stage")
+    profile_cprofile = st.checkbox("Capture cProfile", disabled=not profiling_enabled)
+    profile_memory = st.checkbox("Trace memory (tracemalloc)", disabled=not profiling_enabled)
+    profile_bypass_cache = st.checkbox("Re-parse (bypass cache)", disabled=not profiling_enabled)
+
+# Stop a profile left running by a rerun that raised
+if active() is not None:
+    active().stop()
+
+# Raw regexes shown in the Debugging Tools panel
+DEBUG_PATTERNS = {
+    "Buffer": r'Buffer\s+Hit\s+%\s*:\s*([\d.]+)',
+    "Idle": r'%Idle\s*([\d.]+)',
+}
+
+# Metrics in the multi-report comparison table, with their column titles
+COMPARISON_COLUMNS = {
+    'buffer_cache_hit_ratio': "Buffer Cache Hit %",
+    'library_hit_pct': "Library Cache Hit %",
+    'cpu_utilization_pct': "CPU Utilization %",
+    'physical_reads': "Physical Reads",
+    'user_calls': "User Calls",
+}
+
+
+def match_debug_patterns(data, name=None, member=None):
+    # Only the sections the metrics come from are searched
+    index = index_report(data, name, member, keep=METRIC_SECTIONS)
+    html_text = index.text(*METRIC_SECTIONS, header=True)
+    matches = {}
+    for name, pattern in DEBUG_PATTERNS.items():
+        match = re.search(pattern, html_text)
+        matches[name] = match.group(1) if match else None
+    return matches
+
+
+def show_recommendations(recs):
+    if recs:
+        for rec in recs:
+            if rec == NO_ISSUES:
+                st.success(rec, icon="✅")
+            elif severity(rec) == 'warning':
+                st.warning(rec, icon="⚠️")
+            else:
+                st.info(rec, icon="ℹ️")
+    else:
+        st.success("✅ No critical performance issues detected")
+
+
+def ingest_report(digest, parsed, source):
+    """
+    Store a parsed report and feed it to its instances' baselines. Returns
+    the baseline of the report's first row (the cluster row of a global
+    report) and the report's key in it, None if it could not be stored.
+    """
+    store = default_store()
+    # A global (RAC) report is stored as a cluster row plus one row per node;
+    # re-uploads are ignored by hash and snapshot
+    rows = snapshot_rows(parsed['metrics'], parsed['info'], parsed['instances'])
+    info = rows[0][0]
+    instance = info.get('instance') or ''
+    key = (info.get('snap_begin'), instance)
+    try:
+        ingest(store, digest, rows, source=source)
+    except ValueError as e:
+        # Still compared with the stored history, but kept out of it
+        st.warning(f"⚠️ {source} was not stored for Trends: {e}")
+        key = None
+    baseline = baseline_for(store, info.get('db_name') or UNKNOWN_DB, instance)
+    return baseline, key
+
+
+def trend_chart_data(store, db_name, metrics, start, end):
+    """
+    Long-format trend points, downsampled per metric and instance, and the
+    values that broke their rolling baseline.
+    """
+    import pandas as pd
+
+    history = store.load_batch(db_name, start=start, end=end)
+    trend_df = (history.to_frame(names=['Snap Begin', 'Instance'])[list(metrics)].reset_index()
+                .melt(id_vars=['Snap Begin', 'Instance'], var_name='Metric', value_name='Value'))
+    trend_df['Snap Begin'] = pd.to_datetime(trend_df['Snap Begin'])
+    trend_df = downsample(trend_df, 'Snap Begin', 'Value', by=['Metric', 'Instance'])
+
+    # Scored on the full history; only the (few) flagged values are kept
+    scores, outside = score_history(history, metrics, by=lambda key: key[1])
+    rows, cols = outside.nonzero()
+    flagged_df = pd.DataFrame({
+        'Snap Begin': [history.keys[r][0] for r in rows],
+        'Instance': [history.keys[r][1] for r in rows],
+        'Metric': [metrics[c] for c in cols],
+        'Value': history.values[rows, [FIELD_INDEX[metrics[c]] for c in cols]],
+        'Score': scores[rows, cols].round(2),
+    })
+    return trend_df, flagged_df
+
+
+uploaded_file = None
+report_member = None  # the report's name inside a zip upload
+if len(uploaded_files) == 1 and not is_archive(uploaded_files[0].name):
+    uploaded_file = uploaded_files[0]
+elif uploaded_files:
+    # Reports are parsed concurrently in worker processes; each card is drawn,
+    # in upload order, as soon as its report is ready instead of after the
+    # whole batch
+    st.subheader("📚 Uploaded Reports", divider='blue')
+    progress = st.progress(0.0, text=f"Parsing {len(uploaded_files)} files...")
+    # Metrics of every report, one row each, for the comparison table
+    comparison = MetricBatch(len(uploaded_files))
+    report_names = {}
+    reports = ((i, f.getvalue(), f.name) for i, f in enumerate(uploaded_files))
+    files_done = set()
+    for done, report in enumerate(parse_many(reports), 1):
+        # Archives hold an unknown number of reports, so progress is per file
+        files_done.add(report.key)
+        progress.progress(len(files_done) / len(uploaded_files),
+                          text=f"Parsed {done} reports from {len(files_done)} of "
+                               f"{len(uploaded_files)} files")
+        name = uploaded_files[report.key].name
+        if report.member is not None:
+            name = f"{name} › {report.member}"
+        if report.error:
+            st.error(f"❌ Could not parse {name}: {report.error}")
+            continue
+
+        metrics = report.result['metrics']
+        ingest_report(report.digest, report.result, name)
+        comparison.append(metrics, (report.key, report.member))
+        report_names[report.key, report.member] = name
+        with st.expander(f"📄 {name}"):
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Buffer Cache Hit %", f"{metrics.get('buffer_cache_hit_ratio', 0)}%")
+            col2.metric("Library Cache Hit %", f"{metrics.get('library_hit_pct', 0)}%")
+            col3.metric("CPU Utilization %", f"{metrics.get('cpu_utilization_pct', 0)}%")
+            show_recommendations(generate_recommendations(metrics))
+
+    if comparison:
+        import pandas as pd
+
+        keys = comparison.keys
+        positions = sorted(range(len(keys)), key=lambda i: (keys[i][0], keys[i][1] or ''))
+        order = [keys[i] for i in positions]
+        comparison_df = (comparison.to_frame()[list(COMPARISON_COLUMNS)].iloc[positions]
+                         .fillna(0).rename(columns=COMPARISON_COLUMNS))
+        comparison_df.index = pd.Index([report_names[k] for k in order], name="Report")
+        st.dataframe(comparison_df, use_container_width=True)
+        detail = st.selectbox("Show full analysis for", order,
+                              format_func=lambda k: report_names[k])
+        uploaded_file = uploaded_files[detail[0]]
+        report_member = detail[1]
+
 if uploaded_file is not None:
-    html_text = uploaded_file.read().decode("utf-8")
-    
-    
+    # Charting libraries are only loaded once there is something to chart
+    import pandas as pd
+    import plotly.express as px
+
+    profile = Profile(profile_cprofile, profile_memory).start() if profiling_enabled else None
+
+    # Parse results are cached by content hash, so reruns triggered by widget
+    # interactions don't parse the report again
+    with stage('read_upload'):
+        report_bytes = uploaded_file.getvalue()
+    with stage('hash'):
+        upload_hash = content_hash(report_bytes)
+        report_hash = report_digest(report_bytes, upload_hash, uploaded_file.name, report_member)
+    if profile is not None and profile_bypass_cache:
+        parsed = parse_report(report_bytes, uploaded_file.name, report_member)
+    else:
+        parsed = cached_parse(report_bytes, upload_hash, uploaded_file.name, report_member)
+    metrics = parsed['metrics']
+
+    # Keep the snapshot for the Trends view and the baseline
+    with stage('store_ingest'):
+        baseline, baseline_key = ingest_report(report_hash, parsed, uploaded_file.name)
 
     # Extract and show metrics
     with st.expander("📈 Extracted Metrics", expanded=True):
-        metrics = extract_metrics(html_text)
         
         # Add validation checks
         if metrics.get('buffer_cache_hit_ratio', 0) == 0 and metrics.get('physical_reads', 0) > 0:
@@ -72,29 +252,24 @@ if uploaded_file is not None:
             st.metric("User Calls", f"{metrics.get('user_calls', 0):,}")
 
         with st.expander("View all extracted metrics"):
-            st.json(metrics)
+            st.json(dict(metrics))
 
     # Debugging panel
     with st.expander("🐞 Debugging Tools", expanded=False):
         st.subheader("Pattern Matching Results")
         
-        # Buffer Cache Hit Ratio pattern
-        buffer_pattern = r'Buffer\s+Hit\s+%\s*:\s*([\d.]+)'
-        buffer_match = re.search(buffer_pattern, html_text)
-        st.code(f"Buffer Pattern: {buffer_pattern}")
-        st.write(f"Match Found: {bool(buffer_match)}")
-        if buffer_match:
-            st.write(f"Matched Value: {buffer_match.group(1)}")
-        
-        # CPU Idle pattern
-        idle_pattern = r'%Idle\s*([\d.]+)'
-        idle_match = re.search(idle_pattern, html_text)
-        st.code(f"Idle Pattern: {idle_pattern}")
-        st.write(f"Match Found: {bool(idle_match)}")
-        if idle_match:
-            st.write(f"Matched Value: {idle_match.group(1)}")
-        
-       
+        pattern_matches = report_cache.get_or_compute(
+            report_bytes, lambda data: match_debug_patterns(data, uploaded_file.name, report_member),
+            tag='debug-patterns', digest=report_hash)
+        for name, pattern in DEBUG_PATTERNS.items():
+            st.code(f"{name} Pattern: {pattern}")
+            st.write(f"Match Found: {pattern_matches[name] is not None}")
+            if pattern_matches[name] is not None:
+                st.write(f"Matched Value: {pattern_matches[name]}")
+
+        st.subheader("Stage Timings")
+        # Filled in once every stage below has run
+        profile_slot = st.empty()
 
     # Charts
     with st.container():
@@ -114,53 +289,69 @@ if uploaded_file is not None:
 
         tab1, tab2 = st.tabs(["Bar Chart", "Pie Chart"])
         with tab1:
-            fig = px.bar(df, x="Metric", y="Value", color="Value", 
-                         title="Database Metrics Overview",
-                         color_continuous_scale='Bluered')
+            with stage('plotly_figures'):
+                fig = px.bar(df, x="Metric", y="Value", color="Value", 
+                             title="Database Metrics Overview",
+                             color_continuous_scale='Bluered')
             st.plotly_chart(fig, use_container_width=True)
 
         with tab2:
             percent_metrics = {k: v for k, v in display_metrics.items() if 0 < v <= 100}
             if percent_metrics:
                 pie_df = pd.DataFrame(list(percent_metrics.items()), columns=["Metric", "Value"])
-                pie_fig = px.pie(pie_df, names="Metric", values="Value", hole=0.3, 
-                                title="Percentage Metrics")
+                with stage('plotly_figures'):
+                    pie_fig = px.pie(pie_df, names="Metric", values="Value", hole=0.3, 
+                                    title="Percentage Metrics")
                 st.plotly_chart(pie_fig, use_container_width=True)
             else:
                 st.warning("No percentage-based metrics found")
 
+    # Global (RAC) reports: one row per node; the metrics above are cluster-wide
+    instances = parsed.get('instances')
+    if instances is not None:
+        with st.container():
+            st.subheader("🖧 Cluster Instances", divider='blue')
+            st.caption("Metrics above are aggregated across all instances")
+            st.dataframe(instances, use_container_width=True)
+            show_recommendations(instance_recommendations(instances))
+
     # SQL Section
     with st.container():
         st.subheader("🧠 Top SQL Analysis", divider='blue')
-        top_sql = extract_top_sql(html_text)
+        top_sql = parsed['top_sql']
 
         if top_sql:
-            top_sql_df = pd.DataFrame(top_sql)
-            st.dataframe(top_sql_df.style.highlight_max(axis=0, color='#d4f1f9'), 
+            with stage('top_sql_frame'):
+                top_sql_df = top_sql.to_frame()
+            st.dataframe(top_sql_df.style.highlight_max(axis=0, subset=list(top_sql.NUMERIC_COLUMNS),
+                                                        color='#d4f1f9'),
                         use_container_width=True)
-            st.plotly_chart(
-                px.bar(top_sql_df, x="SQL ID", y="Executions", 
-                      color="Elapsed Time (s)", title="Top SQL Queries"),
-                use_container_width=True
-            )
+            # The chart shows the top statements and one bar for the rest
+            sql_chart_df = report_cache.get_or_compute(
+                top_sql, lambda top_sql: top_n(top_sql.to_frame(), "Executions"),
+                tag=f'top-sql-chart-{TOP_SQL_BARS}', digest=report_hash)
+            with stage('plotly_figures'):
+                sql_fig = px.bar(sql_chart_df, x=sql_chart_df.index, y="Executions",
+                                 color="Elapsed Time (s)", title="Top SQL Queries")
+            st.plotly_chart(sql_fig, use_container_width=True)
         else:
             st.warning("No Top SQL data found in the AWR report", icon="⚠️")
 
     # Recommendations
     with st.container():
         st.subheader("💡 Optimization Recommendations", divider='blue')
-        recs = generate_recommendations(metrics)
-
-        if recs:
-            for rec in recs:
-                if "Investigate" in rec or "High" in rec:
-                    st.warning(rec, icon="⚠️")
-                elif "Increase" in rec or "Tune" in rec:
-                    st.info(rec, icon="ℹ️")
-                else:
-                    st.success(rec, icon="✅")
-        else:
-            st.success("✅ No critical performance issues detected")
+        show_recommendations(generate_recommendations(metrics))
+
+        # Deviations from this database's own history, next to the fixed thresholds
+        with stage('baseline'):
+            deviations = baseline.deviations(metrics, baseline_key)
+        if deviations:
+            st.markdown("**Compared with this database's history**")
+            for deviation in deviations:
+                st.warning(format_deviation(deviation), icon="📐")
+        elif len(baseline) < baseline.min_history:
+            st.caption(f"📐 Baselines need {baseline.min_history} snapshots of this database; "
+                       f"{len(baseline)} stored so far.")
 
     # AI Assistant (Simple rule-based)
     with st.expander("🤖 Chat with AWR AI Agent"):
@@ -188,6 +379,69 @@ if uploaded_file is not None:
         if user_query:
             st.info(ai_agent(user_query, metrics))
 
+    # Profiling results for the Debugging Tools panel
+    with profile_slot.container():
+        if profile is None:
+            st.caption("Enable \"Record stage timings\" in the sidebar to profile this report.")
+        else:
+            profile.stop()
+            result = profile.to_dict()
+            st.metric("Total time", f"{result['total_seconds']:.3f}s")
+            st.dataframe(pd.DataFrame.from_dict(result['stages'], orient='index'),
+                         use_container_width=True)
+            st.json(result['counters'])
+            if result['memory']:
+                st.write(f"Peak traced memory: {result['memory']['peak_bytes'] / 1024 / 1024:.1f} MB")
+            if result['cprofile']:
+                st.code(result['cprofile'])
+            st.download_button("⬇️ Export profile (JSON)", profile.to_json(),
+                               file_name="awr_profile.json", mime="application/json")
+
+# Trends across every report ingested so far
+with st.container():
+    st.subheader("📈 Trends", divider='blue')
+    store = default_store()
+    databases = sorted({db_name for db_name, _ in store.databases()})
+
+    if not databases:
+        st.info("Upload AWR reports to build up snapshot history for trend analysis.")
+    else:
+        import pandas as pd
+        import plotly.express as px
+
+        col1, col2 = st.columns(2)
+        with col1:
+            trend_db = st.selectbox("Database", databases)
+        metric_names = [m for m in store.metric_names(trend_db) if m in FIELD_INDEX]
+        with col2:
+            trend_metrics = st.multiselect(
+                "Metrics", metric_names,
+                default=[m for m in ['buffer_cache_hit_ratio'] if m in metric_names])
+
+        first_snap, last_snap = store.snap_range(trend_db)
+        snap_range = st.date_input(
+            "Snapshot range",
+            (datetime.fromisoformat(first_snap).date(), datetime.fromisoformat(last_snap).date()))
+
+        if trend_metrics and len(snap_range) == 2:
+            start, end = f"{snap_range[0]} 00:00:00", f"{snap_range[1]} 23:59:59"
+            # Prepared once per selection until another report of the database is stored
+            chart_key = content_hash(repr((store.path, trend_db, tuple(trend_metrics), start, end,
+                                           store.revision(trend_db))).encode())
+            trend_df, flagged_df = report_cache.get_or_compute(
+                None, lambda _: trend_chart_data(store, trend_db, trend_metrics, start, end),
+                tag=f'trend-chart-{TREND_POINTS}', digest=chart_key)
+            fig = px.line(trend_df, x='Snap Begin', y='Value', color='Metric', line_dash='Instance',
+                          markers=True, title=f"{trend_db} metric trends")
+            st.plotly_chart(fig, use_container_width=True)
+
+            # Snapshots that broke the rolling baseline of the ones before them
+            if len(flagged_df):
+                st.markdown(f"**{len(flagged_df)} values outside their rolling baseline**")
+                st.dataframe(flagged_df, hide_index=True, use_container_width=True)
+        else:
+            st.caption("Select at least one metric and a start and end date.")
+
 # Toggle Developer Info
 if st.button("👨‍💻 Show Developer Info"):
     with st.container():
@@ -215,6 +469,8 @@ if st.button("👨‍💻 Show Developer Info"):
             st.markdown("---")
             st.subheader("📄 Report Info", divider="gray")
             st.caption(f"📎 Filename: `{uploaded_file.name}`")
+            if report_member is not None:
+                st.caption(f"🗂️ Archive member: `{report_member}`")
             st.caption(f"📦 Size: {round(uploaded_file.size / 1024 / 1024, 2)} MB")
         st.caption(f"📅 Analyzed on: {datetime.now().strftime('%Y-%m-%d %H:%M')}")
 
@@ -0,0 +1,161 @@
+"""
+Reading AWR reports stored compressed (``.gz``, ``.xz``, ``.zst``) or bundled
+in zip archives, without unpacking them to disk first.
+
+Data is decompressed as it is read and fed to SectionIndex.from_stream, which
+keeps only the sections asked for, so neither the archive nor the full
+decompressed report is ever materialised. Plain reports on disk are
+memory-mapped instead of read.
+"""
+import gzip
+import hashlib
+import io
+import lzma
+import os
+import zipfile
+from contextlib import contextmanager
+
+from sections import SectionIndex
+
+REPORT_EXTENSIONS = ('.html', '.htm', '.txt')
+COMPRESSION_EXTENSIONS = ('.gz', '.xz', '.zst')
+ARCHIVE_EXTENSIONS = ('.zip',)
+
+# For st.file_uploader's ``type``
+UPLOAD_TYPES = [ext.lstrip('.') for ext in
+                REPORT_EXTENSIONS + COMPRESSION_EXTENSIONS + ARCHIVE_EXTENSIONS]
+
+
+def is_report(name):
+    """True for report file names, compressed or not (``awrrpt_1.html.gz``, ``awrrpt_1.txt``)."""
+    name = name.lower()
+    for ext in COMPRESSION_EXTENSIONS:
+        if name.endswith(ext):
+            name = name[:-len(ext)]
+            break
+    return name.endswith(REPORT_EXTENSIONS)
+
+
+def is_archive(name):
+    return name.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def is_compressed(name):
+    return name.lower().endswith(COMPRESSION_EXTENSIONS + ARCHIVE_EXTENSIONS)
+
+
+def decompress(fileobj, name):
+    """Wrap a binary stream so reads return the decompressed bytes of ``name``."""
+    ext = os.path.splitext(name.lower())[1]
+    if ext == '.gz':
+        return gzip.GzipFile(fileobj=fileobj, mode='rb')
+    if ext == '.xz':
+        return lzma.LZMAFile(fileobj, mode='rb')
+    if ext == '.zst':
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("Reading .zst reports requires the zstandard package "
+                              "(pip install zstandard)") from None
+        return zstandard.ZstdDecompressor().stream_reader(fileobj, closefd=False)
+    return fileobj
+
+
+def archive_members(source, name=None):
+    """
+    Report members of a zip archive, in archive order, or ``[None]`` when
+    ``source`` is a single report. Only the archive's directory is read.
+    """
+    name = name or source
+    if not is_archive(name):
+        return [None]
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    with zipfile.ZipFile(source) as zf:
+        return [info.filename for info in zf.infolist()
+                if not info.is_dir() and is_report(info.filename)]
+
+
+@contextmanager
+def open_report(fileobj, name, member=None):
+    """Decompressed binary stream of a report file, or of ``member`` of an archive."""
+    if member is None:
+        stream = decompress(fileobj, name)
+        try:
+            yield stream
+        finally:
+            if stream is not fileobj:
+                stream.close()
+        return
+    with zipfile.ZipFile(fileobj) as zf, zf.open(member) as raw:
+        with decompress(raw, member) as stream:
+            yield stream
+
+
+@contextmanager
+def member_reader(source, name=None):
+    """
+    Function returning the raw bytes of a member of the zip archive bytes
+    ``source`` (still compressed if the member is, e.g. ``.html.gz``), or
+    ``source`` itself for member None. The archive is opened once.
+    """
+    if not is_archive(name or ''):
+        yield lambda member: source
+        return
+    with zipfile.ZipFile(io.BytesIO(source)) as zf:
+        yield zf.read
+
+
+class _HashingReader:
+    """Binary stream that feeds every byte read from it to ``hasher``."""
+
+    def __init__(self, stream, hasher):
+        self._stream = stream
+        self._hasher = hasher
+
+    def read(self, size=-1):
+        data = self._stream.read(size)
+        self._hasher.update(data)
+        return data
+
+
+def index_report(source, name=None, member=None, keep=None, hasher=None):
+    """
+    SectionIndex of one report. ``source`` is a path or the raw (possibly
+    compressed) bytes; ``name`` defaults to the path and selects the
+    decompressor. For compressed input only the header and the ``keep``
+    sections are retained (see SectionIndex.from_stream). ``hasher`` (e.g.
+    ``hashlib.sha256()``) is fed the report's decompressed bytes as they are
+    read, giving its ``report_hash`` without decompressing it again.
+    """
+    path = source if isinstance(source, (str, os.PathLike)) else None
+    name = os.fspath(name or path or '')
+    if not is_compressed(name):
+        index = SectionIndex.from_file(path) if path is not None else SectionIndex(source)
+        if hasher is not None:
+            hasher.update(index.buf)
+        return index
+    with open(path, 'rb') if path is not None else io.BytesIO(source) as fh:
+        with open_report(fh, name, member) as stream:
+            if hasher is not None:
+                stream = _HashingReader(stream, hasher)
+            return SectionIndex.from_stream(stream, keep=keep)
+
+
+def report_hash(source, name=None, member=None, chunk_size=1 << 20):
+    """
+    SHA-256 of one report's decompressed bytes, so a report hashes the same
+    whether it is stored plain, compressed or inside a zip. ``source``,
+    ``name`` and ``member`` are as for ``index_report``.
+    """
+    path = source if isinstance(source, (str, os.PathLike)) else None
+    name = os.fspath(name or path or '')
+    h = hashlib.sha256()
+    if path is None and not is_compressed(name):
+        h.update(source)
+        return h.hexdigest()
+    with open(path, 'rb') if path is not None else io.BytesIO(source) as fh:
+        with open_report(fh, name, member) as stream:
+            for chunk in iter(lambda: stream.read(chunk_size), b''):
+                h.update(chunk)
+    return h.hexdigest()
@@ -0,0 +1,278 @@
+"""
+Per-database baselines: flag snapshots that break their own recent history.
+
+The static thresholds in rules.py suit an average database; a metric that is
+normal for one system can be alarming for another. A Baseline keeps the last
+``window`` snapshots of one database in a ring buffer and scores a snapshot
+against the window's median and MAD (median absolute deviation), or its
+percentile band, for every metric in METRIC_FIELDS at once.
+"""
+import threading
+import warnings
+from collections import namedtuple
+
+from records import FIELD_INDEX, METRIC_FIELDS, MetricRecord
+from store import UNKNOWN_DB
+
+# Scales MAD to a standard deviation for normally distributed data
+MAD_SCALE = 1.4826
+# Keeps a metric that barely moves from flagging on rounding noise. A window
+# with no spread at all (e.g. always 0) has a zero scale: any other value
+# deviates, with an infinite score.
+RELATIVE_FLOOR = 0.01
+
+DEFAULT_WINDOW = 96 * 7  # a week of 15-minute snapshots
+DEFAULT_THRESHOLD = 3.5
+DEFAULT_MIN_HISTORY = 8
+METHODS = ('mad', 'percentile')
+
+Deviation = namedtuple('Deviation', ['metric', 'value', 'median', 'low', 'high', 'score'])
+
+
+def _values(metrics):
+    if isinstance(metrics, MetricRecord):
+        return metrics.values_tuple()
+    row = [float('nan')] * len(METRIC_FIELDS)
+    for name, value in metrics.items():
+        if name in FIELD_INDEX and isinstance(value, (int, float)) and not isinstance(value, bool):
+            row[FIELD_INDEX[name]] = float(value)
+    return row
+
+
+def _z(values, median, scale):
+    """``(values - median) / scale``: infinite where the scale is 0, but 0 at the median."""
+    import numpy as np
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = (values - median) / scale
+    return np.where((scale == 0) & (values == median), 0.0, z)
+
+
+def _stats(window, method, threshold, percentiles):
+    """Median, robust scale and (low, high) band of each column of ``window``."""
+    import numpy as np
+
+    with warnings.catch_warnings():
+        # Columns with no values at all give NaN, which is what we want
+        warnings.simplefilter('ignore', RuntimeWarning)
+        median = np.nanmedian(window, axis=0)
+        mad = np.nanmedian(np.abs(window - median), axis=0)
+        if method == 'percentile':
+            low, high = np.nanpercentile(window, percentiles, axis=0)
+    scale = np.maximum(MAD_SCALE * mad, RELATIVE_FLOOR * np.abs(median))
+    if method == 'mad':
+        low, high = median - threshold * scale, median + threshold * scale
+    count = np.count_nonzero(~np.isnan(window), axis=0)
+    return median, scale, low, high, count
+
+
+class Baseline:
+    """
+    Rolling baseline over the last ``window`` snapshots of one database.
+
+    ``update`` writes one row into the ring buffer, so the cost of keeping the
+    baseline current does not grow with the history. Scores are robust
+    z-scores, ``(value - median) / (1.4826 * MAD)``; a value deviates when it
+    falls outside the band, which is ``median ± threshold * scale`` for
+    ``method='mad'`` or the ``percentiles`` of the window for
+    ``method='percentile'``. Metrics with fewer than ``min_history`` values
+    in the window are not scored.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW, threshold=DEFAULT_THRESHOLD,
+                 min_history=DEFAULT_MIN_HISTORY, method='mad', percentiles=(5, 95)):
+        import numpy as np
+
+        if method not in METHODS:
+            raise ValueError(f"method must be one of {METHODS}, not {method!r}")
+        self.window = window
+        self.threshold = threshold
+        self.min_history = min_history
+        self.method = method
+        self.percentiles = percentiles
+        self._values = np.full((window, len(METRIC_FIELDS)), np.nan)
+        self._keys = [None] * window
+        self._next = 0
+        self._count = 0
+        self._cached = None
+
+    @classmethod
+    def from_batch(cls, batch, **kwargs):
+        """Baseline seeded with the last ``window`` rows of a records.MetricBatch."""
+        baseline = cls(**kwargs)
+        start = max(len(batch) - baseline.window, 0)
+        for i in range(start, len(batch)):
+            baseline._push(batch.values[i], batch.keys[i])
+        return baseline
+
+    def __len__(self):
+        return self._count
+
+    def _push(self, row, key):
+        self._values[self._next] = row
+        self._keys[self._next] = key
+        self._next = (self._next + 1) % self.window
+        self._count = min(self._count + 1, self.window)
+        self._cached = None
+
+    def update(self, metrics, key=None):
+        """Add one snapshot; the oldest drops out once the window is full."""
+        self._push(_values(metrics), key)
+
+    def _window_stats(self, exclude=None):
+        import numpy as np
+
+        if exclude is None or exclude not in self._keys[:self._count]:
+            if self._cached is None:
+                self._cached = _stats(self._values[:self._count], self.method,
+                                      self.threshold, self.percentiles)
+            return self._cached
+        rows = np.array([self._keys[i] != exclude for i in range(self._count)], dtype=bool)
+        return _stats(self._values[:self._count][rows], self.method, self.threshold, self.percentiles)
+
+    def score(self, metrics, key=None):
+        """
+        Robust z-score of every metric of one snapshot (NaN where it cannot be
+        scored), and a mask of the metrics outside their band. A window row
+        with the same ``key`` (the snapshot itself, stored earlier) is left
+        out of the baseline.
+        """
+        import numpy as np
+
+        values = np.asarray(_values(metrics))
+        median, scale, low, high, count = self._window_stats(key)
+        enough = count >= self.min_history
+        scores = np.where(enough, _z(values, median, scale), np.nan)
+        with np.errstate(invalid='ignore'):
+            outside = enough & ((values < low) | (values > high))
+        return scores, outside
+
+    def deviations(self, metrics, key=None):
+        """Deviation tuples for the metrics of a snapshot outside their band, largest first."""
+        values = _values(metrics)
+        scores, outside = self.score(metrics, key)
+        median, _, low, high, _ = self._window_stats(key)
+        found = [Deviation(METRIC_FIELDS[i], values[i], float(median[i]), float(low[i]),
+                           float(high[i]), float(scores[i]))
+                 for i in outside.nonzero()[0]]
+        return sorted(found, key=lambda d: -abs(d.score) if d.score == d.score else 0)
+
+
+def score_history(batch, metrics=METRIC_FIELDS, window=DEFAULT_WINDOW, threshold=DEFAULT_THRESHOLD,
+                  min_history=DEFAULT_MIN_HISTORY, chunk=128, by=None):
+    """
+    Score every snapshot of a MetricBatch against the ``window`` snapshots
+    before it (MAD method), vectorised over snapshots and metrics. Returns
+    ``(scores, outside)`` arrays of shape ``(len(batch), len(metrics))``;
+    the first rows, with less history, use what there is. ``by`` maps a row
+    key to its series (e.g. its instance); each series is scored against
+    its own history.
+    """
+    import numpy as np
+
+    values = batch.values[:, [FIELD_INDEX[m] for m in metrics]]
+    if by is None:
+        return _score_values(values, window, threshold, min_history, chunk)
+    series = {}
+    for i, key in enumerate(batch.keys):
+        series.setdefault(by(key), []).append(i)
+    scores = np.full(values.shape, np.nan)
+    outside = np.zeros(values.shape, dtype=bool)
+    for rows in series.values():
+        scores[rows], outside[rows] = _score_values(values[rows], window, threshold, min_history,
+                                                    chunk)
+    return scores, outside
+
+
+def _score_values(values, window, threshold, min_history, chunk):
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+
+    n, k = values.shape
+    scores = np.full((n, k), np.nan)
+    outside = np.zeros((n, k), dtype=bool)
+    # Pad with NaN rows so every snapshot has a full window of predecessors
+    padded = np.vstack([np.full((window, k), np.nan), values])
+    windows = sliding_window_view(padded, window, axis=0)  # (n + 1, k, window)
+    for start in range(0, n, chunk):
+        stop = min(start + chunk, n)
+        block = windows[start:stop].transpose(0, 2, 1)  # (rows, window, k)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            median = np.nanmedian(block, axis=1)
+            mad = np.nanmedian(np.abs(block - median[:, None, :]), axis=1)
+        scale = np.maximum(MAD_SCALE * mad, RELATIVE_FLOOR * np.abs(median))
+        enough = np.count_nonzero(~np.isnan(block), axis=1) >= min_history
+        z = np.where(enough, _z(values[start:stop], median, scale), np.nan)
+        scores[start:stop] = z
+        outside[start:stop] = enough & (np.abs(z) > threshold)
+    return scores, outside
+
+
+def format_deviation(deviation):
+    direction = 'above' if deviation.value > deviation.median else 'below'
+    return (f"📐 {deviation.metric} is {deviation.value:,.2f}, {direction} its baseline "
+            f"(median {deviation.median:,.2f}, usual {deviation.low:,.2f} to {deviation.high:,.2f}).")
+
+
+_baselines = {}  # (store path, db_name, instance) -> (Baseline, store revision)
+_seeding = {}  # (store path, db_name, instance) -> lock held while seeding or updating it
+_baselines_lock = threading.Lock()  # guards the two dicts only
+
+
+def _lock_for(key):
+    with _baselines_lock:
+        return _seeding.setdefault(key, threading.Lock())
+
+
+def _current(store, db_name, instance, revision, kwargs):
+    key = (store.path, db_name, instance)
+    with _lock_for(key):
+        with _baselines_lock:
+            entry = _baselines.get(key)
+        if entry is None or entry[1] != revision:
+            # Only the snapshots that fit in the window are read
+            window = kwargs.get('window', DEFAULT_WINDOW)
+            batch = store.load_batch(db_name, instance=instance, last=window)
+            entry = (Baseline.from_batch(batch, **kwargs), revision)
+            with _baselines_lock:
+                _baselines[key] = entry
+    return entry[0]
+
+
+def baseline_for(store, db_name, instance, **kwargs):
+    """
+    Process-wide Baseline of one instance of ``db_name``, seeded from
+    ``store``. It is seeded again whenever ``store.revision(db_name)``
+    changes, so reports stored by watch.py, batch runs or other processes
+    reach it; store reports through ``ingest`` to keep it current without
+    re-seeding.
+    """
+    return _current(store, db_name, instance, store.revision(db_name), kwargs)
+
+
+def ingest(store, content_hash, rows, source=None, **kwargs):
+    """
+    ``store.ingest_rows`` for the rows of one report of one database, also
+    feeding the stored rows to their baselines. When nothing else was stored
+    meanwhile, the database's baselines are marked current, so the next
+    ``baseline_for`` does not re-seed them. Returns the stored rows.
+    """
+    db_name = rows[0][0].get('db_name') or UNKNOWN_DB
+    before = store.revision(db_name)
+    # Seeded before the rows are stored, so update doesn't count them twice
+    baselines = {info.get('instance') or '': _current(
+        store, db_name, info.get('instance') or '', before, kwargs) for info, _ in rows}
+    stored = store.ingest_rows(content_hash, rows, source=source)
+    for info, metrics in stored:
+        instance = info.get('instance') or ''
+        with _lock_for((store.path, db_name, instance)):
+            baselines[instance].update(metrics, (info.get('snap_begin'), instance))
+    after = store.revision(db_name)
+    # Another writer in between leaves the count off, and the baselines stale
+    if after[0] == before[0] + len(stored):
+        with _baselines_lock:
+            for key, (baseline, revision) in _baselines.items():
+                if key[:2] == (store.path, db_name) and revision == before:
+                    _baselines[key] = (baseline, after)
+    return stored
@@ -0,0 +1,184 @@
+"""
+Headless batch analysis of AWR reports.
+
+    python batch.py reports/ -o fleet.csv --workers 8
+    python batch.py "archive/**/awrrpt_*.html.gz" -o fleet.jsonl
+
+Reports may be HTML or text (awrrpt_*.txt), and may be gzip, xz or zstd
+compressed or bundled in zip archives; they are decompressed as a stream
+while parsing (see archives.py). Each report is parsed in a worker process
+(BeautifulSoup/HTML tokenizing is CPU-bound, so threads would not help) and
+becomes one output row with its metrics and recommendations. A report that
+fails to parse yields a row with its error instead of stopping the run.
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+
+from archives import archive_members, index_report, is_archive, is_report
+from parser import METRIC_SECTIONS, extract_metrics_indexed
+from rac import (INSTANCE_COLUMNS, INSTANCES_SECTION, cluster_aggregates, extract_instance_metrics,
+                 instance_recommendations)
+from rules import generate_recommendations
+
+# Sections analyze_file reads, including the per-instance ones of global reports
+BATCH_SECTIONS = METRIC_SECTIONS + (INSTANCES_SECTION,) + tuple(INSTANCE_COLUMNS)
+
+OUTPUT_FORMATS = ('csv', 'parquet', 'jsonl')
+
+
+def find_reports(inputs):
+    """Expand directories and glob patterns into a sorted list of report paths."""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                paths.extend(os.path.join(root, f) for f in files
+                             if is_report(f) or is_archive(f))
+        else:
+            paths.extend(p for p in glob.glob(item, recursive=True) if os.path.isfile(p))
+    return sorted(set(paths))
+
+
+def analyze_index(index):
+    """
+    Metrics, recommendations and the per-instance frame (None for a single
+    instance) of an indexed report. For a global (RAC) report the metrics are
+    the cluster-wide aggregates and the recommendations include each node's.
+    """
+    metrics = extract_metrics_indexed(index)
+    recs = []
+    instances = extract_instance_metrics(index)
+    if instances is not None:
+        metrics.update(cluster_aggregates(instances))
+        recs = instance_recommendations(instances)
+    return metrics, generate_recommendations(metrics) + recs, instances
+
+
+def analyze_file(path, member=None):
+    """
+    Parse one report (or ``member`` of a zip archive) into an output row;
+    errors are returned, not raised.
+    """
+    row = {'file': path, 'member': member, 'size_bytes': os.path.getsize(path), 'error': None}
+    start = time.perf_counter()
+    try:
+        metrics, recs, instances = analyze_index(index_report(path, member=member, keep=BATCH_SECTIONS))
+        if instances is not None:
+            row['instances'] = len(instances)
+        row.update(metrics)
+        row['recommendations'] = ' | '.join(recs)
+    except Exception as e:
+        row['error'] = f"{type(e).__name__}: {e}"
+    row['parse_seconds'] = round(time.perf_counter() - start, 4)
+    return row
+
+
+def expand_archives(paths):
+    """``(path, member)`` for every report, one per member of each zip archive."""
+    tasks = []
+    for path in paths:
+        try:
+            tasks.extend((path, member) for member in archive_members(path))
+        except Exception:
+            tasks.append((path, None))  # analyze_file reports the error
+    return tasks
+
+
+def run_batch(paths, workers=None, progress=None):
+    """Analyse ``paths`` over a process pool and return the rows in input order."""
+    # Imported here to keep `import batch` cheap for callers that only need
+    # find_reports or analyze_file
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    tasks = expand_archives(paths)
+    order = {task: i for i, task in enumerate(tasks)}
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(analyze_file, *task): task for task in tasks}
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                row = future.result()
+            except Exception as e:
+                # The worker itself died (e.g. killed for memory); keep going
+                path, member = futures[future]
+                row = {'file': path, 'member': member, 'error': f"{type(e).__name__}: {e}"}
+            rows.append(row)
+            if progress:
+                progress(done, len(tasks), row)
+    rows.sort(key=lambda r: order[r['file'], r['member']])
+    return rows
+
+
+def _columns(rows):
+    columns = []
+    for row in rows:
+        for key in row:
+            if key not in columns:
+                columns.append(key)
+    return columns
+
+
+def write_rows(rows, output, fmt):
+    if fmt == 'jsonl':
+        with open(output, 'w', encoding='utf-8') as fh:
+            for row in rows:
+                fh.write(json.dumps(row) + '\n')
+    elif fmt == 'csv':
+        with open(output, 'w', newline='', encoding='utf-8') as fh:
+            writer = csv.DictWriter(fh, fieldnames=_columns(rows))
+            writer.writeheader()
+            writer.writerows(rows)
+    elif fmt == 'parquet':
+        import pandas as pd
+        pd.DataFrame(rows, columns=_columns(rows)).to_parquet(output, index=False)
+    else:
+        raise ValueError(f"Unsupported output format: {fmt}")
+
+
+def _print_progress(done, total, row):
+    status = 'ERROR ' + row['error'] if row.get('error') else 'ok'
+    name = row['file'] if row.get('member') is None else f"{row['file']}:{row['member']}"
+    print(f"[{done}/{total}] {name} {status} ({row.get('parse_seconds', 0)}s)",
+          file=sys.stderr)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Parse a directory or glob of AWR reports in parallel.")
+    ap.add_argument('inputs', nargs='+', help="Report directories, files or glob patterns")
+    ap.add_argument('-o', '--output', required=True, help="Output file (.csv, .parquet or .jsonl)")
+    ap.add_argument('-f', '--format', choices=OUTPUT_FORMATS,
+                    help="Output format; defaults to the output file extension")
+    ap.add_argument('-w', '--workers', type=int, default=os.cpu_count(),
+                    help="Worker processes (default: CPU count)")
+    ap.add_argument('-q', '--quiet', action='store_true', help="Don't print per-file progress")
+    args = ap.parse_args(argv)
+
+    fmt = args.format or os.path.splitext(args.output)[1].lstrip('.').lower()
+    if fmt not in OUTPUT_FORMATS:
+        ap.error(f"Cannot infer output format from {args.output!r}; use --format")
+
+    paths = find_reports(args.inputs)
+    if not paths:
+        ap.error("No AWR reports found")
+
+    start = time.perf_counter()
+    rows = run_batch(paths, args.workers, None if args.quiet else _print_progress)
+    elapsed = time.perf_counter() - start
+    write_rows(rows, args.output, fmt)
+
+    failed = sum(1 for r in rows if r.get('error'))
+    total_mb = sum(r.get('size_bytes', 0) for r in rows) / 1024 / 1024
+    print(f"Parsed {len(rows) - failed}/{len(rows)} reports ({failed} failed), "
+          f"{total_mb:.1f} MB in {elapsed:.2f}s with {args.workers} workers: "
+          f"{len(rows) / elapsed:.2f} reports/s, {total_mb / elapsed:.2f} MB/s",
+          file=sys.stderr)
+    return 1 if failed == len(rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+Measure the import cost of the analysis modules.
+
+    python bench/import_time.py
+    python bench/import_time.py --budget-ms 100 --out imports.json
+
+Each module is imported in a fresh interpreter with ``-X importtime``; the
+cumulative time of the module itself and its heaviest dependencies are
+reported. With ``--budget-ms`` the exit status is non-zero when any module
+exceeds the budget, so CI can catch a heavy import creeping back in.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The Streamlit-free core: everything a batch job or CLI needs
+CORE_MODULES = ('profiling', 'sections', 'archives', 'parser', 'rules', 'rac', 'records', 'baseline',
+                'chartdata', 'cache', 'store', 'batch', 'watch')
+
+
+def measure_import(module, top=5):
+    """Import ``module`` in a fresh interpreter and return its timings."""
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                         cwd=ROOT, capture_output=True, text=True, check=True)
+    wall_ms = (time.perf_counter() - start) * 1000
+
+    entries = []
+    for line in out.stderr.splitlines():
+        if not line.startswith('import time:') or line.count('|') != 2:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        entries.append((len(name) - len(name.lstrip()) - 1, name.strip(), int(cumulative)))
+
+    # -X importtime prints a module's dependencies just before it, indented
+    # deeper; anything earlier at the top level (site, .pth hooks) is not ours.
+    total_us = None
+    deps = []
+    for i in range(len(entries) - 1, -1, -1):
+        depth, name, cumulative = entries[i]
+        if depth == 0 and name == module:
+            total_us = cumulative
+            j = i - 1
+            while j >= 0 and entries[j][0] > 0:
+                deps.append((entries[j][2], entries[j][1]))
+                j -= 1
+            break
+    deps.sort(reverse=True)
+    return {
+        'module': module,
+        'import_ms': total_us / 1000 if total_us is not None else None,
+        'interpreter_wall_ms': wall_ms,
+        'heaviest': [{'module': name, 'ms': us / 1000} for us, name in deps[:top]],
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Measure import time of the analysis modules.")
+    ap.add_argument('modules', nargs='*', default=CORE_MODULES)
+    ap.add_argument('--budget-ms', type=float, help="Fail if any module takes longer to import")
+    ap.add_argument('--out', help="Write results as JSON to this file")
+    args = ap.parse_args(argv)
+
+    results = [measure_import(m) for m in args.modules]
+    for r in results:
+        heaviest = ', '.join(f"{d['module']} {d['ms']:.1f}" for d in r['heaviest'][:3])
+        print(f"{r['module']:<12} {r['import_ms']:8.1f} ms import  "
+              f"{r['interpreter_wall_ms']:8.1f} ms process  ({heaviest})")
+    if args.out:
+        with open(args.out, 'w') as fh:
+            json.dump(results, fh, indent=2)
+
+    if args.budget_ms is not None:
+        over = [r['module'] for r in results if r['import_ms'] > args.budget_ms]
+        if over:
+            print(f"Over the {args.budget_ms} ms budget: {', '.join(over)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
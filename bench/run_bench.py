@@ -0,0 +1,174 @@
+"""
+Benchmark the AWR parser and rule engine on synthetic reports.
+
+    python bench/run_bench.py --sizes 1 10 100 --out results.json
+    python bench/run_bench.py --sizes 1 10 --compare results.json
+
+Every measurement runs in a fresh subprocess so peak RSS belongs to that case
+alone. Results are written as JSON so runs can be compared for regressions.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from synth_awr import write_report  # noqa: E402
+
+CASES = ('extract_metrics', 'extract_metrics_stream', 'extract_metrics_indexed', 'extract_metrics_text',
+         'extract_top_sql', 'generate_recommendations')
+# Cases that read the text-format report with the same data
+TEXT_CASES = ('extract_metrics_text',)
+DEFAULT_SIZES = (1, 10, 50, 100, 500)
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def run_case(case, path, repeat):
+    """Time one case in this process and return its measurements."""
+    import parser
+    import rules
+    from sections import SectionIndex
+
+    import_rss = _peak_rss_mb()
+    if case == 'extract_metrics_stream':
+        start = time.perf_counter()
+        parser.extract_metrics_stream(path)
+        wall = time.perf_counter() - start
+    elif case == 'extract_metrics_indexed':
+        start = time.perf_counter()
+        parser.extract_metrics_indexed(SectionIndex.from_file(path))
+        wall = time.perf_counter() - start
+    elif case == 'generate_recommendations':
+        metrics = parser.extract_metrics_stream(path)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            rules.generate_recommendations(metrics)
+        wall = (time.perf_counter() - start) / repeat
+    else:
+        with open(path, encoding='utf-8') as fh:
+            html_text = fh.read()
+        func = getattr(parser, case)
+        start = time.perf_counter()
+        func(html_text)
+        wall = time.perf_counter() - start
+    return {'wall_s': wall, 'peak_rss_mb': _peak_rss_mb(), 'import_rss_mb': import_rss}
+
+
+def count_rows(path):
+    rows = 0
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b''):
+            rows += chunk.count(b'<tr')
+    return rows
+
+
+def measure(case, path, repeat):
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--worker', case, path, '--repeat', str(repeat)],
+        capture_output=True, text=True, check=True)
+    return json.loads(out.stdout)
+
+
+def ensure_report(workdir, size_mb, sql_rows, fmt='html'):
+    ext = 'txt' if fmt == 'text' else 'html'
+    path = os.path.join(workdir, f'awr_synth_{size_mb}mb_{sql_rows}sql.{ext}')
+    if not os.path.exists(path):
+        write_report(path, size_mb=size_mb, n_sql=sql_rows, fmt=fmt)
+    return path
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline):
+    """Print the wall-time and RSS change of each case against a previous run."""
+    old = {(r['case'], r['size_mb']): r for r in baseline['results']}
+    for r in results:
+        prev = old.get((r['case'], r['size_mb']))
+        if prev is None:
+            continue
+        wall = (r['wall_s'] / prev['wall_s'] - 1) * 100 if prev['wall_s'] else 0.0
+        rss = (r['peak_rss_mb'] / prev['peak_rss_mb'] - 1) * 100 if prev['peak_rss_mb'] else 0.0
+        print(f"{r['case']:<26} {r['size_mb']:>6} MB  wall {wall:+7.1f}%  rss {rss:+7.1f}%")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark AWR parsing on synthetic reports.")
+    ap.add_argument('--sizes', type=float, nargs='+', default=DEFAULT_SIZES, help="Report sizes in MB")
+    ap.add_argument('--cases', nargs='+', choices=CASES, default=CASES)
+    ap.add_argument('--sql-rows', type=int, default=1000, help="Rows per SQL ordered by section")
+    ap.add_argument('--repeat', type=int, default=1000,
+                    help="Calls averaged for generate_recommendations")
+    ap.add_argument('--workdir', default=os.path.join(HERE, '.reports'),
+                    help="Where generated reports are kept between runs")
+    ap.add_argument('--out', help="Write results as JSON to this file")
+    ap.add_argument('--compare', help="Previous JSON results to compare against")
+    ap.add_argument('--worker', nargs=2, metavar=('CASE', 'PATH'), help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+
+    if args.worker:
+        case, path = args.worker
+        print(json.dumps(run_case(case, path, args.repeat)))
+        return
+
+    os.makedirs(args.workdir, exist_ok=True)
+    results = []
+    for size_mb in args.sizes:
+        size_mb = int(size_mb) if float(size_mb).is_integer() else size_mb
+        path = ensure_report(args.workdir, size_mb, args.sql_rows)
+        rows = count_rows(path)
+        for case in args.cases:
+            case_path = ensure_report(args.workdir, size_mb, args.sql_rows, 'text') \
+                if case in TEXT_CASES else path
+            result = measure(case, case_path, args.repeat)
+            result.update({
+                'case': case,
+                'size_mb': size_mb,
+                'file_bytes': os.path.getsize(case_path),
+                'rows': rows,
+                'rows_per_s': rows / result['wall_s'] if result['wall_s'] else None,
+            })
+            results.append(result)
+            print(f"{case:<26} {size_mb:>6} MB  {result['wall_s']:11.6f}s  "
+                  f"{result['peak_rss_mb']:8.1f} MB RSS", file=sys.stderr)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'sql_rows': args.sql_rows,
+        },
+        'results': results,
+    }
+    if args.out:
+        with open(args.out, 'w') as fh:
+            json.dump(report, fh, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    if args.compare:
+        with open(args.compare) as fh:
+            compare(results, json.load(fh))
+
+
+if __name__ == '__main__':
+    main()
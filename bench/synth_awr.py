@@ -0,0 +1,368 @@
+"""
+Synthetic AWR report generator.
+
+Writes reports that look like awrrpt_*.html or awrrpt_*.txt output
+(Begin/End Snap, host information, Load Profile, Instance Efficiency, Host
+CPU, Time Model and the "SQL ordered by ..." sections) so the parser can be
+exercised and benchmarked without production data. Both formats carry the
+same data for the same arguments.
+"""
+import argparse
+import html
+import random
+import re
+from datetime import datetime, timedelta
+from functools import partial
+
+TABLE = '<table border="0" class="tdiff" summary="{summary}">'
+
+LOAD_PROFILE = [
+    ('DB Time(s):', 2.5, 0.1),
+    ('DB CPU(s):', 1.2, 0.05),
+    ('Redo size (bytes):', 1_500_000.0, 9000.0),
+    ('Logical read (blocks):', 95_000.0, 600.0),
+    ('Block changes:', 8_000.0, 50.0),
+    ('Physical read (blocks):', 12_500.0, 80.0),
+    ('Physical write (blocks):', 450.0, 3.0),
+    ('User calls:', 1_800.0, 11.0),
+    ('Parses (SQL):', 600.0, 4.0),
+    ('Hard parses (SQL):', 140.0, 0.9),
+    ('SQL Work Area (MB):', 12.0, 0.1),
+    ('Logons:', 2.0, 0.01),
+    ('Executes (SQL):', 4_200.0, 26.0),
+    ('Rollbacks:', 3.0, 0.02),
+    ('Transactions:', 160.0, 1.0),
+]
+
+EFFICIENCY = [
+    ('Buffer Nowait %:', 99.99, 'Redo NoWait %:', 100.00),
+    ('Buffer  Hit   %:', 87.42, 'In-memory Sort %:', 100.00),
+    ('Library Hit   %:', 96.31, 'Soft Parse %:', 93.10),
+    ('Execute to Parse %:', 85.66, 'Latch Hit %:', 99.87),
+    ('Parse CPU to Parse Elapsd %:', 91.02, '% Non-Parse CPU:', 98.41),
+]
+
+SQL_SECTIONS = [
+    ('SQL ordered by Elapsed Time', 'elapsed',
+     ['Elapsed Time (s)', 'Executions', 'Elapsed Time per Exec (s)', '%Total',
+      '%CPU', '%IO', 'SQL Id', 'SQL Module', 'SQL Text']),
+    ('SQL ordered by CPU Time', 'cpu',
+     ['CPU Time (s)', 'Executions', 'CPU per Exec (s)', '%Total',
+      'Elapsed Time (s)', '%CPU', '%IO', 'SQL Id', 'SQL Module', 'SQL Text']),
+    ('SQL ordered by Gets', 'gets',
+     ['Buffer Gets', 'Executions', 'Gets per Exec', '%Total',
+      'Elapsed Time (s)', '%CPU', '%IO', 'SQL Id', 'SQL Module', 'SQL Text']),
+    ('SQL ordered by Reads', 'reads',
+     ['Physical Reads', 'Executions', 'Reads per Exec', '%Total',
+      'Elapsed Time (s)', '%CPU', '%IO', 'SQL Id', 'SQL Module', 'SQL Text']),
+    ('SQL ordered by Executions', 'execs',
+     ['Executions', 'Rows Processed', 'Rows per Exec', 'Elapsed Time (s)',
+      '%CPU', '%IO', 'SQL Id', 'SQL Module', 'SQL Text']),
+]
+
+SQL_ID_CHARS = '0123456789abcdfghjkmnpqrstuvwxyz'
+
+
+def _td(value, align='right'):
+    return f'<td align="{align}" class=\'awrc\'>{value}</td>'
+
+
+def _th(name):
+    return f'<th class="awrbg" scope="col">{name}</th>'
+
+
+def _table(summary, headers, rows, fmt='html'):
+    if fmt == 'text':
+        return _text_table(headers, rows)
+    out = [TABLE.format(summary=summary), '<tr>', ''.join(_th(h) for h in headers), '</tr>\n']
+    for row in rows:
+        out.append('<tr>')
+        out.append(''.join(_td(c) for c in row))
+        out.append('</tr>\n')
+    out.append('</table><p />\n')
+    return ''.join(out)
+
+
+def _section(title, body, fmt='html'):
+    if fmt == 'text':
+        return f'{title:<45} DB/Inst: SYNTH/synth  Snaps: 1234-1235\n\n{body}'
+    return f'<a class="awr" name="{title.lower()}"></a>\n<h3 class="awr">{title}</h3>\n{body}'
+
+
+_TAGS = re.compile(r'<[^>]*>')
+_NUMBER = re.compile(r'^[-+]?[\d,.]+$')
+
+
+def _plain(cell):
+    return html.unescape(_TAGS.sub('', cell)).replace('\xa0', ' ').strip()
+
+
+def _wrap(header, width):
+    """Split a long heading over two lines, as AWR text reports do."""
+    if ' ' not in header or len(header) <= max(width, 12):
+        return ['', header]
+    words = header.split()
+    half = len(words) // 2
+    return [' '.join(words[:half]), ' '.join(words[half:])]
+
+
+def _text_table(headers, rows):
+    """
+    Render a table the way text reports do: fixed-width columns under runs of
+    dashes, an undashed label column when the first heading is blank, and
+    "label: value" pairs when every heading is blank.
+    """
+    rows = [[_plain(c) for c in row] for row in rows]
+    if not any(headers):
+        if all(row[0].endswith(':') for row in rows):
+            return ''.join('    '.join(f'{row[i]:>28} {row[i + 1]:>8}' for i in range(0, len(row), 2))
+                           + '\n' for row in rows) + '\n'
+        # Label/value rows without colons are printed as one row under headings
+        headers, rows = [row[0] for row in rows], [[row[1] for row in rows]]
+
+    # SQL module and text go on their own lines under each statement
+    extra = [i for i, h in enumerate(headers) if h in ('SQL Module', 'SQL Text')]
+    keep = [i for i in range(len(headers)) if i not in extra]
+    widths = [max([len(rows[r][i]) for r in range(len(rows))] + [1]) for i in keep]
+    heads = [_wrap(headers[i], w) for i, w in zip(keep, widths)]
+    widths = [max(w, len(a), len(b)) for w, (a, b) in zip(widths, heads)]
+    label = headers[0] == ''
+
+    out = []
+    for line in (0, 1):
+        out.append(' '.join(f'{h[line]:>{w}}' for h, w in zip(heads, widths)).rstrip())
+    out.append(' '.join(' ' * w if label and j == 0 else '-' * w for j, w in enumerate(widths)))
+    for row in rows:
+        cells = [row[i] for i in keep]
+        out.append(' '.join(f'{c:>{w}}' if _NUMBER.match(c) or (label and j == 0) else f'{c:<{w}}'
+                            for j, (c, w) in enumerate(zip(cells, widths))).rstrip())
+        for i in extra:
+            out.append(('Module: ' if headers[i] == 'SQL Module' else '') + row[i])
+    return '\n'.join(line for line in out if line) + '\n\n'
+
+
+def _sql_rows(rng, n_sql):
+    rows = []
+    for _ in range(n_sql):
+        sql_id = ''.join(rng.choice(SQL_ID_CHARS) for _ in range(13))
+        execs = rng.randint(1, 500_000)
+        elapsed = round(rng.uniform(0.5, 5000.0), 2)
+        rows.append({
+            'sql_id': sql_id,
+            'executions': execs,
+            'elapsed': elapsed,
+            'cpu': round(elapsed * rng.uniform(0.2, 0.95), 2),
+            'gets': rng.randint(100, 50_000_000),
+            'reads': rng.randint(0, 2_000_000),
+            'rows': rng.randint(0, 10_000_000),
+            'module': rng.choice(['JDBC Thin Client', 'SQL*Plus', 'DBMS_SCHEDULER', 'app@web01']),
+            'text': 'select /* synthetic */ * from t' + sql_id[:4] + ' where id = :1',
+        })
+    return rows
+
+
+def _sql_section(title, kind, headers, sql, pct_total, fmt='html'):
+    key = {'elapsed': 'elapsed', 'cpu': 'cpu', 'gets': 'gets',
+           'reads': 'reads', 'execs': 'executions'}[kind]
+    ordered = sorted(sql, key=lambda s: s[key], reverse=True)
+    rows = []
+    for s in ordered:
+        execs = s['executions']
+        cols = {
+            'Elapsed Time (s)': f"{s['elapsed']:,.2f}",
+            'CPU Time (s)': f"{s['cpu']:,.2f}",
+            'Buffer Gets': f"{s['gets']:,}",
+            'Physical Reads': f"{s['reads']:,}",
+            'Executions': f"{execs:,}",
+            'Rows Processed': f"{s['rows']:,}",
+            'Elapsed Time per Exec (s)': f"{s['elapsed'] / execs:.2f}",
+            'CPU per Exec (s)': f"{s['cpu'] / execs:.2f}",
+            'Gets per Exec': f"{s['gets'] / execs:,.1f}",
+            'Reads per Exec': f"{s['reads'] / execs:,.1f}",
+            'Rows per Exec': f"{s['rows'] / execs:,.1f}",
+            '%Total': f"{pct_total:.2f}",
+            '%CPU': f"{100 * s['cpu'] / s['elapsed']:.1f}",
+            '%IO': '3.1',
+            'SQL Id': f"<a class=\"awr\" href=\"#{s['sql_id']}\">{s['sql_id']}</a>",
+            'SQL Module': s['module'],
+            'SQL Text': s['text'],
+        }
+        rows.append([cols[h] for h in headers])
+    summary = 'This table displays top SQL by ' + title[len('SQL ordered by '):].lower()
+    return _section(title, _table(summary, headers, rows, fmt), fmt)
+
+
+def _instance_tables(rng, instances, begin, end, fmt='html'):
+    """Per-instance tables of a global (RAC) report, one row per I#."""
+    table, section = partial(_table, fmt=fmt), partial(_section, fmt=fmt)
+    time_fmt = '%d-%b-%y %H:%M'
+    ids = range(1, instances + 1)
+    yield section('Database Instances Included In Report', table(
+        'This table displays database instance information for each instance',
+        ['I#', 'Instance', 'Host', 'Startup', 'Begin Snap Time', 'End Snap Time', 'Release'],
+        [[str(i), f'orcl{i}', f'dbhost{i:02d}', '01-Jan-25 08:00', begin.strftime(time_fmt),
+          end.strftime(time_fmt), '19.0.0.0.0'] for i in ids]))
+    idle = {i: round(rng.uniform(5, 95), 1) for i in ids}
+    yield section('OS Statistics By Instance', table(
+        'This table displays operating system statistics for each instance',
+        ['I#', 'Num CPUs', 'CPU Cores', 'CPU Sckts', 'Load Begin', 'Load End',
+         '% Busy', '% Usr', '% Sys', '% WIO', '% Idle'],
+        [[str(i), '16', '8', '2', '1.20', '1.55', f'{100 - idle[i]:.1f}',
+          f'{(100 - idle[i]) * 0.8:.1f}', f'{(100 - idle[i]) * 0.2:.1f}', '1.0', f'{idle[i]:.1f}']
+         for i in ids]))
+    yield section('Time Model', table(
+        'This table displays time model statistics for each instance',
+        ['I#', 'DB time', 'DB CPU', 'SQL exec', 'Parse', 'Hard Parse'],
+        [[str(i), f'{rng.uniform(1000, 9000):,.2f}', f'{rng.uniform(500, 5000):,.2f}',
+          '3,100.20', '80.12', '20.50'] for i in ids]))
+    yield section('Instance Efficiency Percentages', table(
+        'This table displays instance efficiency percentages for each instance',
+        ['I#', 'Buffer Nowait %', 'Buffer Hit %', 'Library Hit %', 'Execute to Parse %',
+         'Latch Hit %', 'Soft Parse %'],
+        [[str(i), '99.99', f'{rng.uniform(80, 99.9):.2f}', f'{rng.uniform(90, 99.9):.2f}',
+          '85.66', '99.87', f'{rng.uniform(85, 99.9):.2f}'] for i in ids]))
+    yield section('System Statistics - Per Second', table(
+        'This table displays system statistics per second for each instance',
+        ['I#', 'Logical Reads/s', 'Physical Reads/s', 'Physical Writes/s', 'Redo Size (k)/s',
+         'User Calls/s', 'Execs/s', 'Parses/s', 'Logons/s', 'Txns/s'],
+        [[str(i), f'{rng.uniform(1e4, 2e5):,.1f}', f'{rng.uniform(100, 3e4):,.1f}',
+          f'{rng.uniform(10, 2e4):,.1f}', f'{rng.uniform(100, 9000):,.1f}',
+          f'{rng.uniform(100, 3000):,.1f}', f'{rng.uniform(1000, 9000):,.1f}',
+          f'{rng.uniform(100, 900):,.1f}', f'{rng.uniform(0, 5):,.2f}', f'{rng.uniform(10, 500):,.1f}']
+         for i in ids]))
+
+
+def iter_report(n_sql=50, seed=0, filler_sections=0, filler_rows=200, instances=1,
+                begin=datetime(2025, 1, 16, 11, 0, 26), minutes=30, db_name='ORCL', instance='orcl1',
+                fmt='html'):
+    """
+    Yield the text of one synthetic AWR report piece by piece, as HTML or,
+    with ``fmt='text'``, in the fixed-width text format.
+
+    ``n_sql`` sets the rows in each "SQL ordered by" section, ``instances`` > 1
+    adds the per-instance tables of a global (RAC) report and
+    ``filler_sections`` appends segment statistics sections of ``filler_rows``
+    rows each to grow the report.
+    """
+    rng = random.Random(seed)
+    end = begin + timedelta(minutes=minutes)
+    time_fmt = '%d-%b-%y %H:%M:%S'
+    text = fmt == 'text'
+    table, section = partial(_table, fmt=fmt), partial(_section, fmt=fmt)
+    if text:
+        yield '\nWORKLOAD REPOSITORY report for\n\n'
+    else:
+        yield ''.join(['<html lang="en"><head><title>AWR Report for DB: ', db_name,
+                       '</title></head><body class="awr">\n<h1 class="awr">WORKLOAD REPOSITORY report for</h1>\n'])
+
+    yield table('This table displays database instance information',
+                 ['DB Name', 'DB Id', 'Instance', 'Inst num', 'Startup Time', 'Release', 'RAC'],
+                 [[db_name, '1234567890', instance, '1', '01-Jan-25 08:00', '19.0.0.0.0',
+                   'YES' if instances > 1 else 'NO']])
+    yield table('This table displays host information',
+                 ['Host Name', 'Platform', 'CPUs', 'Cores', 'Sockets', 'Memory (GB)'],
+                 [['dbhost01', 'Linux x86 64-bit', '16', '8', '2', '125.80']])
+    yield table('This table displays snapshot information',
+                 ['', 'Snap Id', 'Snap Time', 'Sessions', 'Cursors/Session'],
+                 [['Begin Snap:', '1234', begin.strftime(time_fmt), '58', '1.4'],
+                  ['End Snap:', '1235', end.strftime(time_fmt), '61', '1.5'],
+                  ['Elapsed:', '&#160;', f'{minutes:.2f} (mins)', '&#160;', '&#160;'],
+                  ['DB Time:', '&#160;', '75.12 (mins)', '&#160;', '&#160;']])
+
+    yield 'Report Summary\n\n' if text else '<h2 class="awr">Report Summary</h2>\n'
+    yield section('Load Profile', table(
+        'This table displays load profile',
+        ['', 'Per Second', 'Per Transaction', 'Per Exec', 'Per Call'],
+        [[label, f'{ps:,.2f}', f'{pt:,.2f}', '0.00', '0.00'] for label, ps, pt in LOAD_PROFILE]))
+    yield section('Instance Efficiency Percentages (Target 100%)', table(
+        'This table displays instance efficiency percentages',
+        ['', '', '', ''],
+        [[a, f'{av:.2f}', b, f'{bv:.2f}'] for a, av, b, bv in EFFICIENCY]))
+    yield section('Top 10 Foreground Events by Total Wait Time', table(
+        'This table displays top 10 wait events by total wait time',
+        ['Event', 'Waits', 'Total Wait Time (sec)', 'Wait Avg(ms)', '% DB time', 'Wait Class'],
+        [['DB CPU', '&#160;', '2,160', '&#160;', '48.0', '&#160;'],
+         ['db file sequential read', '1,234,567', '1,020', '0.83', '22.6', 'User I/O'],
+         ['log file sync', '98,765', '310', '3.14', '6.9', 'Commit']]))
+    yield section('Host CPU', table(
+        'This table displays system load statistics',
+        ['CPUs', 'Cores', 'Sockets', 'Load Average Begin', 'Load Average End',
+         '%User', '%System', '%WIO', '%Idle'],
+        [['16', '8', '2', '1.20', '1.55', '20.1', '5.2', '1.0', '74.3']]))
+    yield section('Instance CPU', table(
+        'This table displays instance CPU statistics',
+        ['', ''],
+        [['%Total CPU', '22.4'], ['%Busy CPU', '87.1'], ['%DB time waiting for CPU (Resource Manager)', '0.0']]))
+    yield section('Shared Pool Statistics', table(
+        'This table displays shared pool statistics',
+        ['', 'Begin', 'End'],
+        [['Memory Usage %:', '78.41', '79.02'],
+         ['% SQL with executions>1:', '91.20', '90.87']]))
+    if instances > 1:
+        yield from _instance_tables(rng, instances, begin, end, fmt)
+
+    yield 'Main Report\n\n' if text else '<h2 class="awr">Main Report</h2>\n'
+    yield section('Time Model Statistics', table(
+        'This table displays different time model statistic',
+        ['Statistic Name', 'Time (s)', '% of DB Time'],
+        [['sql execute elapsed time', '4,210.55', '93.4'],
+         ['DB CPU', '2,160.42', '47.9'],
+         ['parse time elapsed', '120.02', '2.7'],
+         ['DB time', '4,507.20', '&#160;']]))
+
+    sql = _sql_rows(rng, n_sql)
+    for title, kind, headers in SQL_SECTIONS:
+        yield _sql_section(title, kind, headers, sql, 100.0 / max(n_sql, 1), fmt)
+
+    for i in range(filler_sections):
+        rows = [[f'OBJ_{i}_{j}', f'{rng.randint(0, 10**7):,}', f'{rng.random() * 100:.2f}', 'USERS']
+                for j in range(filler_rows)]
+        yield section(f'Segments by Logical Reads {i}', table(
+            'This table displays segment statistics',
+            ['Object Name', 'Logical Reads', '%Total', 'Tablespace Name'], rows))
+
+    yield section('init.ora Parameters', table(
+        'This table displays name and value of init.ora parameters',
+        ['Parameter Name', 'Begin value', 'End value (if different)'],
+        [['db_block_size', '8192', '&#160;'], ['processes', '1500', '&#160;']]))
+    yield 'End of Report\n' if text else '<p />\nEnd of Report\n</body></html>\n'
+
+
+def generate_report(**kwargs):
+    """Return the text of one synthetic AWR report (see ``iter_report``)."""
+    return ''.join(iter_report(**kwargs))
+
+
+def write_report(path, size_mb=None, **kwargs):
+    """
+    Write a report to ``path`` without holding it in memory. ``size_mb``
+    picks enough filler sections to reach roughly that size. Returns the
+    number of bytes written.
+    """
+    if size_mb is not None:
+        base = len(generate_report(**{**kwargs, 'filler_sections': 0}).encode('utf-8'))
+        per_section = len(generate_report(**{**kwargs, 'filler_sections': 1}).encode('utf-8')) - base
+        kwargs['filler_sections'] = max(0, round((size_mb * 1024 * 1024 - base) / per_section))
+    written = 0
+    with open(path, 'w', encoding='utf-8') as fh:
+        for part in iter_report(**kwargs):
+            written += fh.write(part)
+    return written
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('output')
+    ap.add_argument('--size-mb', type=float, help="Pad the report to roughly this size")
+    ap.add_argument('--sql-rows', type=int, default=50)
+    ap.add_argument('--instances', type=int, default=1)
+    ap.add_argument('--filler-sections', type=int, default=0)
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--format', choices=('html', 'text'), default='html')
+    args = ap.parse_args(argv)
+    write_report(args.output, size_mb=args.size_mb, n_sql=args.sql_rows, seed=args.seed,
+                 instances=args.instances, filler_sections=args.filler_sections, fmt=args.format)
+
+
+if __name__ == '__main__':
+    main()
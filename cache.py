@@ -0,0 +1,316 @@
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict, namedtuple
+
+from archives import archive_members, index_report, is_compressed, member_reader, report_hash
+from parser import (METRIC_SECTIONS, PARSER_VERSION, extract_metrics_indexed,
+                    extract_report_info_indexed, extract_top_sql_indexed)
+from profiling import count, stage
+from rac import INSTANCE_COLUMNS, INSTANCES_SECTION, cluster_aggregates, extract_instance_metrics
+from records import MetricRecord
+
+# Sections parse_report reads; everything else in a compressed report is
+# skipped while decompressing
+PARSED_SECTIONS = METRIC_SECTIONS + ('SQL ordered by', INSTANCES_SECTION) + tuple(INSTANCE_COLUMNS)
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def member_hash(digest, member):
+    """Content hash identifying one report inside an archive with hash ``digest``."""
+    return digest if member is None else content_hash(f"{digest}/{member}".encode())
+
+
+def report_digest(data, digest=None, name=None, member=None):
+    """
+    ``archives.report_hash`` of one report in an upload, the identity it is
+    cached and stored under. ``digest`` is the upload's content hash; for
+    compressed uploads the result is cached on it, so reruns don't
+    decompress the upload again just to hash it.
+    """
+    digest = digest or content_hash(data)
+    if member is None and not is_compressed(name or ''):
+        return digest
+    return report_cache.get_or_compute(
+        data, lambda data: report_hash(data, name, member), tag='report-hash',
+        digest=member_hash(digest, member))
+
+
+def report_key(data, tag='report', digest=None):
+    """Cache key for a report: content hash plus parser version and result tag."""
+    return f"{digest or content_hash(data)}-v{PARSER_VERSION}-{tag}"
+
+
+class ReportCache:
+    """
+    Two-tier cache for parsed report results.
+
+    The memory tier is an LRU bounded by the pickled size of its entries. When
+    ``disk_dir`` is set, entries are also written there as pickle files so they
+    survive server restarts and are shared by every process using the same
+    directory. The disk tier is bounded by ``max_disk_bytes``, dropping the
+    least recently used files first and files of other parser versions
+    always; an unreadable file counts as a miss and is removed.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, disk_dir=None,
+                 max_disk_bytes=1024 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._total = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self.prune_disk()
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key + '.pkl')
+
+    def _remember(self, key, value, size):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._total -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._total += size
+            while self._total > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._total -= evicted
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+        value = self._load(key) if self.disk_dir else None
+        self._count(value is not None)
+        return value
+
+    def _load(self, key):
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as fh:
+                blob = fh.read()
+        except OSError:
+            return None
+        try:
+            value = pickle.loads(blob)
+        except Exception:
+            # Truncated, or written by code that no longer unpickles it
+            _remove(path)
+            return None
+        try:
+            os.utime(path)  # for prune_disk, which drops the oldest first
+        except OSError:
+            pass
+        self._remember(key, value, len(blob))
+        return value
+
+    def prune_disk(self):
+        """Remove disk entries of other parser versions, then the oldest over ``max_disk_bytes``."""
+        current = []
+        with os.scandir(self.disk_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.pkl'):
+                    continue
+                if f"-v{PARSER_VERSION}-" not in entry.name:
+                    _remove(entry.path)
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                current.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in current)
+        for _, size, path in sorted(current):
+            if total <= self.max_disk_bytes:
+                break
+            _remove(path)
+            total -= size
+
+    def put(self, key, value):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self._remember(key, value, len(blob))
+        if self.disk_dir:
+            # Write to a temporary name first so readers never see a partial file
+            path = self._disk_path(key)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, 'wb') as fh:
+                fh.write(blob)
+            os.replace(tmp, path)
+            self.prune_disk()
+
+    def get_or_compute(self, data, compute, tag='report', digest=None):
+        """
+        Return ``compute(data)`` for the report bytes, computing it at most once.
+        Pass ``digest`` (from ``content_hash``) to skip rehashing the bytes.
+        """
+        key = report_key(data, tag, digest)
+        value = self.get(key)
+        if value is None:
+            count('cache_misses')
+            value = compute(data)
+            self.put(key, value)
+        else:
+            count('cache_hits')
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total = 0
+
+    @property
+    def size_bytes(self):
+        return self._total
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass  # already removed by another process
+
+
+def parse_report(data, name=None, member=None, executor=None):
+    """
+    Parse raw report bytes into the results the UI needs. Each extractor only
+    decodes and tokenises its own sections of the report. ``name`` is the
+    file name when the bytes may be compressed, and ``member`` picks one
+    report out of a zip archive.
+
+    ``metrics`` is a MetricRecord. For a global (RAC) report ``instances``
+    is the per-instance frame and the flat metrics hold the cluster-wide
+    aggregates; large per-instance sections are parsed on ``executor`` when
+    one is given.
+    """
+    with stage('section_index'):
+        index = index_report(data, name, member, keep=PARSED_SECTIONS)
+    count('sections_indexed', len(index))
+    metrics = extract_metrics_indexed(index)
+    instances = extract_instance_metrics(index, executor)
+    if instances is not None:
+        metrics.update(cluster_aggregates(instances))
+    return {
+        'metrics': MetricRecord(metrics),
+        'top_sql': extract_top_sql_indexed(index),
+        'info': extract_report_info_indexed(index),
+        'instances': instances,
+    }
+
+
+# Process-wide cache shared by every Streamlit session. Set AWR_CACHE_DIR to
+# enable the on-disk tier and AWR_CACHE_DISK_MAX_BYTES to bound it.
+report_cache = ReportCache(
+    max_bytes=int(os.environ.get('AWR_CACHE_MAX_BYTES', 256 * 1024 * 1024)),
+    disk_dir=os.environ.get('AWR_CACHE_DIR') or None,
+    max_disk_bytes=int(os.environ.get('AWR_CACHE_DISK_MAX_BYTES', 1024 * 1024 * 1024)),
+)
+
+
+def cached_parse(data, digest=None, name=None, member=None):
+    """Parse report bytes through the shared cache."""
+    digest = report_digest(data, digest, name, member)
+    return report_cache.get_or_compute(
+        data, lambda data: parse_report(data, name, member, parse_pool()), digest=digest)
+
+
+# One report from parse_many. ``key`` is whatever the caller paired with the
+# bytes and ``member`` the report's name inside a zip archive; ``error`` is
+# set instead of ``result`` when the report failed to parse.
+ParsedReport = namedtuple('ParsedReport', ['key', 'member', 'digest', 'result', 'error'])
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def parse_pool():
+    """
+    Process pool shared by every session for parsing uploads concurrently.
+
+    Workers are spawned rather than forked: the Streamlit server is
+    multi-threaded and forking it can deadlock the children. Size it with
+    AWR_PARSE_WORKERS (default: CPU count).
+    """
+    global _pool
+    with _pool_lock:
+        # A worker that dies (e.g. killed for memory) breaks the whole pool
+        if _pool is None or _pool._broken:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            _pool = ProcessPoolExecutor(
+                max_workers=int(os.environ.get('AWR_PARSE_WORKERS', 0)) or None,
+                mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def parse_many(reports):
+    """
+    Parse ``(key, data, name)`` triples concurrently and yield a ParsedReport
+    for each report in input order, each as soon as it and the ones before
+    it are ready. A zip archive yields one ParsedReport per report inside
+    it. Fresh results are added to the shared cache.
+    """
+    slots = []  # a ParsedReport, or the future and identity of one being parsed
+    for key, data, name in reports:
+        digest = content_hash(data)
+        try:
+            members = archive_members(data, name)
+        except Exception as e:
+            slots.append(ParsedReport(key, None, digest, None, f"{type(e).__name__}: {e}"))
+            continue
+        # Workers get only their member's bytes, read out of the archive here
+        with member_reader(data, name) as read:
+            for member in members:
+                try:
+                    if member is None:
+                        report, report_name, known_hash = data, name, digest
+                    else:
+                        report, report_name, known_hash = read(member), member, None
+                    identity = report_digest(report, known_hash, report_name)
+                except Exception as e:
+                    slots.append(ParsedReport(key, member, None, None, f"{type(e).__name__}: {e}"))
+                    continue
+                cache_key = report_key(report, digest=identity)
+                result = report_cache.get(cache_key)
+                if result is not None:
+                    count('cache_hits')
+                    slots.append(ParsedReport(key, member, identity, result, None))
+                else:
+                    count('cache_misses')
+                    future = parse_pool().submit(parse_report, report, report_name)
+                    slots.append((future, key, member, identity, cache_key))
+
+    for slot in slots:
+        if isinstance(slot, ParsedReport):
+            yield slot
+            continue
+        future, key, member, digest, cache_key = slot
+        try:
+            result = future.result()
+        except Exception as e:
+            yield ParsedReport(key, member, digest, None, f"{type(e).__name__}: {e}")
+            continue
+        report_cache.put(cache_key, result)
+        yield ParsedReport(key, member, digest, result, None)
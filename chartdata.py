@@ -0,0 +1,81 @@
+"""
+Chart data reduced before figures are built, so what is sent to the browser
+stays the same size however long the history or Top SQL list grows.
+
+Time series are downsampled with Largest-Triangle-Three-Buckets (LTTB), which
+keeps the peaks and dips a plain stride would drop; bar charts keep their top
+N rows and fold the rest into one "Other" bar.
+"""
+
+# Points kept per trend series and bars in the Top SQL chart
+TREND_POINTS = 500
+TOP_SQL_BARS = 20
+OTHER = 'Other'
+
+
+def lttb(x, y, n_out):
+    """
+    Indices of the ``n_out`` points of the series ``(x, y)`` that LTTB keeps,
+    first and last included. ``x`` must be increasing and both free of NaN.
+    """
+    import numpy as np
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    # n_out - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+    keep = np.empty(n_out, dtype=np.intp)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[hi:next_hi].mean()
+        avg_y = y[hi:next_hi].mean()
+        # Twice the area of the triangle (a, candidate, next bucket's average)
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+def downsample(frame, x, y, by=(), max_points=TREND_POINTS):
+    """
+    Rows of a long-format frame reduced to at most ``max_points`` per series,
+    where series are the groups of the ``by`` columns, with LTTB over the
+    ``x`` (numeric or datetime) and ``y`` columns.
+    """
+    import numpy as np
+    import pandas as pd
+
+    frame = frame.dropna(subset=[y]).sort_values(list(by) + [x])
+    if not by:
+        groups = [frame]
+    else:
+        groups = [group for _, group in frame.groupby(list(by), sort=False)]
+    parts = []
+    for group in groups:
+        xs = group[x]
+        if pd.api.types.is_datetime64_any_dtype(xs):
+            xs = xs.astype('int64')
+        keep = lttb(xs.to_numpy(dtype=np.float64), group[y].to_numpy(dtype=np.float64), max_points)
+        parts.append(group.iloc[keep])
+    return pd.concat(parts) if parts else frame
+
+
+def top_n(frame, column, n=TOP_SQL_BARS, other=OTHER):
+    """
+    The ``n`` rows of ``frame`` with the largest ``column``, plus one ``other``
+    row holding the sums of the numeric columns of the rest.
+    """
+    import pandas as pd
+
+    if len(frame) <= n:
+        return frame.sort_values(column, ascending=False)
+    ranked = frame.sort_values(column, ascending=False)
+    rest = ranked.iloc[n:].select_dtypes('number').sum().to_frame(other).T
+    rest.index.name = frame.index.name
+    return pd.concat([ranked.iloc[:n], rest])
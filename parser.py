@@ -1,127 +1,177 @@
-from bs4 import BeautifulSoup
+from array import array
+from html.parser import HTMLParser
+import codecs
+import html
+import importlib.util
+import io
+import os
 import re
 from datetime import datetime
+from functools import lru_cache
 
-def extract_metrics(html_text):
-    soup = BeautifulSoup(html_text, 'html.parser')
-    metrics = {}
-    
-    # 1. Extract snapshot duration from 'Begin Snap:' and 'End Snap:' rows
-    snap_begin = None
-    snap_end = None
-    for row in soup.find_all('tr'):
-        cells = row.find_all('td')
-        if len(cells) >= 3:
-            label = cells[0].get_text(strip=True)
+from profiling import active, count, stage, timed
+
+# Bump whenever extraction output changes so cached results are invalidated.
+PARSER_VERSION = 10
+
+# Map labels to metric names. Order matters: the first pattern contained in a
+# row label wins.
+METRIC_MAP = {
+    'Buffer  Hit   %': 'buffer_cache_hit_ratio',
+    'Library Hit   %': 'library_hit_pct',
+    'Memory Usage %': 'memory_usage_pct',
+    'Physical read (blocks)': 'physical_reads',
+    'Physical write (blocks)': 'physical_writes',
+    'User calls': 'user_calls',
+    'DB CPU': 'db_cpu_seconds',  # Changed to seconds
+    '%Total CPU': 'cpu_utilization_pct',
+    'CPU Utilization %': 'cpu_utilization_pct',
+    'Parse Calls': 'parse_calls',
+    'Redo size (bytes)': 'redo_size_bytes',
+    'Logical read (blocks)': 'logical_reads',
+    'Hard parses (SQL)': 'hard_parses',
+    'Soft Parse %': 'soft_parse_pct',
+    'Latch Hit %': 'latch_hit_pct',
+    'SQL Work Area (MB)': 'sql_work_area_mb',
+    'Executions': 'executions',
+    'Logons:': 'logons',
+    '%Idle': 'cpu_idle_pct'
+}
+
+# One regex over every pattern rejects non-metric rows without a per-row scan
+# of METRIC_MAP; only labels that contain some pattern go through the ordered
+# lookup in _match_label.
+_METRIC_PREFILTER = re.compile('|'.join(re.escape(p) for p in METRIC_MAP))
+_METRIC_PATTERNS = tuple(METRIC_MAP.items())
+
+
+@lru_cache(maxsize=4096)
+def _match_label(label):
+    if not _METRIC_PREFILTER.search(label):
+        return None
+    for pattern, metric_name in _METRIC_PATTERNS:
+        if pattern in label:
+            return metric_name
+    return None
+
+
+def _parse_value(value):
+    value = value.replace(',', '')
+    # Handle percentage values
+    if '%' in value:
+        return float(value.replace('%', ''))
+    # Handle large numbers with suffixes
+    upper = value.upper()
+    if upper.endswith('K'):
+        return float(upper.replace('K', '')) * 1000
+    if upper.endswith('M'):
+        return float(upper.replace('M', '')) * 1_000_000
+    if upper.endswith('G'):
+        return float(upper.replace('G', '')) * 1_000_000_000
+    return float(value)
+
+
+def _is_host_table(table, cache):
+    key = id(table)
+    if key not in cache:
+        headers = {th.get_text(strip=True) for th in table.find_all('th')}
+        cache[key] = 'CPUs' in headers and 'Cores' in headers
+    return cache[key]
+
+
+class _MetricCollector:
+    """Row-by-row metric state shared by the DOM, streaming and text extractors."""
+
+    def __init__(self):
+        self.found = {}
+        self.snap_begin = None
+        self.snap_end = None
+        self.snap_done = False
+        self.cpu_cores = 1
+        self.found_host_table = False
+        self.fallback_cpus = None
+        self.matched = 0
+
+    def add_row(self, label, cell_text, n_cells, in_host_table):
+        """
+        Feed one row with at least two cells. ``cell_text(i)`` returns the
+        stripped text of cell ``i`` and ``in_host_table()`` tells whether the
+        row sits in a table headed by CPUs/Cores. Returns the (metric, value)
+        pair the row produced, or None.
+        """
+        # 1. Snapshot times from 'Begin Snap:' and 'End Snap:' rows
+        if n_cells >= 3 and not self.snap_done:
             if label.startswith('Begin Snap:'):
-                snap_begin = cells[2].get_text(strip=True)
+                self.snap_begin = cell_text(2)
             elif label.startswith('End Snap:'):
-                snap_end = cells[2].get_text(strip=True)
-        if snap_begin and snap_end:
-            break
+                self.snap_end = cell_text(2)
+            self.snap_done = bool(self.snap_begin and self.snap_end)
+
+        # 2. CPU count from the first host info table (CPUs column)
+        if n_cells >= 3 and not self.found_host_table:
+            cpus_val = cell_text(2)
+            if cpus_val:
+                try:
+                    cpus = int(cpus_val)
+                except ValueError:
+                    cpus = None
+                if cpus is not None and in_host_table():
+                    self.cpu_cores = cpus
+                    self.found_host_table = True
 
-    snap_duration = 1800  # default to 30 minutes
-    if snap_begin and snap_end:
-        # Example format: 16-Jan-25 11:30:26
+        # 3. Mapped metrics; later rows overwrite earlier ones
+        metric_name = _match_label(label)
+        if metric_name is None:
+            return None
         try:
-            start_time = datetime.strptime(snap_begin, "%d-%b-%y %H:%M:%S")
-            end_time = datetime.strptime(snap_end, "%d-%b-%y %H:%M:%S")
-            snap_duration = (end_time - start_time).total_seconds()
-            if snap_duration < 0:
-                # Handle day wrap (if end is after midnight)
-                snap_duration += 86400
-            metrics['snap_duration_seconds'] = snap_duration
-        except Exception as e:
-            pass
-    
-    # 2. Extract CPU cores from host info table (CPUs column)
-    cpu_cores = 1
-    found_host_table = False
-    for table in soup.find_all('table'):
-        headers = [th.get_text(strip=True) for th in table.find_all('th')]
-        if 'CPUs' in headers and 'Cores' in headers:
-            for row in table.find_all('tr'):
-                cells = row.find_all('td')
-                if len(cells) >= 3:
-                    try:
-                        cpus_val = cells[2].get_text(strip=True)
-                        if cpus_val:
-                            cpu_cores = int(cpus_val)
-                            metrics['cpu_cores'] = cpu_cores
-                            found_host_table = True
-                            break
-                    except Exception:
-                        continue
-        if found_host_table:
-            break
-    # Fallback: regex if table not found
-    if not found_host_table:
-        cpu_pattern = re.compile(r"CPUs:\s*(\d+)")
-        cpu_match = cpu_pattern.search(html_text)
-        if cpu_match:
+            value = _parse_value(cell_text(1))
+        except ValueError:
+            return None
+        self.found[metric_name] = value
+        self.matched += 1
+        return metric_name, value
+
+    def finish(self, fallback_cpus):
+        """Build the metrics dict; ``fallback_cpus()`` supplies the regex CPU count."""
+        metrics = {}
+        snap_begin, snap_end = self.snap_begin, self.snap_end
+        cpu_cores = self.cpu_cores
+
+        snap_duration = 1800  # default to 30 minutes
+        if snap_begin and snap_end:
+            # Example format: 16-Jan-25 11:30:26
             try:
-                cpu_cores = int(cpu_match.group(1))
-                metrics['cpu_cores'] = cpu_cores
-            except:
+                start_time = datetime.strptime(snap_begin, "%d-%b-%y %H:%M:%S")
+                end_time = datetime.strptime(snap_end, "%d-%b-%y %H:%M:%S")
+                snap_duration = (end_time - start_time).total_seconds()
+                if snap_duration < 0:
+                    # Handle day wrap (if end is after midnight)
+                    snap_duration += 86400
+                metrics['snap_duration_seconds'] = snap_duration
+            except Exception as e:
                 pass
-    
-    # 3. Extract metrics from tables
-    for row in soup.find_all('tr'):
-        cells = row.find_all('td')
-        if len(cells) >= 2:
-            label = cells[0].get_text(strip=True)
-            value = cells[1].get_text(strip=True).replace(',', '')
 
-            try:
-                # Handle percentage values
-                if '%' in value:
-                    value = float(value.replace('%', ''))
-                # Handle large numbers with suffixes
-                elif value.upper().endswith('K'):
-                    value = float(value.upper().replace('K', '')) * 1000
-                elif value.upper().endswith('M'):
-                    value = float(value.upper().replace('M', '')) * 1_000_000
-                elif value.upper().endswith('G'):
-                    value = float(value.upper().replace('G', '')) * 1_000_000_000
-                else:
-                    value = float(value)
-                
-                # Map labels to metric names
-                metric_map = {
-                    'Buffer  Hit   %': 'buffer_cache_hit_ratio',
-                    'Library Hit   %': 'library_hit_pct',
-                    'Memory Usage %': 'memory_usage_pct',
-                    'Physical read (blocks)': 'physical_reads',
-                    'Physical write (blocks)': 'physical_writes',
-                    'User calls': 'user_calls',
-                    'DB CPU': 'db_cpu_seconds',  # Changed to seconds
-                    '%Total CPU': 'cpu_utilization_pct',
-                    'CPU Utilization %': 'cpu_utilization_pct',
-                    'Parse Calls': 'parse_calls',
-                    'Redo size (bytes)': 'redo_size_bytes',
-                    'Logical read (blocks)': 'logical_reads',
-                    'Hard parses (SQL)': 'hard_parses',
-                    'Soft Parse %': 'soft_parse_pct',
-                    'Latch Hit %': 'latch_hit_pct',
-                    'SQL Work Area (MB)': 'sql_work_area_mb',
-                    'Executions': 'executions',
-                    'Logons:': 'logons',
-                    '%Idle': 'cpu_idle_pct'
-                }
-                
-                # Assign value to metric if label matches
-                for pattern, metric_name in metric_map.items():
-                    if pattern in label:
-                        metrics[metric_name] = value
-                        break
-
-            except ValueError:
-                continue
-    
-    # 4. Calculate real CPU utilization
+        if self.found_host_table:
+            metrics['cpu_cores'] = cpu_cores
+        # Fallback: regex if table not found
+        else:
+            cpus = fallback_cpus()
+            if cpus is not None:
+                cpu_cores = cpus
+                metrics['cpu_cores'] = cpu_cores
+
+        metrics.update(self.found)
+
+        # 4. Calculate real CPU utilization
+        derive_cpu_utilization(metrics, snap_duration, cpu_cores)
+        return metrics
+
+
+def derive_cpu_utilization(metrics, snap_duration, cpu_cores):
+    """Set ``metrics['cpu_utilization_pct']`` from %Idle, or else from DB CPU seconds."""
     db_cpu_seconds = metrics.get('db_cpu_seconds', 0)
     cpu_idle_pct = metrics.get('cpu_idle_pct', 100)
-    
+
     # First try: Use idle percentage if available
     if 'cpu_idle_pct' in metrics:
         metrics['cpu_utilization_pct'] = 100 - cpu_idle_pct
@@ -130,13 +180,732 @@ def extract_metrics(html_text):
         # Utilization = (CPU seconds / duration) / cores * 100
         utilization = (db_cpu_seconds / snap_duration) / cpu_cores * 100
         metrics['cpu_utilization_pct'] = round(utilization, 2)
-    
     return metrics
 
 
+_CPU_FALLBACK = re.compile(r"CPUs:\s*(\d+)")
+# A fallback match that the next chunk may still extend
+_CPU_FALLBACK_OPEN = re.compile(r"CPUs:\s*\d*\Z")
+
+
+def _regex_cpus(text):
+    cpu_match = _CPU_FALLBACK.search(text)
+    if cpu_match:
+        try:
+            return int(cpu_match.group(1))
+        except:
+            pass
+    return None
+
+
+@lru_cache(maxsize=1)
+def default_features():
+    """BeautifulSoup tree builder: lxml when it is installed, else html.parser."""
+    return 'lxml' if importlib.util.find_spec('lxml') is not None else 'html.parser'
+
+
+@timed()
+def extract_metrics(html_text, features=None):
+    """
+    Extract the key AWR metrics from an HTML report in a single pass over its rows.
+
+    ``features`` selects the BeautifulSoup tree builder. Building the tree is
+    most of the cost, so it defaults to lxml when installed, which builds it
+    faster than ``html.parser`` and gives the same metrics on AWR reports.
+    """
+    # Imported here so callers that only stream or slice never load bs4
+    from bs4 import BeautifulSoup
+
+    with stage('build_tree'):
+        soup = BeautifulSoup(html_text, features or default_features())
+    collector = _MetricCollector()
+    host_tables = {}
+
+    rows = soup.find_all('tr')
+    for row in rows:
+        cells = row.find_all('td')
+        if len(cells) < 2:
+            continue
+        collector.add_row(
+            cells[0].get_text(strip=True),
+            lambda i: cells[i].get_text(strip=True),
+            len(cells),
+            lambda: any(_is_host_table(t, host_tables) for t in row.find_parents('table')),
+        )
+
+    count('rows_scanned', len(rows))
+    if active() is not None:
+        count('tables_visited', len(soup.find_all('table')))
+    count('metrics_matched', collector.matched)
+    return collector.finish(lambda: _regex_cpus(html_text))
+
+
+class _StreamingRowParser(HTMLParser):
+    """
+    Incremental tokenizer that keeps only the row currently being read.
+
+    Cell text follows ``get_text(strip=True)``: each text node is stripped and
+    the pieces are joined. Host tables are recognised from the headers seen so
+    far, which in AWR always precede the data rows.
+    """
+
+    def __init__(self, on_row):
+        super().__init__(convert_charrefs=True)
+        self.on_row = on_row
+        self.tables = []   # header sets of the open tables, innermost last
+        self.cells = None  # cells of the open row
+        self.cell = None   # text pieces of the open td
+        self.header = None  # text pieces of the open th
+        self.text = []     # raw data of the current text node
+        self.rows_seen = 0
+        self.tables_seen = 0
+
+    def _flush_text(self):
+        if self.text:
+            piece = ''.join(self.text).strip()
+            self.text = []
+            if piece:
+                if self.cell is not None:
+                    self.cell.append(piece)
+                if self.header is not None:
+                    self.header.append(piece)
+
+    def _close_cell(self):
+        if self.cell is not None:
+            self.cells.append(''.join(self.cell))
+            self.cell = None
+
+    def _close_header(self):
+        if self.header is not None:
+            name = ''.join(self.header)
+            for headers in self.tables:
+                headers.add(name)
+            self.header = None
+
+    def _close_row(self):
+        self._close_cell()
+        self._close_header()
+        if self.cells is not None:
+            cells, self.cells = self.cells, None
+            self.rows_seen += 1
+            if len(cells) >= 2:
+                self.on_row(cells, self.tables)
+
+    def handle_starttag(self, tag, attrs):
+        self._flush_text()
+        if tag == 'table':
+            self.tables.append(set())
+            self.tables_seen += 1
+        elif tag == 'tr':
+            self._close_row()
+            self.cells = []
+        elif tag == 'td':
+            if self.cells is None:
+                self.cells = []
+            self._close_cell()
+            self._close_header()
+            self.cell = []
+        elif tag == 'th':
+            self._close_cell()
+            self._close_header()
+            self.header = []
+
+    def handle_endtag(self, tag):
+        self._flush_text()
+        if tag == 'td':
+            self._close_cell()
+        elif tag == 'th':
+            self._close_header()
+        elif tag == 'tr':
+            self._close_row()
+        elif tag == 'table':
+            self._close_row()
+            if self.tables:
+                self.tables.pop()
+
+    def handle_data(self, data):
+        if self.cell is not None or self.header is not None:
+            self.text.append(data)
+
+
+def iter_metrics_stream(stream, chunk_size=1 << 20, encoding='utf-8', _collector=None):
+    """
+    Yield ``(metric_name, value)`` pairs from an AWR HTML report as its rows
+    are read, without building a document tree.
+
+    ``stream`` may be a path or a binary/text file object; it is read in
+    ``chunk_size`` pieces so memory stays flat regardless of report size.
+    """
+    if isinstance(stream, (str, os.PathLike)):
+        with open(stream, 'rb') as fh:
+            yield from iter_metrics_stream(fh, chunk_size, encoding, _collector)
+        return
+
+    collector = _collector if _collector is not None else _MetricCollector()
+    pending = []
+
+    def on_row(cells, tables):
+        pair = collector.add_row(
+            cells[0],
+            cells.__getitem__,
+            len(cells),
+            lambda: any('CPUs' in h and 'Cores' in h for h in tables),
+        )
+        if pair is not None:
+            pending.append(pair)
+
+    tokenizer = _StreamingRowParser(on_row)
+    decoder = codecs.getincrementaldecoder(encoding)()
+    tail = ''
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        text = decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+        # Carry an overlap so the CPU regex fallback sees matches that
+        # straddle chunk boundaries: a match running to the end of the buffer
+        # may still be cut short, so it is kept from its label and retried
+        # with the next chunk; otherwise the last characters, which may start
+        # a label.
+        if collector.fallback_cpus is None:
+            window = tail + text
+            cpu_match = _CPU_FALLBACK.search(window)
+            if cpu_match and cpu_match.end() < len(window):
+                collector.fallback_cpus = int(cpu_match.group(1))
+            open_match = _CPU_FALLBACK_OPEN.search(window)
+            tail = window[open_match.start():] if open_match else window[-4:]
+        tokenizer.feed(text)
+        yield from pending
+        pending.clear()
+    tokenizer.feed(decoder.decode(b'', final=True))
+    if collector.fallback_cpus is None:
+        collector.fallback_cpus = _regex_cpus(tail)
+    tokenizer.close()
+    tokenizer._close_row()
+    count('rows_scanned', tokenizer.rows_seen)
+    count('tables_visited', tokenizer.tables_seen)
+    count('metrics_matched', collector.matched)
+    yield from pending
+
+
+@timed()
+def extract_metrics_stream(stream, chunk_size=1 << 20, encoding='utf-8'):
+    """
+    Streaming counterpart of ``extract_metrics``: returns the same metrics
+    dict while holding only one chunk of the report in memory at a time.
+    """
+    collector = _MetricCollector()
+    for _ in iter_metrics_stream(stream, chunk_size, encoding, collector):
+        pass
+    return collector.finish(lambda: collector.fallback_cpus)
+
+
+# "SQL ordered by ..." sections read by extract_top_sql
+TOP_SQL_SECTIONS = ('Elapsed Time', 'CPU Time', 'Gets', 'Reads', 'Executions')
+
+_TOP_SQL_HEADING = re.compile(
+    r'>\s*SQL ordered by (' + '|'.join(TOP_SQL_SECTIONS) + r')\s*<', re.IGNORECASE)
+_TABLE_START = re.compile(r'<table\b', re.IGNORECASE)
+_TABLE_END = re.compile(r'</table\s*>', re.IGNORECASE)
+_ROW = re.compile(r'<tr\b[^>]*>(.*?)</tr\s*>', re.IGNORECASE | re.DOTALL)
+_CELL = re.compile(r'<t([hd])\b[^>]*>(.*?)</t[hd]\s*>', re.IGNORECASE | re.DOTALL)
+_TAG = re.compile(r'<[^>]*>')
+
+
+def _cell_text(raw):
+    return ' '.join(html.unescape(_TAG.sub('', raw)).split())
+
+
+_NAN = float('nan')
+
+
+def _to_float(text):
+    try:
+        return float(text.replace(',', ''))
+    except ValueError:
+        return _NAN
+
+
+class TopSQL:
+    """
+    Columnar Top SQL result keyed by SQL ID.
+
+    Numeric columns are ``array('d')`` buffers (NaN where a section did not
+    report the statement) so ``to_frame`` can wrap them without copying.
+    """
+
+    NUMERIC_COLUMNS = ('Elapsed Time (s)', 'CPU Time (s)', 'Buffer Gets',
+                       'Physical Reads', 'Executions')
+    TEXT_COLUMNS = ('SQL Module', 'SQL Text')
+    ID_COLUMN = 'SQL ID'
+
+    def __init__(self):
+        self.sql_ids = []
+        self.index = {}
+        self.numeric = {name: array('d') for name in self.NUMERIC_COLUMNS}
+        self.text = {name: [] for name in self.TEXT_COLUMNS}
+
+    def __len__(self):
+        return len(self.sql_ids)
+
+    def __bool__(self):
+        return bool(self.sql_ids)
+
+    def _row(self, sql_id):
+        row = self.index.get(sql_id)
+        if row is None:
+            row = self.index[sql_id] = len(self.sql_ids)
+            self.sql_ids.append(sql_id)
+            for column in self.numeric.values():
+                column.append(_NAN)
+            for column in self.text.values():
+                column.append('')
+        return row
+
+    def column(self, name):
+        """Return a column: the numeric buffer or the list of strings."""
+        if name == self.ID_COLUMN:
+            return self.sql_ids
+        return self.numeric[name] if name in self.numeric else self.text[name]
+
+    def to_frame(self):
+        """DataFrame indexed by SQL ID whose numeric columns share memory with this result."""
+        import numpy as np
+        import pandas as pd
+
+        data = {name: np.frombuffer(buf, dtype=np.float64) if len(buf) else np.empty(0)
+                for name, buf in self.numeric.items()}
+        data.update(self.text)
+        return pd.DataFrame(data, index=pd.Index(self.sql_ids, name=self.ID_COLUMN), copy=False)
+
+
+def _iter_section_tables(html_text):
+    """Yield (section name, table html) for each "SQL ordered by" section."""
+    for heading in _TOP_SQL_HEADING.finditer(html_text):
+        start = _TABLE_START.search(html_text, heading.end())
+        if not start:
+            continue
+        end = _TABLE_END.search(html_text, start.end())
+        if not end:
+            continue
+        yield heading.group(1), html_text[start.start():end.end()]
+
+
+@timed()
 def extract_top_sql(html_text):
     """
-    Placeholder for extracting top SQL statements from AWR HTML.
-    Returns an empty list. Implement actual logic as needed.
+    Extract the "SQL ordered by Elapsed Time / CPU Time / Gets / Reads /
+    Executions" sections into one TopSQL result, merging rows by SQL ID.
+
+    Only the section tables are tokenised, with regexes rather than a DOM,
+    so reports listing thousands of statements stay cheap.
+    """
+    result = TopSQL()
+    numeric_names = set(TopSQL.NUMERIC_COLUMNS)
+    text_names = set(TopSQL.TEXT_COLUMNS)
+
+    sections = 0
+    for _, table in _iter_section_tables(html_text):
+        sections += 1
+        headers = None
+        for row_html in _ROW.finditer(table):
+            cells = _CELL.findall(row_html.group(1))
+            if not cells:
+                continue
+            if cells[0][0].lower() == 'h':
+                headers = [_cell_text(raw) for _, raw in cells]
+                continue
+            if headers is None or 'SQL Id' not in headers:
+                continue
+            values = [_cell_text(raw) for _, raw in cells]
+            if len(values) != len(headers):
+                continue
+            row = dict(zip(headers, values))
+            sql_id = row['SQL Id']
+            if not sql_id:
+                continue
+            i = result._row(sql_id)
+            for name, value in row.items():
+                if name in numeric_names:
+                    column = result.numeric[name]
+                    if column[i] != column[i]:  # only fill values still NaN
+                        column[i] = _to_float(value)
+                elif name in text_names and not result.text[name][i]:
+                    result.text[name][i] = value
+
+    count('top_sql_sections', sections)
+    count('top_sql_statements', len(result))
+    return result
+
+
+def iter_tables(html_text):
+    """Yield ``(headers, rows)`` for each table, rows being lists of cell text."""
+    pos = 0
+    while True:
+        start = _TABLE_START.search(html_text, pos)
+        if not start:
+            return
+        end = _TABLE_END.search(html_text, start.end())
+        if not end:
+            return
+        pos = end.end()
+        headers, rows = None, []
+        for row_html in _ROW.finditer(html_text, start.start(), end.end()):
+            cells = _CELL.findall(row_html.group(1))
+            if not cells:
+                continue
+            values = [_cell_text(raw) for _, raw in cells]
+            if cells[0][0].lower() == 'h':
+                headers = values
+            else:
+                rows.append(values)
+        yield headers, rows
+
+
+def _snap_time(text):
+    try:
+        return datetime.strptime(text, "%d-%b-%y %H:%M:%S").strftime("%Y-%m-%d %H:%M:%S")
+    except (TypeError, ValueError):
+        return None
+
+
+_INSTANCE_HEADERS = ('Instance', 'Inst Num', 'Inst num')
+
+
+def _fill_identity(info, headers, values):
+    """
+    Take the DB name and instance from a row of the header tables. Before
+    12c both sit in the DB Name table; later releases give Instance and
+    Inst Num a table of their own.
+    """
+    row = dict(zip(headers, values))
+    if 'DB Name' in row and info['db_name'] is None:
+        info['db_name'] = row['DB Name'] or None
+    if info['instance'] is None and any(h in row for h in _INSTANCE_HEADERS):
+        info['instance'] = next((row[h] for h in _INSTANCE_HEADERS if row.get(h)), None)
+
+
+@timed()
+def extract_report_info(html_text, max_tables=30):
+    """
+    Identify a report: DB name, instance and snap begin/end times (ISO
+    format). Only the summary tables at the top of the report are read.
     """
-    return []
+    info = {'db_name': None, 'instance': None, 'snap_begin': None, 'snap_end': None}
+    pos = 0
+    for _ in range(max_tables):
+        start = _TABLE_START.search(html_text, pos)
+        if not start:
+            break
+        end = _TABLE_END.search(html_text, start.end())
+        if not end:
+            break
+        pos = end.end()
+        headers = None
+        for row_html in _ROW.finditer(html_text, start.start(), end.end()):
+            cells = _CELL.findall(row_html.group(1))
+            if not cells:
+                continue
+            values = [_cell_text(raw) for _, raw in cells]
+            if cells[0][0].lower() == 'h':
+                headers = values
+                continue
+            if headers:
+                _fill_identity(info, headers, values)
+            if len(values) >= 3 and values[0].startswith('Begin Snap:'):
+                info['snap_begin'] = _snap_time(values[2])
+            elif len(values) >= 3 and values[0].startswith('End Snap:'):
+                info['snap_end'] = _snap_time(values[2])
+        if all(info.values()):
+            break
+    return info
+
+
+# Text reports (awrrpt_*.txt) lay tables out in fixed-width columns: the run
+# of dashes under each heading gives the column's offset, and the rows below
+# are sliced at those offsets until the next section title or the closing run
+# of dashes. Label/value pairs outside tables ("Buffer  Hit   %:   99.50
+# In-memory Sort %:  100.00") are split at their colons. Each row is fed to
+# the same _MetricCollector as an HTML row, so both formats produce the same
+# metrics.
+_SEPARATOR = re.compile(r'^[\s~]*-{2,}[\s-]*$')
+_DASH_RUN = re.compile(r'-{2,}')
+_PAIR = re.compile(r'(\S[^:]*:)\s+(\S+)')
+_NUMERIC = re.compile(r'^[-+]?[\d,.]+%?[KMG]?$', re.IGNORECASE)
+_TEXT_TOP_SQL_HEADING = re.compile(r'^SQL ordered by (' + '|'.join(TOP_SQL_SECTIONS) + r')\b',
+                                   re.IGNORECASE)
+_SQL_ID = re.compile(r'^[0-9a-z]{13}$')
+
+
+def detect_format(head):
+    """``'html'`` or ``'text'``, from the start of a report (bytes or str)."""
+    head = head[:4096]
+    if not isinstance(head, str):
+        head = bytes(head).decode('latin-1')
+    head = head.lower()
+    return 'html' if '<html' in head or '<table' in head or '<!doctype' in head else 'text'
+
+
+def _slice_row(line, starts):
+    """Cut a table line into cells at the column ``starts``."""
+    cuts = [0]
+    # Text left of the first column is the row label ("Begin Snap:")
+    for c in (starts if line[:starts[0]].strip() else starts[1:]):
+        if c < len(line) and line[c - 1] != ' ' and line[c] != ' ':
+            # A value wider than its column: numbers overflow to the left,
+            # text to the right
+            left = line.rfind(' ', 0, c) + 1
+            right = line.find(' ', c)
+            right = len(line) if right == -1 else right
+            c = left if _NUMERIC.match(line[left:right]) else right
+        cuts.append(c)
+    cuts.append(len(line))
+    return [line[a:b].strip() for a, b in zip(cuts, cuts[1:])]
+
+
+def _is_title(line):
+    """A section title or its underline, which ends the table above it."""
+    stripped = line.lstrip()
+    return ('DB/Inst:' in line or stripped.startswith(('->', '~~'))
+            or _TEXT_TOP_SQL_HEADING.match(stripped) is not None)
+
+
+def _iter_text_rows(text, wanted=None):
+    """
+    Yield ``(cells, headers, line)`` for each non-blank line of a text
+    report. ``headers`` is the column names for a table row and None for a
+    line outside a table, whose cells are its label/value pairs. When
+    ``wanted(line, headers)`` is given and false, the line is not split and
+    ``cells`` is None.
+
+    Blank lines inside a table (Oracle puts one after each Top SQL entry)
+    do not end it: the lines after one are held until the next blank line
+    or separator shows whether they are more rows or the headings of the
+    next table.
+    """
+    starts = None
+    headers = None
+    above = []  # lines since the last blank line, for the column headings
+    held = None  # lines after a blank line inside a table
+
+    def table_row(line):
+        nonlocal headers
+        if wanted is not None and not wanted(line, headers):
+            return None, headers, line
+        cells = _slice_row(line, starts)
+        if len(cells) == len(headers) + 1:
+            headers = [''] + headers  # labelled rows under an unlabelled heading
+        return cells, headers, line
+
+    def other(line):
+        above.append(line)
+        if wanted is not None and not wanted(line, None):
+            return None, None, line
+        return [part for pair in _PAIR.findall(line) for part in pair], None, line
+
+    def more_rows(lines):
+        # A row fills the table's last column; a heading or title is
+        # narrower than the table
+        if not lines:
+            return False
+        cells = _slice_row(lines[0], starts)
+        return bool(cells[-1]) and sum(map(bool, cells)) > 1
+
+    for line in text.splitlines():
+        line = line.rstrip()
+        separator = _SEPARATOR.match(line) is not None
+        if held is not None:
+            if line and not separator and not _is_title(line):
+                held.append(line)
+                continue
+            if not line and more_rows(held):
+                for row in held:
+                    yield table_row(row)
+                held = []
+                continue
+            starts = headers = None
+            if separator and held:
+                above = held  # headings of the next table
+            else:
+                for row in held:
+                    yield other(row)
+                if separator:
+                    held = None
+                    continue  # the run of dashes closing the table
+            held = None
+        if not line:
+            if starts is not None:
+                held = []
+            above = []
+            continue
+        if separator:
+            if starts is not None:
+                starts = headers = None  # the run of dashes closing the table
+                continue
+            starts = [m.start() for m in _DASH_RUN.finditer(line)]
+            # Headings may wrap over several lines; join each column's pieces
+            names = None
+            for heading in above:
+                if heading.lstrip().startswith('->') or '~~' in heading:
+                    names = None
+                    continue
+                pieces = _slice_row(heading, starts)
+                if names is None or len(pieces) != len(names):
+                    names = pieces
+                else:
+                    names = [f'{a} {b}'.strip() for a, b in zip(names, pieces)]
+            headers = names or []
+            above = []
+            continue
+        if starts is not None:
+            yield table_row(line)
+        else:
+            yield other(line)
+    if held and more_rows(held):
+        for row in held:
+            yield table_row(row)
+    elif held:
+        for row in held:
+            yield other(row)
+
+
+@timed()
+def extract_metrics_text(text):
+    """``extract_metrics`` for a text-format AWR report."""
+    collector = _MetricCollector()
+
+    def wanted(line, headers):
+        # Only rows the collector can use are split into cells: a row whose
+        # line contains no metric label cannot match one in its first cell
+        return (_METRIC_PREFILTER.search(line) is not None
+                or (not collector.snap_done and 'Snap:' in line)
+                or (not collector.found_host_table and bool(headers) and 'CPUs' in headers))
+
+    rows = 0
+    for cells, headers, _ in _iter_text_rows(text, wanted):
+        rows += 1
+        if cells is None or len(cells) < 2:
+            continue
+        collector.add_row(
+            cells[0],
+            cells.__getitem__,
+            len(cells),
+            lambda: bool(headers) and 'CPUs' in headers and 'Cores' in headers,
+        )
+
+    count('rows_scanned', rows)
+    count('metrics_matched', collector.matched)
+    return collector.finish(lambda: _regex_cpus(text))
+
+
+@timed()
+def extract_top_sql_text(text):
+    """
+    ``extract_top_sql`` for a text-format report. Each statement's row is
+    followed by its "Module:" line and the start of its SQL text.
+    """
+    result = TopSQL()
+    numeric_names = set(TopSQL.NUMERIC_COLUMNS)
+    sections = 0
+    section = None
+    current = None  # row of the statement whose module/text lines follow
+    for cells, headers, line in _iter_text_rows(text):
+        if headers is None:
+            heading = _TEXT_TOP_SQL_HEADING.match(line)
+            if heading:
+                section = heading.group(1)
+                sections += 1
+            elif 'DB/Inst:' in line:
+                section = None  # title of some other section
+            current = None
+            continue
+        if section is None or 'SQL Id' not in headers:
+            continue
+        row = dict(zip(headers, cells)) if len(cells) == len(headers) else {}
+        if _SQL_ID.match(row.get('SQL Id', '')):
+            current = result._row(row['SQL Id'])
+            for name, value in row.items():
+                if name in numeric_names:
+                    column = result.numeric[name]
+                    if column[current] != column[current]:  # only fill values still NaN
+                        column[current] = _to_float(value)
+        elif current is not None:
+            stripped = line.strip()
+            if stripped.startswith('Module:'):
+                if not result.text['SQL Module'][current]:
+                    result.text['SQL Module'][current] = stripped[len('Module:'):].strip()
+            elif not result.text['SQL Text'][current]:
+                result.text['SQL Text'][current] = stripped
+
+    count('top_sql_sections', sections)
+    count('top_sql_statements', len(result))
+    return result
+
+
+@timed()
+def extract_report_info_text(text):
+    """``extract_report_info`` for a text-format report."""
+    info = {'db_name': None, 'instance': None, 'snap_begin': None, 'snap_end': None}
+    for cells, headers, _ in _iter_text_rows(text):
+        if headers and len(cells) == len(headers):
+            _fill_identity(info, headers, cells)
+        if len(cells) >= 3 and cells[0].startswith('Begin Snap:'):
+            info['snap_begin'] = _snap_time(cells[2])
+        elif len(cells) >= 3 and cells[0].startswith('End Snap:'):
+            info['snap_end'] = _snap_time(cells[2])
+        if all(info.values()):
+            break
+    return info
+
+
+# Sections holding the rows extract_metrics looks for; the header (summary
+# tables before the first section) is always included.
+METRIC_SECTIONS = (
+    'Load Profile',
+    'Instance Efficiency Percentages',
+    'Top 10 Foreground Events',
+    'Top 5 Timed',
+    'Host CPU',
+    'Instance CPU',
+    'Shared Pool Statistics',
+    'Time Model Statistics',
+)
+
+
+def _text_report(index):
+    """The decoded report when ``index`` holds a text-format report, else None."""
+    if index.sections or detect_format(index.buf) != 'text':
+        return None
+    return bytes(index.buf)
+
+
+@timed()
+def extract_metrics_indexed(index, encoding='utf-8'):
+    """
+    ``extract_metrics`` over only the header and METRIC_SECTIONS slices of a
+    SectionIndex. Text-format reports go to ``extract_metrics_text``; an HTML
+    report with no recognisable sections is streamed whole.
+    """
+    text = _text_report(index)
+    if text is not None:
+        return extract_metrics_text(text.decode(encoding))
+    if not index.sections:
+        return extract_metrics_stream(io.BytesIO(index.buf), encoding=encoding)
+    return extract_metrics_stream(io.BytesIO(index.extract(*METRIC_SECTIONS, header=True)),
+                                  encoding=encoding)
+
+
+def extract_top_sql_indexed(index, encoding='utf-8'):
+    """``extract_top_sql`` over only the "SQL ordered by" slices of a SectionIndex."""
+    text = _text_report(index)
+    if text is not None:
+        return extract_top_sql_text(text.decode(encoding))
+    return extract_top_sql(index.text('SQL ordered by', encoding=encoding))
+
+
+def extract_report_info_indexed(index, encoding='utf-8'):
+    """``extract_report_info`` over only the header slice of a SectionIndex."""
+    text = _text_report(index)
+    if text is not None:
+        return extract_report_info_text(text.decode(encoding))
+    return extract_report_info(index.header().decode(encoding))
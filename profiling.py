@@ -0,0 +1,147 @@
+"""
+Lightweight per-stage timing and counters for the analysis pipeline.
+
+Nothing is recorded unless a Profile is active in the current context, so the
+instrumented functions cost one context-variable lookup when profiling is off:
+
+    with capture(cprofile=True) as profile:
+        extract_metrics(html_text)
+    profile.to_json()
+"""
+import io
+import json
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from time import perf_counter
+
+_current = ContextVar('awr_profile', default=None)
+
+
+class Profile:
+    """Timings, counters and optional cProfile/tracemalloc results for one run."""
+
+    def __init__(self, cprofile=False, trace_memory=False, top=25):
+        self.use_cprofile = cprofile
+        self.trace_memory = trace_memory
+        self.top = top
+        self.stages = {}    # name -> [calls, seconds]
+        self.counters = {}
+        self.cprofile_stats = None
+        self.memory = None
+        self._profiler = None
+        self._token = None
+        self._started = None
+        self.total_seconds = None
+
+    def add_stage(self, name, seconds):
+        entry = self.stages.setdefault(name, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+    def add_count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def start(self):
+        self._token = _current.set(self)
+        if self.trace_memory:
+            import tracemalloc
+            tracemalloc.start()
+        if self.use_cprofile:
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        self._started = perf_counter()
+        return self
+
+    def stop(self):
+        self.total_seconds = perf_counter() - self._started
+        if self._profiler is not None:
+            import pstats
+            self._profiler.disable()
+            out = io.StringIO()
+            pstats.Stats(self._profiler, stream=out).sort_stats('cumulative').print_stats(self.top)
+            self.cprofile_stats = out.getvalue()
+            self._profiler = None
+        if self.trace_memory:
+            import tracemalloc
+            current, peak = tracemalloc.get_traced_memory()
+            top = tracemalloc.take_snapshot().statistics('lineno')[:self.top]
+            tracemalloc.stop()
+            self.memory = {
+                'current_bytes': current,
+                'peak_bytes': peak,
+                'top_allocations': [
+                    {'location': str(stat.traceback), 'size_bytes': stat.size, 'count': stat.count}
+                    for stat in top],
+            }
+        if self._token is not None:
+            _current.reset(self._token)
+            self._token = None
+        return self
+
+    def to_dict(self):
+        return {
+            'total_seconds': self.total_seconds,
+            'stages': {name: {'calls': calls, 'seconds': round(seconds, 6)}
+                       for name, (calls, seconds) in self.stages.items()},
+            'counters': dict(self.counters),
+            'memory': self.memory,
+            'cprofile': self.cprofile_stats,
+        }
+
+    def to_json(self, indent=2):
+        return json.dumps(self.to_dict(), indent=indent)
+
+
+@contextmanager
+def capture(cprofile=False, trace_memory=False):
+    """Record every instrumented stage run inside the block."""
+    profile = Profile(cprofile, trace_memory).start()
+    try:
+        yield profile
+    finally:
+        profile.stop()
+
+
+def active():
+    """The Profile recording in this context, or None."""
+    return _current.get()
+
+
+@contextmanager
+def stage(name):
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_stage(name, perf_counter() - start)
+
+
+def timed(name=None):
+    """Decorator recording each call of the function as a stage."""
+    def decorate(func):
+        stage_name = name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            profile = _current.get()
+            if profile is None:
+                return func(*args, **kwargs)
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profile.add_stage(stage_name, perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def count(name, n=1):
+    profile = _current.get()
+    if profile is not None:
+        profile.add_count(name, n)
@@ -0,0 +1,200 @@
+"""
+Per-instance metrics from global (RAC) AWR reports (awrgrpt_*.html).
+
+Besides the cluster-wide summary, a global report has tables with one row
+per instance keyed by ``I#``. Reading those rows into one flat dict mixes
+values from different nodes, so each per-instance section is parsed on its
+own and the rows are joined on I# into a frame that uses the same metric
+names as ``extract_metrics``.
+"""
+from datetime import datetime
+
+from parser import derive_cpu_utilization, iter_tables
+from profiling import count, timed
+from rules import NO_ISSUES, RULES, generate_recommendations_batch
+
+INSTANCES_SECTION = 'Database Instances Included In Report'
+# Instance name the cluster-wide row of a global report is stored under
+CLUSTER_INSTANCE = '*'
+
+# Per-instance sections: column -> (metric, factor to the single-instance unit)
+INSTANCE_COLUMNS = {
+    'OS Statistics By Instance': {
+        'Num CPUs': ('cpu_cores', 1),
+        '% Busy': ('host_cpu_busy_pct', 1),
+        '% Idle': ('cpu_idle_pct', 1),
+    },
+    'Time Model': {
+        'DB time': ('db_time_seconds', 1),
+        'DB CPU': ('db_cpu_seconds', 1),
+    },
+    'Instance Efficiency Percentages': {
+        'Buffer Hit %': ('buffer_cache_hit_ratio', 1),
+        'Library Hit %': ('library_hit_pct', 1),
+        'Soft Parse %': ('soft_parse_pct', 1),
+        'Latch Hit %': ('latch_hit_pct', 1),
+    },
+    'System Statistics - Per Second': {
+        'Logical Reads/s': ('logical_reads', 1),
+        'Physical Reads/s': ('physical_reads', 1),
+        'Physical Writes/s': ('physical_writes', 1),
+        'Redo Size (k)/s': ('redo_size_bytes', 1024),
+        'User Calls/s': ('user_calls', 1),
+        'Execs/s': ('executions', 1),
+        'Logons/s': ('logons', 1),
+    },
+}
+
+# Metrics that add up across the cluster; the rest are averaged, and CPU
+# utilisation is weighted by each node's cores
+CLUSTER_SUM = ('cpu_cores', 'db_time_seconds', 'db_cpu_seconds', 'logical_reads', 'physical_reads',
+               'physical_writes', 'redo_size_bytes', 'user_calls', 'executions', 'logons')
+
+# Sections at least this large are handed to the executor, if one is given;
+# below it the round trip to a worker costs more than parsing in place
+PARALLEL_MIN_BYTES = 1 << 20
+
+
+def _number(text):
+    try:
+        return float(text.replace(',', ''))
+    except ValueError:
+        return None
+
+
+def _instance_rows(html_text):
+    """Yield ``(headers, row)`` for the rows of every I#-keyed table."""
+    for headers, rows in iter_tables(html_text):
+        if not headers or headers[0] != 'I#':
+            continue
+        for row in rows:
+            # Skip the Sum/Avg/Std Dev rows some versions append
+            if len(row) == len(headers) and row[0].isdigit():
+                yield headers, row
+
+
+def parse_instance_section(key, html_text):
+    """``{I#: {metric: value}}`` from one per-instance section of INSTANCE_COLUMNS."""
+    columns = INSTANCE_COLUMNS[key]
+    result = {}
+    for headers, row in _instance_rows(html_text):
+        metrics = result.setdefault(int(row[0]), {})
+        for name, value in zip(headers, row):
+            if name in columns:
+                metric, factor = columns[name]
+                number = _number(value)
+                if number is not None:
+                    metrics[metric] = number * factor
+    return result
+
+
+def _parse_instances(html_text):
+    """``{I#: {'instance', 'host', 'snap_duration_seconds'}}`` from the instance list."""
+    result = {}
+    for headers, row in _instance_rows(html_text):
+        row = dict(zip(headers, row))
+        info = result[int(row['I#'])] = {'instance': row.get('Instance'), 'host': row.get('Host')}
+        try:
+            begin = datetime.strptime(row['Begin Snap Time'], '%d-%b-%y %H:%M')
+            end = datetime.strptime(row['End Snap Time'], '%d-%b-%y %H:%M')
+        except (KeyError, ValueError):
+            continue
+        duration = (end - begin).total_seconds()
+        info['snap_duration_seconds'] = duration + 86400 if duration < 0 else duration
+    return result
+
+
+@timed()
+def extract_instance_metrics(index, executor=None, min_parallel_bytes=PARALLEL_MIN_BYTES,
+                             encoding='utf-8'):
+    """
+    Per-instance metrics of a global report as a DataFrame indexed by I#,
+    with ``instance`` and ``host`` columns, or None when the report has no
+    per-instance tables.
+
+    Each section is parsed independently; sections of at least
+    ``min_parallel_bytes`` go to ``executor`` (e.g. a ProcessPoolExecutor)
+    when one is given.
+    """
+    listing = index.find(INSTANCES_SECTION)
+    if not listing:
+        return None
+    instances = _parse_instances(b''.join(index.slice(s) for s in listing).decode(encoding))
+    if not instances:
+        return None
+
+    parsed, pending = [], []
+    for key in INSTANCE_COLUMNS:
+        for section in index.find(key):
+            html_text = index.slice(section).decode(encoding)
+            if executor is not None and len(html_text) >= min_parallel_bytes:
+                pending.append(executor.submit(parse_instance_section, key, html_text))
+            else:
+                parsed.append(parse_instance_section(key, html_text))
+    parsed.extend(future.result() for future in pending)
+    count('instance_sections', len(parsed))
+    count('instance_sections_parallel', len(pending))
+
+    for section in parsed:
+        for inum, metrics in section.items():
+            instances.setdefault(inum, {'instance': None, 'host': None}).update(metrics)
+    for metrics in instances.values():
+        derive_cpu_utilization(metrics, metrics.get('snap_duration_seconds', 1800),
+                               metrics.get('cpu_cores', 1))
+
+    import pandas as pd
+
+    frame = pd.DataFrame.from_dict(instances, orient='index').sort_index()
+    frame.index.name = 'I#'
+    return frame
+
+
+def cluster_aggregates(frame):
+    """Cluster-wide metrics from a per-instance frame: sums, means and core-weighted CPU."""
+    numeric = frame.select_dtypes('number')
+    cluster = {}
+    for metric in numeric.columns:
+        column = numeric[metric].dropna()
+        if column.empty:
+            continue
+        cluster[metric] = round(float(column.sum() if metric in CLUSTER_SUM else column.mean()), 2)
+    if 'cpu_utilization_pct' in numeric and 'cpu_cores' in numeric:
+        cores = numeric['cpu_cores'].fillna(0)
+        if cores.sum() > 0:
+            cluster['cpu_utilization_pct'] = round(
+                float((numeric['cpu_utilization_pct'].fillna(0) * cores).sum() / cores.sum()), 2)
+    return cluster
+
+
+def snapshot_rows(metrics, info, instances):
+    """
+    ``(info, metrics)`` rows to store for one report. A global report gives a
+    row under CLUSTER_INSTANCE with the cluster aggregates, then one per node
+    under its own instance name with its per-instance metrics; its flat
+    metrics mix nodes, so they are not stored.
+    """
+    if instances is None:
+        return [(info, metrics)]
+    rows = [(dict(info, instance=CLUSTER_INSTANCE), cluster_aggregates(instances))]
+    for inum, values in instances.select_dtypes('number').iterrows():
+        name = instances.at[inum, 'instance'] or f'instance {inum}'
+        rows.append((dict(info, instance=name), values.dropna().to_dict()))
+    return rows
+
+
+def instance_recommendations(frame, rules=RULES):
+    """
+    Recommendations for each node, prefixed with its instance and host. Only
+    rules on metrics the per-instance tables report are evaluated.
+    """
+    rules = [rule for rule in rules if rule.metric in frame.columns]
+    if not rules:
+        return []
+    recs = generate_recommendations_batch(frame, rules)
+    messages = []
+    for inum, node_recs in recs.items():
+        name = frame.at[inum, 'instance'] or f'instance {inum}'
+        host = frame.at[inum, 'host']
+        label = f"{name} ({host})" if host else name
+        messages.extend(f"{label}: {rec}" for rec in node_recs if rec != NO_ISSUES)
+    return messages
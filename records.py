@@ -0,0 +1,168 @@
+"""
+Fixed-schema metric records for holding many snapshots in memory.
+
+A parsed report's metrics are a dict of ~20 string keys, which costs about a
+kilobyte per snapshot. MetricRecord stores the same values in ``__slots__``
+and MetricBatch stores many snapshots as one float64 block (8 bytes per
+value), which pandas and the vectorised rules wrap without copying. Both use
+NaN for a metric the report did not have.
+"""
+import math
+from collections.abc import Mapping
+
+from parser import METRIC_MAP
+
+# Every metric extract_metrics can return: the METRIC_MAP targets, then the
+# values it derives, then the extra ones of global (RAC) report aggregates
+METRIC_FIELDS = tuple(dict.fromkeys(
+    tuple(METRIC_MAP.values()) + ('snap_duration_seconds', 'cpu_cores')
+    + ('db_time_seconds', 'host_cpu_busy_pct')))
+FIELD_INDEX = {name: i for i, name in enumerate(METRIC_FIELDS)}
+
+_NAN = float('nan')
+
+
+def _number(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return float(value)
+
+
+class MetricRecord(Mapping):
+    """
+    One snapshot's metrics as a read-only mapping over METRIC_FIELDS.
+
+    Behaves like the metrics dict for ``get``, ``[]``, ``items`` and ``in``;
+    unset (NaN) fields are absent. Keys outside the schema are dropped.
+    """
+
+    __slots__ = METRIC_FIELDS
+
+    def __init__(self, metrics=(), **kwargs):
+        for name in METRIC_FIELDS:
+            object.__setattr__(self, name, _NAN)
+        for name, value in dict(metrics, **kwargs).items():
+            value = _number(value)
+            if name in FIELD_INDEX and value is not None:
+                object.__setattr__(self, name, value)
+
+    @classmethod
+    def from_values(cls, values):
+        """Record from a sequence of floats in METRIC_FIELDS order."""
+        record = cls.__new__(cls)
+        for name, value in zip(METRIC_FIELDS, values):
+            object.__setattr__(record, name, float(value))
+        return record
+
+    def __setattr__(self, name, value):
+        raise AttributeError("MetricRecord is read-only")
+
+    def get(self, name, default=None):
+        if name in FIELD_INDEX:
+            value = getattr(self, name)
+            if value == value:
+                return value
+        return default
+
+    def __getitem__(self, name):
+        value = self.get(name, _NAN)
+        if value != value:
+            raise KeyError(name)
+        return value
+
+    def __iter__(self):
+        return (name for name in METRIC_FIELDS if not math.isnan(getattr(self, name)))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def values_tuple(self):
+        """All fields in METRIC_FIELDS order, NaN where unset."""
+        return tuple(getattr(self, name) for name in METRIC_FIELDS)
+
+    def __reduce__(self):
+        return MetricRecord.from_values, (self.values_tuple(),)
+
+    def __repr__(self):
+        return f"MetricRecord({dict(self)!r})"
+
+
+class MetricBatch:
+    """
+    Many snapshots' metrics as one float64 block, one row per snapshot.
+
+    The block is stored column-major so each metric is a contiguous array;
+    ``column``, ``values`` and ``to_frame`` are views of it. Appending past the
+    capacity reallocates, after which earlier views no longer track the batch.
+    """
+
+    def __init__(self, capacity=64):
+        import numpy as np
+
+        self._block = np.full((len(METRIC_FIELDS), max(capacity, 1)), np.nan)
+        self.keys = []
+
+    @classmethod
+    def from_records(cls, records, keys=None):
+        """Batch from metric dicts or MetricRecords; ``keys`` label the rows."""
+        records = list(records)
+        batch = cls(len(records))
+        keys = range(len(records)) if keys is None else keys
+        for key, metrics in zip(keys, records):
+            batch.append(metrics, key)
+        return batch
+
+    def __len__(self):
+        return len(self.keys)
+
+    def append(self, metrics, key=None):
+        """Add one snapshot; ``key`` labels the row (default: its position)."""
+        import numpy as np
+
+        n = len(self.keys)
+        if n == self._block.shape[1]:
+            grown = np.full((len(METRIC_FIELDS), 2 * n), np.nan)
+            grown[:, :n] = self._block
+            self._block = grown
+        if isinstance(metrics, MetricRecord):
+            self._block[:, n] = metrics.values_tuple()
+        else:
+            for name, value in metrics.items():
+                value = _number(value)
+                if name in FIELD_INDEX and value is not None:
+                    self._block[FIELD_INDEX[name], n] = value
+        self.keys.append(n if key is None else key)
+
+    @property
+    def values(self):
+        """``(len(self), len(METRIC_FIELDS))`` view of the block."""
+        return self._block[:, :len(self.keys)].T
+
+    def column(self, name):
+        return self._block[FIELD_INDEX[name], :len(self.keys)]
+
+    def record(self, i):
+        return MetricRecord.from_values(self._block[:, i])
+
+    def __iter__(self):
+        return (self.record(i) for i in range(len(self.keys)))
+
+    def to_structured(self):
+        """Copy of the rows as a NumPy structured array with one float64 field per metric."""
+        import numpy as np
+
+        dtype = np.dtype([(name, np.float64) for name in METRIC_FIELDS])
+        return np.ascontiguousarray(self.values).view(dtype).reshape(len(self.keys))
+
+    def to_frame(self, names=None):
+        """
+        DataFrame indexed by the row keys whose values share memory with the
+        batch. ``names`` names the levels of tuple keys.
+        """
+        import pandas as pd
+
+        if names is None:
+            index = pd.Index(self.keys)
+        else:
+            index = pd.MultiIndex.from_tuples(self.keys, names=names)
+        return pd.DataFrame(self.values, index=index, columns=list(METRIC_FIELDS), copy=False)
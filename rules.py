@@ -1,117 +1,162 @@
-def generate_recommendations(metrics):
-    recs = []
+import operator
+from collections import namedtuple
 
-    # Database efficiency metrics
-    if metrics.get('buffer_cache_hit_ratio', 100) < 90:
-        recs.append("🔧 Low buffer cache hit ratio. Increase DB_CACHE_SIZE.")
+from profiling import timed
 
-    if metrics.get('parse_calls', 0) > 300:
-        recs.append("🔧 High parse calls. Enable cursor sharing and bind variables.")
+# One threshold check. A recommendation fires when
+# ``metrics.get(metric, default) <op> threshold``; ``threshold`` may be a Ref to
+# compare against another metric instead of a constant.
+Rule = namedtuple('Rule', ['metric', 'op', 'threshold', 'message', 'default', 'severity'])
+Ref = namedtuple('Ref', ['metric', 'default'])
 
-    if metrics.get('library_hit_pct', 100) < 95:
-        recs.append("🔧 Low library cache efficiency. Tune shared pool size or reduce parsing.")
+OPS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
 
-    if metrics.get('soft_parse_pct', 100) < 90:
-        recs.append("🔧 Low soft parse ratio. Optimize application to use bind variables.")
-    
-    if metrics.get('hard_parses', 0) > 100:
-        recs.append("🔧 Excessive hard parsing. Check bind variables or use CURSOR_SHARING=FORCE.")
+NO_ISSUES = "✅ No critical performance issues detected."
 
-    # Memory metrics
-    if metrics.get('shared_pool_free_percent', 100) < 10:
-        recs.append("🔧 Low free space in shared pool. Consider increasing SHARED_POOL_SIZE.")
+RULES = [
+    # Database efficiency metrics
+    Rule('buffer_cache_hit_ratio', '<', 90, "🔧 Low buffer cache hit ratio. Increase DB_CACHE_SIZE.", 100, 'info'),
+    Rule('parse_calls', '>', 300, "🔧 High parse calls. Enable cursor sharing and bind variables.", 0, 'warning'),
+    Rule('library_hit_pct', '<', 95, "🔧 Low library cache efficiency. Tune shared pool size or reduce parsing.", 100, 'info'),
+    Rule('soft_parse_pct', '<', 90, "🔧 Low soft parse ratio. Optimize application to use bind variables.", 100, 'info'),
+    Rule('hard_parses', '>', 100, "🔧 Excessive hard parsing. Check bind variables or use CURSOR_SHARING=FORCE.", 0, 'warning'),
 
-    if metrics.get('memory_usage_pct', 0) > 90:
-        recs.append("🔧 High memory usage. Investigate memory-intensive processes.")
-    
-    if metrics.get('pga_cache_hit_percent', 100) < 60:
-        recs.append("🔧 Low PGA cache hit. Increase PGA_AGGREGATE_TARGET.")
+    # Memory metrics
+    Rule('shared_pool_free_percent', '<', 10, "🔧 Low free space in shared pool. Consider increasing SHARED_POOL_SIZE.", 100, 'info'),
+    Rule('memory_usage_pct', '>', 90, "🔧 High memory usage. Investigate memory-intensive processes.", 0, 'warning'),
+    Rule('pga_cache_hit_percent', '<', 60, "🔧 Low PGA cache hit. Increase PGA_AGGREGATE_TARGET.", 100, 'info'),
 
     # I/O metrics
-    if metrics.get('physical_reads', 0) > 10000:
-        recs.append("🔧 High physical reads. Investigate inefficient SQL or missing indexes.")
-
-    if metrics.get('physical_writes', 0) > 10000:
-        recs.append("🔧 High physical writes. Optimize write operations and checkpointing.")
-    
-    if metrics.get('redo_size_bytes', 0) > 10000000:  # 10 MB
-        recs.append("🔧 High redo generation. Investigate frequent DMLs or logging overhead.")
+    Rule('physical_reads', '>', 10000, "🔧 High physical reads. Investigate inefficient SQL or missing indexes.", 0, 'warning'),
+    Rule('physical_writes', '>', 10000, "🔧 High physical writes. Optimize write operations and checkpointing.", 0, 'warning'),
+    Rule('redo_size_bytes', '>', 10000000, "🔧 High redo generation. Investigate frequent DMLs or logging overhead.", 0, 'warning'),  # 10 MB
 
     # CPU and timing metrics
-    if metrics.get('cpu_utilization_pct', 0) > 80:
-        recs.append("🔧 High CPU usage. Identify CPU-intensive SQL or processes.")
-
-    if metrics.get('db_time_ratio', 0) > 90:
-        recs.append("🔧 High DB Time. Investigate top wait events and SQLs.")
-
-    if metrics.get('sql_response_time', 0) > 1:
-        recs.append("🔧 Poor SQL response time. Check indexes and joins.")
+    Rule('cpu_utilization_pct', '>', 80, "🔧 High CPU usage. Identify CPU-intensive SQL or processes.", 0, 'warning'),
+    Rule('db_time_ratio', '>', 90, "🔧 High DB Time. Investigate top wait events and SQLs.", 0, 'warning'),
+    Rule('sql_response_time', '>', 1, "🔧 Poor SQL response time. Check indexes and joins.", 0, 'info'),
 
     # Concurrency and contention
-    if metrics.get('enqueue_waits', 0) > 0:
-        recs.append("🔧 Enqueue waits detected. Investigate object contention.")
-
-    if metrics.get('latch_misses', 0) > 100:
-        recs.append("🔧 High latch misses. Tune latch-related parameters or reduce contention.")
-
-    if metrics.get('log_file_sync', 0) > 10:
-        recs.append("🔧 High log file sync time. Check I/O performance or commit frequency.")
+    Rule('enqueue_waits', '>', 0, "🔧 Enqueue waits detected. Investigate object contention.", 0, 'warning'),
+    Rule('latch_misses', '>', 100, "🔧 High latch misses. Tune latch-related parameters or reduce contention.", 0, 'warning'),
+    Rule('log_file_sync', '>', 10, "🔧 High log file sync time. Check I/O performance or commit frequency.", 0, 'warning'),
 
     # Transaction metrics
-    if metrics.get('user_commits', 0) < metrics.get('user_rollbacks', 1):
-        recs.append("🔧 Rollbacks are more than commits. Investigate transaction failures.")
-
-    if metrics.get('transaction_count', 0) > 5000:
-        recs.append("🔧 High transaction volume. Consider batching operations.")
+    Rule('user_commits', '<', Ref('user_rollbacks', 1), "🔧 Rollbacks are more than commits. Investigate transaction failures.", 0, 'warning'),
+    Rule('transaction_count', '>', 5000, "🔧 High transaction volume. Consider batching operations.", 0, 'warning'),
 
     # SQL execution metrics
-    if metrics.get('full_table_scans', 0) > 1000:
-        recs.append("🔧 Many full table scans. Investigate missing indexes or rewrite queries.")
+    Rule('full_table_scans', '>', 1000, "🔧 Many full table scans. Investigate missing indexes or rewrite queries.", 0, 'warning'),
+    Rule('top_sql_buffer_gets', '>', 100000, "🔧 SQL with high buffer gets. Tune expensive queries.", 0, 'warning'),
+    Rule('sorts_disk', '>', 1000, "🔧 High disk sorts. Increase SORT_AREA_SIZE or use temporary tablespaces.", 0, 'warning'),
+    Rule('memory_sort_percent', '<', 80, "🔧 Most sorts not in memory. Increase workarea_size_policy or PGA.", 100, 'info'),
 
-    if metrics.get('top_sql_buffer_gets', 0) > 100000:
-        recs.append("🔧 SQL with high buffer gets. Tune expensive queries.")
+    # Storage and configuration
+    Rule('db_files', '>', 1000, "🔧 Too many database files. Could affect startup time and file I/O.", 0, 'info'),
+    Rule('log_switches', '>', 30, "🔧 Frequent log switches. Consider increasing log file size.", 0, 'info'),
+    Rule('checkpoint_time', '>', 5, "🔧 Long checkpoints. Tune checkpoint parameters or log buffer.", 0, 'info'),
+    Rule('log_file_parallel_write', '>', 10, "🔧 Slow log writes. Investigate redo log disk I/O.", 0, 'warning'),
 
-    if metrics.get('sorts_disk', 0) > 1000:
-        recs.append("🔧 High disk sorts. Increase SORT_AREA_SIZE or use temporary tablespaces.")
+    # Top wait events analysis
+    Rule('top_wait_event', '==', "db file sequential read", "🔧 Index reads dominating. Investigate slow I/O on indexed reads.", "", 'warning'),
+    Rule('top_wait_event', '==', "db file scattered read", "🔧 Full table scans common. Check missing indexes.", "", 'info'),
+    Rule('top_wait_event', '==', "log file sync", "🔧 COMMIT frequency too high. Use batch processing.", "", 'info'),
+    Rule('top_wait_event', '==', "buffer busy waits", "🔧 Buffer contention. Tune hot blocks or increase freelists.", "", 'info'),
+    Rule('top_wait_event', '==', "enq: TX - row lock contention", "🔧 Row lock contention. Optimize transaction design and commit frequency.", "", 'info'),
 
-    if metrics.get('memory_sort_percent', 100) < 80:
-        recs.append("🔧 Most sorts not in memory. Increase workarea_size_policy or PGA.")
+    # Connection metrics
+    Rule('logons', '>', 100, "🔧 High connection rate. Implement connection pooling.", 0, 'warning'),
+    Rule('session_count', '>', 500, "🔧 High session count. Review connection management and pooling.", 0, 'warning'),
+]
 
-    # Storage and configuration
-    if metrics.get('db_files', 0) > 1000:
-        recs.append("🔧 Too many database files. Could affect startup time and file I/O.")
+# Message -> 'warning' or 'info', for display
+SEVERITY = {rule.message: rule.severity for rule in RULES}
 
-    if metrics.get('log_switches', 0) > 30:
-        recs.append("🔧 Frequent log switches. Consider increasing log file size.")
 
-    if metrics.get('checkpoint_time', 0) > 5:
-        recs.append("🔧 Long checkpoints. Tune checkpoint parameters or log buffer.")
+def severity(rec):
+    """
+    Severity of a recommendation message, which may carry an instance prefix
+    (``"orcl1 (host1): ..."``, see rac.py); None for NO_ISSUES or unknown text.
+    """
+    if rec in SEVERITY:
+        return SEVERITY[rec]
+    _, sep, message = rec.partition(': ')
+    return SEVERITY.get(message) if sep else None
 
-    if metrics.get('log_file_parallel_write', 0) > 10:
-        recs.append("🔧 Slow log writes. Investigate redo log disk I/O.")
 
-    # Top wait events analysis
-    top_wait = metrics.get('top_wait_event', "")
-    if top_wait == "db file sequential read":
-        recs.append("🔧 Index reads dominating. Investigate slow I/O on indexed reads.")
-    elif top_wait == "db file scattered read":
-        recs.append("🔧 Full table scans common. Check missing indexes.")
-    elif top_wait == "log file sync":
-        recs.append("🔧 COMMIT frequency too high. Use batch processing.")
-    elif top_wait == "buffer busy waits":
-        recs.append("🔧 Buffer contention. Tune hot blocks or increase freelists.")
-    elif top_wait == "enq: TX - row lock contention":
-        recs.append("🔧 Row lock contention. Optimize transaction design and commit frequency.")
+def _fires(rule, metrics):
+    threshold = rule.threshold
+    if isinstance(threshold, Ref):
+        threshold = metrics.get(threshold.metric, threshold.default)
+    return OPS[rule.op](metrics.get(rule.metric, rule.default), threshold)
 
-    # Connection metrics
-    if metrics.get('logons', 0) > 100:
-        recs.append("🔧 High connection rate. Implement connection pooling.")
 
-    if metrics.get('session_count', 0) > 500:
-        recs.append("🔧 High session count. Review connection management and pooling.")
+@timed()
+def generate_recommendations(metrics):
+    recs = [rule.message for rule in RULES if _fires(rule, metrics)]
 
     # If no issues found
     if not recs:
-        recs.append("✅ No critical performance issues detected.")
+        recs.append(NO_ISSUES)
 
     return recs
+
+
+def _column(df, metric, default):
+    import numpy as np
+
+    if metric not in df.columns:
+        return np.full(len(df), default, dtype=object if isinstance(default, str) else float)
+    return df[metric].fillna(default).to_numpy()
+
+
+def _frame(df):
+    from records import MetricBatch
+
+    return df.to_frame() if isinstance(df, MetricBatch) else df
+
+
+def rule_mask(df, rules=RULES):
+    """
+    Evaluate every rule over a DataFrame (or records.MetricBatch) with one row
+    of metrics per snapshot.
+
+    Returns a boolean array of shape (len(df), len(rules)); missing columns and
+    NaNs take the rule's default, as ``metrics.get`` does for a single dict.
+    """
+    import numpy as np
+
+    df = _frame(df)
+    mask = np.zeros((len(df), len(rules)), dtype=bool)
+    for j, rule in enumerate(rules):
+        threshold = rule.threshold
+        if isinstance(threshold, Ref):
+            threshold = _column(df, threshold.metric, threshold.default)
+        mask[:, j] = OPS[rule.op](_column(df, rule.metric, rule.default), threshold)
+    return mask
+
+
+@timed()
+def generate_recommendations_batch(df, rules=RULES):
+    """Recommendations for every row of ``df``, as a Series of message lists."""
+    import numpy as np
+    import pandas as pd
+
+    df = _frame(df)
+    mask = rule_mask(df, rules)
+    if not len(mask):
+        return pd.Series([], index=df.index, dtype=object)
+    messages = np.array([rule.message for rule in rules] + [NO_ISSUES], dtype=object)
+    # Rows with no firing rule point at the trailing NO_ISSUES entry
+    mask = np.hstack([mask, ~mask.any(axis=1, keepdims=True)])
+    rows, cols = np.nonzero(mask)
+    bounds = np.searchsorted(rows, np.arange(1, len(mask)))
+    recs = [chunk.tolist() for chunk in np.split(messages[cols], bounds)]
+    return pd.Series(recs, index=df.index, dtype=object)
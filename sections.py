@@ -0,0 +1,107 @@
+import html
+import mmap
+import re
+from collections import namedtuple
+
+Section = namedtuple('Section', ['title', 'start', 'end'])
+
+# AWR titles every section with an <h2>/<h3 class="awr"> heading
+_HEADING = re.compile(rb'<h([23])\b[^>]*>(.*?)</h\1\s*>', re.IGNORECASE | re.DOTALL)
+_TAG = re.compile(r'<[^>]*>')
+# A heading left open at the end of a chunk, or the start of one cut short
+_OPEN_HEADING = re.compile(rb'<h[23]\b|<h?\Z', re.IGNORECASE)
+
+
+def _title(raw):
+    text = raw.decode('utf-8', errors='replace')
+    return ' '.join(html.unescape(_TAG.sub('', text)).split())
+
+
+class SectionIndex:
+    """
+    Start/end byte offsets of the titled sections of an AWR HTML report.
+
+    Building the index is a single regex scan over the raw bytes (or a
+    memory-mapped file); no HTML is tokenised. Each section runs from its
+    heading to the next heading, and everything before the first heading
+    (the DB, host and snapshot summary tables) is the header.
+    """
+
+    def __init__(self, buf):
+        self.buf = buf
+        starts = [(m.start(), _title(m.group(2))) for m in _HEADING.finditer(buf)]
+        self.header_end = starts[0][0] if starts else len(buf)
+        self.sections = [
+            Section(title, start, starts[i + 1][0] if i + 1 < len(starts) else len(buf))
+            for i, (start, title) in enumerate(starts)
+        ]
+
+    @classmethod
+    def from_file(cls, path):
+        """Index a report on disk through a read-only memory map."""
+        with open(path, 'rb') as fh:
+            if not fh.seek(0, 2):
+                return cls(b'')
+            return cls(mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ))
+
+    @classmethod
+    def from_stream(cls, stream, keep=None, chunk_size=1 << 20):
+        """
+        Index a report read from a binary stream (e.g. a decompressing
+        reader). Only the header and the sections whose titles start with one
+        of the ``keep`` prefixes are held in memory; with ``keep=None`` the
+        whole report is.
+        """
+        keep = tuple(p.lower() for p in keep) if keep is not None else None
+        kept = bytearray()
+        buf = b''
+        keeping = True  # the header is always kept
+        while True:
+            chunk = stream.read(chunk_size)
+            buf += chunk
+            pos = 0
+            for m in _HEADING.finditer(buf):
+                if keeping:
+                    kept += buf[pos:m.start()]
+                keeping = keep is None or _title(m.group(2)).lower().startswith(keep)
+                if keeping:
+                    kept += m.group(0)
+                pos = m.end()
+            if not chunk:
+                if keeping:
+                    kept += buf[pos:]
+                return cls(bytes(kept))
+            # Carry over a heading that may be cut off at the chunk boundary
+            m = _OPEN_HEADING.search(buf, pos)
+            cut = m.start() if m else len(buf)
+            if len(buf) - cut > 65536:
+                cut = len(buf)
+            if keeping:
+                kept += buf[pos:cut]
+            buf = buf[cut:]
+
+    def __len__(self):
+        return len(self.sections)
+
+    def titles(self):
+        return [s.title for s in self.sections]
+
+    def find(self, *prefixes):
+        """Sections whose title starts with any of ``prefixes`` (case-insensitive), in order."""
+        prefixes = tuple(p.lower() for p in prefixes)
+        return [s for s in self.sections if s.title.lower().startswith(prefixes)]
+
+    def header(self):
+        return bytes(self.buf[:self.header_end])
+
+    def slice(self, section):
+        return bytes(self.buf[section.start:section.end])
+
+    def extract(self, *prefixes, header=False):
+        """Concatenated bytes of the matching sections, optionally preceded by the header."""
+        parts = [self.header()] if header else []
+        parts.extend(self.slice(s) for s in self.find(*prefixes))
+        return b''.join(parts)
+
+    def text(self, *prefixes, header=False, encoding='utf-8'):
+        return self.extract(*prefixes, header=header).decode(encoding)
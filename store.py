@@ -0,0 +1,238 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id INTEGER PRIMARY KEY,
+    content_hash TEXT NOT NULL UNIQUE,
+    db_name TEXT NOT NULL,
+    instance TEXT NOT NULL,
+    snap_begin TEXT NOT NULL,
+    snap_end TEXT NOT NULL,
+    source TEXT,
+    ingested_at TEXT NOT NULL
+);
+-- One report per snapshot, whichever file (plain, compressed, zipped, text)
+-- it came from
+CREATE UNIQUE INDEX IF NOT EXISTS reports_by_snapshot
+    ON reports (db_name, instance, snap_begin, snap_end);
+
+-- One row per metric per report. The snapshot keys are repeated here so a
+-- trend query is a single range scan of the primary key.
+CREATE TABLE IF NOT EXISTS metric_values (
+    db_name TEXT NOT NULL,
+    instance TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    snap_begin TEXT NOT NULL,
+    snap_end TEXT NOT NULL,
+    report_id INTEGER NOT NULL REFERENCES reports (id),
+    value REAL,
+    PRIMARY KEY (db_name, metric, snap_begin, instance, report_id)
+) WITHOUT ROWID;
+"""
+
+UNKNOWN_DB = 'UNKNOWN'
+
+
+class MetricStore:
+    """
+    Local SQLite store of parsed report metrics, keyed by DB name/instance and
+    snapshot begin/end time. A report is stored once per content hash and
+    once per snapshot, so ingesting it again, from the same file or another
+    copy of it, is a no-op.
+    """
+
+    def __init__(self, path=':memory:'):
+        self.path = path
+        # Streamlit serves sessions from several threads; the lock serialises
+        # access to the shared connection.
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def has_report(self, content_hash):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT 1 FROM reports WHERE content_hash = ?', (content_hash,)).fetchone()
+        return row is not None
+
+    def ingest(self, content_hash, metrics, info, source=None):
+        """
+        Append one report's metrics. ``info`` is the dict from
+        ``parser.extract_report_info``. Returns False if the report, or
+        another report of the same snapshot, was already stored; raises
+        ValueError if ``info`` has no snapshot times.
+        """
+        return bool(self.ingest_rows(content_hash, [(info, metrics)], source))
+
+    def ingest_rows(self, content_hash, rows, source=None):
+        """
+        Append the ``(info, metrics)`` rows of one report, e.g. the cluster and
+        per-instance rows of rac.snapshot_rows, in one transaction. The first
+        row is stored under ``content_hash`` and the rest under hashes derived
+        from it and their instance. Returns the rows that were not already
+        stored. Raises ValueError, storing nothing, when a row has no snapshot
+        begin or end time: it could be neither placed on the timeline nor
+        matched against another copy of the same snapshot.
+        """
+        for info, _ in rows:
+            missing = [k for k in ('snap_begin', 'snap_end') if not info.get(k)]
+            if missing:
+                raise ValueError(f"report has no {' or '.join(missing)} time")
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        stored = []
+        with self._lock, self._conn:
+            for i, (info, metrics) in enumerate(rows):
+                db_name = info.get('db_name') or UNKNOWN_DB
+                instance = info.get('instance') or ''
+                snap_begin = info['snap_begin']
+                snap_end = info['snap_end']
+                row_hash = content_hash if i == 0 else hashlib.sha256(
+                    f"{content_hash}/{instance}".encode()).hexdigest()
+                cur = self._conn.execute(
+                    'INSERT OR IGNORE INTO reports '
+                    '(content_hash, db_name, instance, snap_begin, snap_end, source, ingested_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (row_hash, db_name, instance, snap_begin, snap_end, source, now))
+                if not cur.rowcount:
+                    continue
+                report_id = cur.lastrowid
+                self._conn.executemany(
+                    'INSERT INTO metric_values '
+                    '(db_name, instance, metric, snap_begin, snap_end, report_id, value) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    [(db_name, instance, name, snap_begin, snap_end, report_id, float(value))
+                     for name, value in metrics.items()
+                     if isinstance(value, (int, float)) and not isinstance(value, bool)])
+                stored.append((info, metrics))
+        return stored
+
+    def databases(self):
+        """List the stored (db_name, instance) pairs."""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT DISTINCT db_name, instance FROM reports ORDER BY db_name, instance').fetchall()
+
+    def metric_names(self, db_name):
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT DISTINCT metric FROM metric_values WHERE db_name = ? ORDER BY metric',
+                (db_name,)).fetchall()
+        return [r[0] for r in rows]
+
+    def revision(self, db_name):
+        """Changes whenever a report of ``db_name`` is stored; for caching derived data."""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT COUNT(*), MAX(id) FROM reports WHERE db_name = ?', (db_name,)).fetchone()
+
+    def snap_range(self, db_name):
+        """Earliest and latest snapshot begin time stored for a database."""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT MIN(snap_begin), MAX(snap_begin) FROM reports WHERE db_name = ?',
+                (db_name,)).fetchone()
+
+    def query(self, db_name, metrics, start=None, end=None, instance=None):
+        """
+        Return ``(snap_begin, snap_end, instance, metric, value)`` rows for the
+        given metric names, ordered by time. ``start``/``end`` bound
+        ``snap_begin`` and are ISO strings or datetimes.
+        """
+        if isinstance(metrics, str):
+            metrics = [metrics]
+        if isinstance(start, datetime):
+            start = start.strftime('%Y-%m-%d %H:%M:%S')
+        if isinstance(end, datetime):
+            end = end.strftime('%Y-%m-%d %H:%M:%S')
+        sql = ('SELECT snap_begin, snap_end, instance, metric, value FROM metric_values '
+               'WHERE db_name = ? AND metric = ?')
+        params = [db_name]
+        if start is not None:
+            sql += ' AND snap_begin >= ?'
+        if end is not None:
+            sql += ' AND snap_begin <= ?'
+        if instance is not None:
+            sql += ' AND instance = ?'
+        rows = []
+        with self._lock:
+            for metric in metrics:
+                args = params + [metric]
+                args += [v for v in (start, end, instance) if v is not None]
+                rows.extend(self._conn.execute(sql, args).fetchall())
+        rows.sort(key=lambda r: (r[0], r[2], r[3]))
+        return rows
+
+    def load_batch(self, db_name, start=None, end=None, instance=None, last=None):
+        """
+        Every stored snapshot of ``db_name`` (or of one of its instances) as a
+        records.MetricBatch with one row per report, keyed by
+        ``(snap_begin, instance)`` and ordered by time. ``start``/``end`` bound
+        ``snap_begin`` as in ``query``; ``last`` keeps only the latest
+        ``last`` snapshots.
+        """
+        from records import METRIC_FIELDS, MetricBatch
+
+        if isinstance(start, datetime):
+            start = start.strftime('%Y-%m-%d %H:%M:%S')
+        if isinstance(end, datetime):
+            end = end.strftime('%Y-%m-%d %H:%M:%S')
+        bounds = ''
+        if start is not None:
+            bounds += ' AND snap_begin >= ?'
+        if end is not None:
+            bounds += ' AND snap_begin <= ?'
+        if instance is not None:
+            bounds += ' AND instance = ?'
+        args = [v for v in (start, end, instance) if v is not None]
+        with self._lock:
+            if last is None:
+                reports = self._conn.execute(
+                    f'SELECT id, snap_begin, instance FROM reports WHERE db_name = ?{bounds} '
+                    'ORDER BY snap_begin, instance, id', [db_name] + args).fetchall()
+            else:
+                reports = self._conn.execute(
+                    f'SELECT id, snap_begin, instance FROM reports WHERE db_name = ?{bounds} '
+                    'ORDER BY snap_begin DESC, instance DESC, id DESC LIMIT ?',
+                    [db_name] + args + [last]).fetchall()[::-1]
+                if reports:
+                    # The metric scans need only start at the oldest one kept
+                    bounds += ' AND snap_begin >= ?'
+                    args.append(reports[0][1])
+            batch = MetricBatch(len(reports))
+            rows = {}
+            for report_id, snap_begin, name in reports:
+                rows[report_id] = len(batch)
+                batch.append({}, (snap_begin, name))
+            # One primary key range scan per metric, as in query; values are
+            # written straight into the batch's columns
+            for metric in METRIC_FIELDS:
+                column = batch.column(metric)
+                for report_id, value in self._conn.execute(
+                        'SELECT report_id, value FROM metric_values '
+                        f'WHERE db_name = ? AND metric = ?{bounds}', [db_name, metric] + args):
+                    row = rows.get(report_id)
+                    if row is not None and value is not None:
+                        column[row] = value
+        return batch
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def default_store():
+    """Process-wide store at $AWR_STORE_PATH (default ``awr_metrics.db``)."""
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = MetricStore(os.environ.get('AWR_STORE_PATH', 'awr_metrics.db'))
+    return _default_store
@@ -0,0 +1,10 @@
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+for path in (ROOT, os.path.join(ROOT, 'bench')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+FIXTURES = os.path.join(HERE, 'fixtures')
@@ -0,0 +1,111 @@
+import math
+
+import numpy as np
+
+from baseline import Baseline, baseline_for, ingest, score_history
+from records import FIELD_INDEX, MetricBatch
+from store import MetricStore
+
+
+def _history(logons):
+    return MetricBatch.from_records([{'logons': v, 'user_calls': 100.0 + i % 5}
+                                     for i, v in enumerate(logons)])
+
+
+def test_constant_zero_window_flags_any_change():
+    baseline = Baseline.from_batch(_history([0] * 20), min_history=8)
+    scores, outside = baseline.score({'logons': 500, 'user_calls': 102})
+    i = FIELD_INDEX['logons']
+    assert outside[i] and math.isinf(scores[i]) and scores[i] > 0
+    [deviation] = baseline.deviations({'logons': 500, 'user_calls': 102})
+    assert deviation.metric == 'logons'
+
+    scores, outside = baseline.score({'logons': 0, 'user_calls': 102})
+    assert not outside[i] and scores[i] == 0
+
+
+def test_score_history_constant_zero_window():
+    scores, outside = score_history(_history([0] * 20 + [500, 0]), ['logons'], min_history=8)
+    assert outside[:, 0].tolist() == [False] * 20 + [True, False]
+    assert math.isinf(scores[20, 0]) and scores[21, 0] == 0
+
+
+def test_score_history_matches_baseline():
+    rng = np.random.default_rng(0)
+    logons = rng.normal(50, 5, 60).round(1).tolist()
+    logons[45] = 200
+    history = _history(logons)
+    scores, outside = score_history(history, ['logons'], window=30, min_history=8)
+    for row in (20, 45, 59):
+        baseline = Baseline(window=30, min_history=8)
+        for i in range(max(row - 30, 0), row):
+            baseline.update(history.record(i))
+        expected, flagged = baseline.score(history.record(row))
+        assert scores[row, 0] == expected[FIELD_INDEX['logons']]
+        assert outside[row, 0] == flagged[FIELD_INDEX['logons']]
+    assert outside[45, 0]
+
+
+def test_score_history_by_series():
+    # Two instances at different levels: pooled, each looks like an outlier
+    batch = MetricBatch.from_records(
+        [{'logons': 10.0 + i % 3} for i in range(20)] + [{'logons': 1000.0 + i % 3} for i in range(20)],
+        keys=[(i, 'a') for i in range(20)] + [(i, 'b') for i in range(20)])
+    _, outside = score_history(batch, ['logons'], min_history=8, by=lambda key: key[1])
+    assert not outside.any()
+    _, pooled = score_history(batch, ['logons'], min_history=8)
+    assert pooled.any()
+
+
+def _row(day, logons):
+    info = {'db_name': 'ORCL', 'instance': 'orcl1', 'snap_begin': f'2025-01-{day:02d} 10:00:00',
+            'snap_end': f'2025-01-{day:02d} 10:30:00'}
+    return info, {'logons': float(logons)}
+
+
+def test_baseline_for_follows_other_writers(tmp_path):
+    path = str(tmp_path / 'metrics.db')
+    store, other = MetricStore(path), MetricStore(path)
+    for day in range(1, 11):
+        info, metrics = _row(day, 10)
+        store.ingest(f'r{day}', metrics, info)
+    baseline = baseline_for(store, 'ORCL', 'orcl1')
+    assert len(baseline) == 10
+
+    # Stored through the registry: fed to the baseline, no re-seed
+    assert len(ingest(store, 'r11', [_row(11, 10)])) == 1
+    assert baseline_for(store, 'ORCL', 'orcl1') is baseline and len(baseline) == 11
+    assert ingest(store, 'r11', [_row(11, 10)]) == []
+    assert baseline_for(store, 'ORCL', 'orcl1') is baseline and len(baseline) == 11
+
+    # Stored by another connection (watch.py, batch runs, ...): re-seeded
+    info, metrics = _row(12, 10)
+    other.ingest('r12', metrics, info)
+    reseeded = baseline_for(store, 'ORCL', 'orcl1')
+    assert reseeded is not baseline and len(reseeded) == 12
+
+
+def test_reseed_reads_only_the_window(monkeypatch):
+    store = MetricStore()
+    for day in range(1, 21):
+        info, metrics = _row(day, day)
+        store.ingest(f'r{day}', metrics, info)
+    calls = []
+    load_batch = store.load_batch
+    monkeypatch.setattr(store, 'load_batch', lambda *a, **kw: calls.append(kw) or load_batch(*a, **kw))
+    baseline = baseline_for(store, 'ORCL', 'orcl1', window=5)
+    assert calls == [{'instance': 'orcl1', 'last': 5}]
+    assert len(baseline) == 5
+    assert sorted(key[0][:10] for key in baseline._keys) == [f'2025-01-{d}' for d in range(16, 21)]
+
+
+def test_ingest_writes_without_the_registry_lock(monkeypatch):
+    import baseline
+
+    store = MetricStore()
+    held = []
+    ingest_rows = store.ingest_rows
+    monkeypatch.setattr(store, 'ingest_rows', lambda *a, **kw: held.append(
+        baseline._baselines_lock.locked()) or ingest_rows(*a, **kw))
+    assert len(ingest(store, 'r1', [_row(1, 10)])) == 1
+    assert held == [False]
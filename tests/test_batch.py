@@ -0,0 +1,60 @@
+import csv
+import gzip
+import json
+
+import pytest
+
+from batch import find_reports, run_batch, write_rows
+from synth_awr import generate_report
+
+
+@pytest.fixture
+def reports(tmp_path):
+    html = generate_report(n_sql=5, seed=4).encode('utf-8')
+    (tmp_path / 'a.html').write_bytes(html)
+    (tmp_path / 'b.html.gz').write_bytes(gzip.compress(html))
+    # A gzip header followed by garbage
+    (tmp_path / 'c.html.gz').write_bytes(gzip.compress(html)[:10] + b'not deflate data' * 64)
+    (tmp_path / 'd.txt').write_bytes(generate_report(n_sql=5, seed=4, fmt='text').encode('utf-8'))
+    return find_reports([str(tmp_path)])
+
+
+def test_run_batch_reports_a_bad_file_and_carries_on(reports):
+    rows = run_batch(reports, workers=2)
+    assert [row['file'] for row in rows] == reports
+    errors = {row['file'].rsplit('/', 1)[-1]: row['error'] for row in rows}
+    assert [name for name, error in errors.items() if error] == ['c.html.gz']
+    assert 'decompressing' in errors['c.html.gz']
+    good = [row for row in rows if not row['error']]
+    assert len({row['buffer_cache_hit_ratio'] for row in good}) == 1
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'jsonl', 'parquet'])
+def test_write_rows(tmp_path, fmt):
+    rows = [{'file': 'a.html', 'member': None, 'error': None, 'logons': 4.1,
+             'recommendations': 'x | y'},
+            {'file': 'b.zip', 'member': 'c.html', 'error': 'OSError: bad', 'instances': 2}]
+    output = tmp_path / f'out.{fmt}'
+    write_rows(rows, str(output), fmt)
+    columns = ['file', 'member', 'error', 'logons', 'recommendations', 'instances']
+    if fmt == 'jsonl':
+        assert [json.loads(line) for line in output.read_text().splitlines()] == rows
+    elif fmt == 'csv':
+        with open(output, newline='') as fh:
+            read = list(csv.DictReader(fh))
+        assert list(read[0]) == columns
+        assert read[0]['logons'] == '4.1' and read[0]['instances'] == ''
+        assert read[1]['member'] == 'c.html' and read[1]['error'] == 'OSError: bad'
+    else:
+        pytest.importorskip('pyarrow')
+        import pandas as pd
+
+        frame = pd.read_parquet(output)
+        assert list(frame.columns) == columns
+        assert frame['logons'].iloc[0] == 4.1 and frame['instances'].iloc[1] == 2
+        assert frame['error'].iloc[1] == 'OSError: bad'
+
+
+def test_write_rows_rejects_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        write_rows([], str(tmp_path / 'out.xlsx'), 'xlsx')
@@ -0,0 +1,154 @@
+import gzip
+import io
+import os
+import pickle
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import cache
+from cache import ReportCache, content_hash, parse_many, report_cache, report_key
+from synth_awr import generate_report
+
+
+class RecordingPool(ThreadPoolExecutor):
+    def __init__(self):
+        super().__init__(max_workers=2)
+        self.submitted = []
+
+    def submit(self, fn, *args, **kwargs):
+        self.submitted.append(args)
+        return super().submit(fn, *args, **kwargs)
+
+
+def test_parse_many_sends_workers_only_their_member(monkeypatch):
+    reports = {f'db{i}/awrrpt_{i}.html': generate_report(n_sql=5, seed=20 + i, db_name=f'DB{i}')
+               .encode('utf-8') for i in range(3)}
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name, data in reports.items():
+            zf.writestr(name, data)
+        zf.writestr('db3/awrrpt_3.html.gz', gzip.compress(reports['db0/awrrpt_0.html']))
+    pool = RecordingPool()
+    monkeypatch.setattr(cache, 'parse_pool', lambda: pool)
+    report_cache.clear()
+
+    parsed = list(parse_many([('upload', buf.getvalue(), 'reports.zip')]))
+    pool.shutdown()
+
+    assert [p.error for p in parsed] == [None] * 4
+    by_member = {p.member: p for p in parsed}
+    for name, data in reports.items():
+        assert by_member[name].digest == content_hash(data)
+        assert by_member[name].result['info']['db_name'] == name[:3].upper()
+    # The gzipped copy is hashed by its decompressed bytes
+    assert by_member['db3/awrrpt_3.html.gz'].digest == content_hash(reports['db0/awrrpt_0.html'])
+    with zipfile.ZipFile(buf) as zf:
+        expected = sorted((zf.read(member), member) for member in by_member)
+    assert sorted(pool.submitted) == expected
+
+
+def _size(value):
+    return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def test_memory_tier_evicts_least_recently_used_by_size():
+    value = 'x' * 1000
+    rc = ReportCache(max_bytes=3 * _size(value))
+    for key in 'abc':
+        rc.put(key, value)
+    assert rc.get('a') == value  # now the most recently used
+    rc.put('d', value)
+    assert len(rc) == 3 and rc.size_bytes == 3 * _size(value)
+    assert rc.get('b') is None
+    assert all(rc.get(key) == value for key in 'acd')
+    assert (rc.hits, rc.misses) == (4, 1)
+    rc.put('big', 'x' * 10000)  # larger than the whole tier: not kept in memory
+    assert rc.get('big') is None and len(rc) == 3
+
+
+def test_disk_tier_survives_restarts_and_drops_bad_files(tmp_path):
+    key = report_key(b'report')
+    ReportCache(disk_dir=str(tmp_path)).put(key, {'metrics': 1})
+    rc = ReportCache(disk_dir=str(tmp_path))
+    assert rc.get(key) == {'metrics': 1} and rc.hits == 1
+
+    broken = report_key(b'other')
+    (tmp_path / f'{broken}.pkl').write_bytes(b'not a pickle')
+    assert rc.get(broken) is None and rc.misses == 1
+    assert not (tmp_path / f'{broken}.pkl').exists()
+
+
+def test_disk_tier_drops_old_parser_versions_and_oldest_files(tmp_path, monkeypatch):
+    old = report_key(b'report')
+    ReportCache(disk_dir=str(tmp_path)).put(old, 'old result')
+    monkeypatch.setattr(cache, 'PARSER_VERSION', cache.PARSER_VERSION + 1)
+    new = report_key(b'report')
+    assert new != old
+    rc = ReportCache(disk_dir=str(tmp_path), max_disk_bytes=2 * _size('x' * 1000))
+    assert os.listdir(tmp_path) == []
+    assert rc.get(new) is None
+
+    for i, name in enumerate([b'a', b'b', b'c']):
+        rc.put(report_key(name), 'x' * 1000)
+        os.utime(tmp_path / f'{report_key(name)}.pkl', (1000 + i, 1000 + i))
+    assert sorted(os.listdir(tmp_path)) == sorted(f'{report_key(n)}.pkl' for n in (b'b', b'c'))
+
+
+def test_parse_many_yields_in_input_order_and_isolates_errors(monkeypatch):
+    import threading
+
+    first_done = threading.Event()
+    parse_report = cache.parse_report
+
+    def slow_first(data, name=None, member=None, executor=None):
+        # The first report finishes last
+        if name == 'r0.html':
+            first_done.wait(5)
+        result = parse_report(data, name, member, executor)
+        if name == 'r2.html':
+            first_done.set()
+        return result
+
+    pool = RecordingPool()
+    monkeypatch.setattr(cache, 'parse_pool', lambda: pool)
+    monkeypatch.setattr(cache, 'parse_report', slow_first)
+    report_cache.clear()
+    html = [generate_report(n_sql=3, seed=40 + i, db_name=f'DB{i}').encode('utf-8') for i in range(3)]
+    reports = [
+        ('r0', html[0], 'r0.html'),
+        ('bad_gz', gzip.compress(html[1])[:10] + b'not deflate data' * 64, 'r1.html.gz'),
+        ('r2', html[2], 'r2.html'),
+        ('bad_zip', b'PK\x03\x04 not a zip archive', 'broken.zip'),
+        ('r1', html[1], 'r1.html'),
+    ]
+    parsed = list(parse_many(reports))
+    pool.shutdown()
+
+    assert [p.key for p in parsed] == ['r0', 'bad_gz', 'r2', 'bad_zip', 'r1']
+    errors = {p.key: p.error for p in parsed}
+    assert errors['bad_gz'] and errors['bad_zip']
+    assert [p.result['info']['db_name'] for p in parsed if not p.error] == ['DB0', 'DB2', 'DB1']
+
+    # Cached now: the same order without a worker
+    monkeypatch.setattr(cache, 'parse_pool', None)
+    assert [p.key for p in parse_many(reports)] == ['r0', 'bad_gz', 'r2', 'bad_zip', 'r1']
+
+
+def test_parse_pool_is_rebuilt_once_broken(monkeypatch):
+    import concurrent.futures
+
+    created = []
+
+    class FakePool:
+        _broken = False
+
+        def __init__(self, **kwargs):
+            created.append(self)
+
+    monkeypatch.setattr(concurrent.futures, 'ProcessPoolExecutor', FakePool)
+    monkeypatch.setattr(cache, '_pool', None)
+    pool = cache.parse_pool()
+    assert cache.parse_pool() is pool
+    pool._broken = 'A child process terminated abruptly'
+    rebuilt = cache.parse_pool()
+    assert rebuilt is not pool and created == [pool, rebuilt]
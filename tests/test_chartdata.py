@@ -0,0 +1,79 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from chartdata import OTHER, downsample, lttb, top_n
+
+
+def reference_lttb(x, y, n_out):
+    """LTTB as published by Steinarsson (2013), one point at a time."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return list(range(n))
+    every = (n - 2) / (n_out - 2)
+    keep = [0]
+    a = 0
+    for i in range(n_out - 2):
+        start = int(math.floor((i + 1) * every)) + 1
+        end = min(int(math.floor((i + 2) * every)) + 1, n)
+        avg_x = sum(x[start:end]) / (end - start)
+        avg_y = sum(y[start:end]) / (end - start)
+        lo = int(math.floor(i * every)) + 1
+        hi = int(math.floor((i + 1) * every)) + 1
+        best, best_area = lo, -1.0
+        for j in range(lo, hi):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        keep.append(best)
+        a = best
+    keep.append(n - 1)
+    return keep
+
+
+@pytest.mark.parametrize('n, n_out', [(10, 3), (100, 7), (1000, 50), (5001, 500), (503, 500)])
+def test_lttb_matches_reference(n, n_out):
+    rng = np.random.default_rng(n)
+    x = np.cumsum(rng.uniform(0.5, 1.5, n))
+    y = np.sin(x / 20) * 100 + rng.normal(0, 10, n)
+    assert list(lttb(x, y, n_out)) == reference_lttb(list(x), list(y), n_out)
+
+
+def _series(n, start='2025-01-01'):
+    times = pd.date_range(start, periods=n, freq='15min')
+    return pd.DataFrame({'Snap Begin': times, 'Value': np.sin(np.arange(n) / 10.0)})
+
+
+def test_downsample_per_series_keeps_endpoints():
+    frame = pd.concat([_series(1000).assign(Metric='a'), _series(300).assign(Metric='b'),
+                       _series(40).assign(Metric='c')], ignore_index=True)
+    reduced = downsample(frame, 'Snap Begin', 'Value', by=['Metric'], max_points=100)
+    for metric, size in (('a', 1000), ('b', 300), ('c', 40)):
+        series = frame[frame['Metric'] == metric]
+        kept = reduced[reduced['Metric'] == metric]
+        assert len(kept) == min(size, 100)
+        assert kept['Snap Begin'].iloc[0] == series['Snap Begin'].iloc[0]
+        assert kept['Snap Begin'].iloc[-1] == series['Snap Begin'].iloc[-1]
+        assert kept['Snap Begin'].is_monotonic_increasing
+
+
+def test_downsample_passes_short_series_through():
+    frame = _series(50)
+    assert downsample(frame, 'Snap Begin', 'Value', max_points=50).equals(frame)
+    assert downsample(frame, 'Snap Begin', 'Value', max_points=80).equals(frame)
+
+
+def test_top_n_folds_the_rest_into_other():
+    frame = pd.DataFrame({'Elapsed Time (s)': [5.0, 50.0, 1.0, 20.0, 2.0],
+                          'Executions': [1.0, 2.0, 3.0, 4.0, 5.0],
+                          'SQL Text': ['e', 'b', 'a', 'd', 'c']},
+                         index=pd.Index(list('vwxyz'), name='SQL ID'))
+    top = top_n(frame, 'Elapsed Time (s)', n=2)
+    assert list(top.index) == ['w', 'y', OTHER]
+    assert top.index.name == 'SQL ID'
+    assert top.loc[OTHER, 'Elapsed Time (s)'] == 8.0
+    assert top.loc[OTHER, 'Executions'] == 9.0
+    assert top['Elapsed Time (s)'].sum() == frame['Elapsed Time (s)'].sum()
+    assert list(top_n(frame, 'Elapsed Time (s)', n=5).index) == list('wyvzx')
@@ -0,0 +1,173 @@
+import io
+import math
+import os
+
+import numpy as np
+import pytest
+
+import legacy_parser
+from conftest import FIXTURES
+from parser import (TopSQL, default_features, extract_metrics, extract_metrics_stream,
+                    extract_metrics_text, extract_report_info, extract_report_info_text,
+                    extract_top_sql, extract_top_sql_text, iter_metrics_stream)
+from synth_awr import generate_report
+
+BUILDERS = ['html.parser', pytest.param('lxml', marks=pytest.mark.skipif(
+    default_features() != 'lxml', reason="lxml is not installed"))]
+
+
+def _fixture(name='awr_small.html'):
+    with open(os.path.join(FIXTURES, name), encoding='utf-8') as fh:
+        return fh.read()
+
+
+@pytest.mark.parametrize('features', BUILDERS)
+def test_extract_metrics_matches_original_on_fixture(features):
+    html_text = _fixture()
+    expected = legacy_parser.extract_metrics(html_text)
+    assert expected
+    assert extract_metrics(html_text, features) == expected
+
+
+@pytest.mark.parametrize('features', BUILDERS)
+@pytest.mark.parametrize('kwargs', [{'seed': 7}, {'filler_sections': 5, 'seed': 11}])
+def test_extract_metrics_matches_original_on_synthetic(features, kwargs):
+    html_text = generate_report(n_sql=30, **kwargs)
+    assert extract_metrics(html_text, features) == legacy_parser.extract_metrics(html_text)
+
+
+def test_default_features_is_used():
+    html_text = _fixture()
+    assert extract_metrics(html_text) == extract_metrics(html_text, default_features())
+
+
+def test_text_top_sql_keeps_entries_after_blank_lines():
+    # Oracle separates the Top SQL entries of a text report with blank lines
+    top = extract_top_sql_text(_fixture('awr_real_layout.txt'))
+    frame = top.to_frame()
+    assert list(frame.index) == ['1u6bk7pvcmkzt', '84h7zwysd6z1s', '6n1110sdv1fwz', '9babjv8yq8ru3']
+    row = frame.loc['84h7zwysd6z1s']
+    assert row['Elapsed Time (s)'] == 3861.2
+    assert row['CPU Time (s)'] == 2772.3
+    assert row['Executions'] == 402
+    assert row['SQL Module'] == 'SQL*Plus'
+    assert row['SQL Text'].startswith('UPDATE INVENTORY')
+    assert frame.loc['9babjv8yq8ru3', 'SQL Module'] == 'app@web01'
+
+
+def test_text_metrics_on_real_layout():
+    metrics = extract_metrics_text(_fixture('awr_real_layout.txt'))
+    assert metrics['snap_duration_seconds'] == 3614.0
+    assert metrics['cpu_cores'] == 32
+    assert metrics['db_cpu_seconds'] == 3.1
+    assert metrics['logons'] == 4.1
+    assert metrics['buffer_cache_hit_ratio'] == 94.79
+    assert metrics['library_hit_pct'] == 98.12
+
+
+# 12c+ header: Instance and Inst Num have a table of their own
+SPLIT_HEADER_HTML = """<html><body>
+<table><tr><th>DB Name</th><th>DB Id</th><th>Unique Name</th><th>Role</th><th>RAC</th></tr>
+<tr><td>PROD</td><td>2841947735</td><td>prod</td><td>PRIMARY</td><td>YES</td></tr></table>
+<table><tr><th>Instance</th><th>Inst Num</th><th>Startup Time</th></tr>
+<tr><td>prod2</td><td>2</td><td>02-Mar-25 04:12</td></tr></table>
+<table><tr><th></th><th>Snap Id</th><th>Snap Time</th><th>Sessions</th></tr>
+<tr><td>Begin Snap:</td><td>40211</td><td>14-Mar-25 09:00:07</td><td>412</td></tr>
+<tr><td>End Snap:</td><td>40212</td><td>14-Mar-25 10:00:21</td><td>437</td></tr></table>
+</body></html>"""
+
+SPLIT_HEADER_INFO = {'db_name': 'PROD', 'instance': 'prod2',
+                     'snap_begin': '2025-03-14 09:00:07', 'snap_end': '2025-03-14 10:00:21'}
+
+
+def test_report_info_reads_split_instance_table():
+    assert extract_report_info(SPLIT_HEADER_HTML) == SPLIT_HEADER_INFO
+
+
+def test_text_report_info_reads_split_instance_table():
+    assert extract_report_info_text(_fixture('awr_real_layout.txt')) == SPLIT_HEADER_INFO
+
+
+def test_report_info_reads_instance_from_db_name_table():
+    html_text = generate_report(n_sql=2, seed=1, instance='orcl2')
+    assert extract_report_info(html_text)['instance'] == 'orcl2'
+    text = generate_report(n_sql=2, seed=1, instance='orcl2', fmt='text')
+    assert extract_report_info_text(text)['instance'] == 'orcl2'
+
+
+def _top_sql_section(title, headers, rows):
+    head = ''.join(f'<th>{h}</th>' for h in headers)
+    body = ''.join('<tr>' + ''.join(f'<td>{c}</td>' for c in row) + '</tr>' for row in rows)
+    return f'<h3>{title}</h3><table><tr>{head}</tr>{body}</table>'
+
+
+TOP_SQL_HTML = '<html><body>' + _top_sql_section(
+    'SQL ordered by Elapsed Time',
+    ['Elapsed Time (s)', 'Executions', '%Total', 'SQL Id', 'SQL Module', 'SQL Text'],
+    [['1,200.5', '40', '30.1', 'aaaaaaaaaaaaa', 'app@web01', 'select 1'],
+     ['300.0', '7', '7.5', 'bbbbbbbbbbbbb', 'SQL*Plus', 'update t'],
+     ['99.0', '3', 'ccccccccccccc', 'short row']]) + _top_sql_section(
+    'SQL ordered by CPU Time',
+    ['CPU Time (s)', 'Executions', 'Elapsed Time (s)', 'SQL Id', 'SQL Module', 'SQL Text'],
+    [['250.0', '7', '300.0', 'bbbbbbbbbbbbb', 'SQL*Plus', 'update t'],
+     ['80.0', '12', '95.0', 'ddddddddddddd', 'batch', 'delete from t']]) + '</body></html>'
+
+
+def test_top_sql_merges_sections_by_sql_id():
+    top = extract_top_sql(TOP_SQL_HTML)
+    assert top.sql_ids == ['aaaaaaaaaaaaa', 'bbbbbbbbbbbbb', 'ddddddddddddd']
+    frame = top.to_frame()
+    assert frame.loc['bbbbbbbbbbbbb', 'Elapsed Time (s)'] == 300.0
+    assert frame.loc['bbbbbbbbbbbbb', 'CPU Time (s)'] == 250.0
+    assert frame.loc['aaaaaaaaaaaaa', 'Elapsed Time (s)'] == 1200.5
+    assert frame.loc['ddddddddddddd', 'SQL Text'] == 'delete from t'
+
+
+def test_top_sql_leaves_values_a_section_lacks_nan():
+    top = extract_top_sql(TOP_SQL_HTML)
+    row = top.index['aaaaaaaaaaaaa']
+    # Only the Elapsed Time section lists it, and no section has Buffer Gets
+    assert math.isnan(top.column('CPU Time (s)')[row])
+    assert all(math.isnan(v) for v in top.column('Buffer Gets'))
+    assert top.column('Executions')[row] == 40
+
+
+def test_top_sql_skips_rows_that_do_not_match_the_header():
+    top = extract_top_sql(TOP_SQL_HTML)
+    assert 'ccccccccccccc' not in top.index
+    assert len(top) == 3
+
+
+def test_top_sql_to_frame_shares_the_numeric_buffers():
+    top = extract_top_sql(TOP_SQL_HTML)
+    frame = top.to_frame()
+    for name in TopSQL.NUMERIC_COLUMNS:
+        assert np.shares_memory(frame[name].to_numpy(), np.frombuffer(top.numeric[name]))
+    top.numeric['Executions'][0] = 41
+    assert frame['Executions'].iloc[0] == 41
+    assert len(TopSQL().to_frame()) == 0
+
+
+# No host table: the CPU count comes from the "CPUs:" regex fallback. The
+# label, the run of blanks after it and the em dash (3 bytes in UTF-8) are
+# all cut by small chunks.
+CPU_FALLBACK_HTML = ('<html><body><p>Host dbnode02 \u2014 CPUs:' + ' ' * 100 + '24  Memory: 64 GB</p>'
+                     '<table><tr><th>Statistic</th><th>Per Second</th></tr>'
+                     '<tr><td>Logons:</td><td>4.1</td></tr>'
+                     '<tr><td>User calls:</td><td>1,611.4</td></tr></table></body></html>')
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 64])
+@pytest.mark.parametrize('source', ['fixture', 'synthetic', 'cpu_fallback'])
+def test_extract_metrics_stream_matches_tree_parse(source, chunk_size):
+    html_text = {'fixture': _fixture, 'synthetic': lambda: generate_report(n_sql=5, seed=3),
+                 'cpu_fallback': lambda: CPU_FALLBACK_HTML}[source]()
+    expected = extract_metrics(html_text)
+    if source == 'cpu_fallback':
+        assert expected['cpu_cores'] == 24
+    data = html_text.encode('utf-8')
+    assert extract_metrics_stream(io.BytesIO(data), chunk_size=chunk_size) == expected
+    # Text streams too, and every pair is yielded in the order of the rows
+    assert extract_metrics_stream(io.StringIO(html_text), chunk_size=chunk_size) == expected
+    pairs = list(iter_metrics_stream(io.BytesIO(data), chunk_size=chunk_size))
+    assert pairs == list(iter_metrics_stream(io.BytesIO(data), chunk_size=len(data)))
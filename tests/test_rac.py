@@ -0,0 +1,43 @@
+from cache import parse_report
+from rac import CLUSTER_INSTANCE, cluster_aggregates, snapshot_rows
+from store import MetricStore
+from synth_awr import generate_report
+
+GLOBAL = generate_report(n_sql=5, seed=4, instances=3).encode('utf-8')
+SINGLE = generate_report(n_sql=5, seed=4).encode('utf-8')
+
+
+def test_global_report_rows():
+    parsed = parse_report(GLOBAL)
+    instances = parsed['instances']
+    rows = snapshot_rows(parsed['metrics'], parsed['info'], instances)
+
+    (cluster_info, cluster), *nodes = rows
+    assert cluster_info['instance'] == CLUSTER_INSTANCE
+    # Only the aggregates: the flat metrics of a global report mix nodes
+    assert cluster == cluster_aggregates(instances)
+    assert 'hard_parses' not in cluster
+    assert [info['instance'] for info, _ in nodes] == list(instances['instance'])
+    for (info, metrics), (_, node) in zip(nodes, instances.iterrows()):
+        assert info['snap_begin'] == parsed['info']['snap_begin']
+        assert metrics['physical_reads'] == node['physical_reads']
+        assert 'instance' not in metrics and 'host' not in metrics
+
+
+def test_single_instance_report_is_one_row():
+    parsed = parse_report(SINGLE)
+    assert snapshot_rows(parsed['metrics'], parsed['info'], parsed['instances']) == [
+        (parsed['info'], parsed['metrics'])]
+
+
+def test_global_report_stored_per_instance():
+    parsed = parse_report(GLOBAL)
+    rows = snapshot_rows(parsed['metrics'], parsed['info'], parsed['instances'])
+    store = MetricStore()
+    assert len(store.ingest_rows('digest', rows, source='g.html')) == 4
+    assert store.ingest_rows('digest', rows, source='g.html') == []
+    assert sorted(instance for _, instance in store.databases()) == [
+        CLUSTER_INSTANCE, 'orcl1', 'orcl2', 'orcl3']
+    cluster = store.load_batch('ORCL', instance=CLUSTER_INSTANCE)
+    assert len(cluster) == 1
+    assert cluster.column('physical_reads')[0] == rows[0][1]['physical_reads']
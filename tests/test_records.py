@@ -0,0 +1,43 @@
+import math
+import pickle
+
+import numpy as np
+
+from records import METRIC_FIELDS, MetricBatch, MetricRecord
+
+
+def test_record_behaves_like_dict():
+    record = MetricRecord({'logons': 5, 'physical_reads': 1.5, 'not_a_metric': 1,
+                           'top_wait_event': 'x'})
+    assert dict(record) == {'physical_reads': 1.5, 'logons': 5.0}
+    assert record.get('user_calls') is None and 'user_calls' not in record
+    assert pickle.loads(pickle.dumps(record)) == record
+
+
+def test_to_frame_shares_memory_and_names_levels():
+    batch = MetricBatch.from_records([{'logons': 1}, {'logons': 2}],
+                                     keys=[('2025-01-01', 'orcl1'), ('2025-01-01', 'orcl2')])
+    frame = batch.to_frame(names=['Snap Begin', 'Instance'])
+    assert list(frame.index.names) == ['Snap Begin', 'Instance']
+    assert list(frame['logons']) == [1, 2]
+    batch.column('logons')[0] = 9
+    assert frame['logons'].iloc[0] == 9
+
+
+def test_to_frame_of_empty_batch():
+    frame = MetricBatch().to_frame(names=['Snap Begin', 'Instance'])
+    assert frame.empty
+    assert list(frame.index.names) == ['Snap Begin', 'Instance']
+    assert list(frame.columns) == list(METRIC_FIELDS)
+    assert frame.reset_index().columns[:2].tolist() == ['Snap Begin', 'Instance']
+
+
+def test_append_grows_and_keeps_unset_as_nan():
+    batch = MetricBatch(capacity=1)
+    for i in range(5):
+        batch.append({'logons': i} if i % 2 else {})
+    assert len(batch) == 5 and batch.keys == [0, 1, 2, 3, 4]
+    logons = batch.column('logons')
+    assert list(logons[1::2]) == [1, 3] and all(math.isnan(v) for v in logons[::2])
+    assert batch.values.shape == (5, len(METRIC_FIELDS))
+    assert np.isnan(batch.to_structured()['user_calls']).all()
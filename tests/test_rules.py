@@ -0,0 +1,67 @@
+import random
+
+import pandas as pd
+
+from rac import instance_recommendations
+from records import MetricBatch
+from rules import (NO_ISSUES, RULES, generate_recommendations, generate_recommendations_batch,
+                   severity)
+
+
+def _random_metrics(rng):
+    """Metrics around each rule's threshold, some missing, some NaN."""
+    metrics = {}
+    for rule in RULES:
+        roll = rng.random()
+        if roll < 0.15:
+            continue
+        if isinstance(rule.default, str):
+            metrics[rule.metric] = rng.choice([rule.threshold, "DB CPU", "log file sync"])
+        elif roll < 0.2:
+            metrics[rule.metric] = float('nan')
+        else:
+            base = 10 if hasattr(rule.threshold, 'metric') else rule.threshold
+            metrics[rule.metric] = rng.choice([base, base * rng.uniform(0.5, 1.5), 0])
+    metrics['user_rollbacks'] = rng.choice([0, 5, 50])
+    return metrics
+
+
+def _per_row(rows):
+    # The batch path reads NaN as missing, as MetricRecord does
+    return [generate_recommendations({k: v for k, v in m.items() if v == v}) for m in rows]
+
+
+def test_batch_matches_per_row():
+    rng = random.Random(0)
+    rows = [_random_metrics(rng) for _ in range(300)] + [{}]
+    batch = generate_recommendations_batch(pd.DataFrame(rows))
+    assert list(batch) == _per_row(rows)
+
+
+def test_batch_matches_per_row_on_metric_batch():
+    rng = random.Random(1)
+    rows = [{k: v for k, v in _random_metrics(rng).items() if not isinstance(v, str)}
+            for _ in range(100)]
+    records = MetricBatch.from_records(rows)
+    # The batch holds only METRIC_FIELDS, so compare with its own records
+    expected = [generate_recommendations(record) for record in records]
+    assert list(generate_recommendations_batch(records)) == expected
+
+
+def test_empty_batch():
+    assert generate_recommendations_batch(pd.DataFrame()).empty
+
+
+def test_severity():
+    for rule in RULES:
+        assert severity(rule.message) == rule.severity
+        assert severity(f"orcl2 (host2): {rule.message}") == rule.severity
+    assert severity(NO_ISSUES) is None
+    assert severity("🔧 Excessive hard parsing. Check bind variables or use CURSOR_SHARING=FORCE.") == 'warning'
+
+
+def test_instance_recommendations_keep_severity():
+    frame = pd.DataFrame({'instance': ['orcl1', 'orcl2'], 'host': ['h1', 'h2'],
+                          'hard_parses': [500.0, 1.0]}, index=[1, 2])
+    recs = instance_recommendations(frame)
+    assert recs and all(severity(rec) == 'warning' for rec in recs)
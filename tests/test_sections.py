@@ -0,0 +1,55 @@
+import io
+
+import pytest
+
+from sections import _HEADING, SectionIndex
+from synth_awr import generate_report
+
+
+class SplitReader(io.RawIOBase):
+    """Returns ``data`` in two reads, split at ``offset``, then EOF."""
+
+    def __init__(self, data, offset):
+        self.parts = [data[:offset], data[offset:]]
+
+    def read(self, size=-1):
+        while self.parts:
+            part = self.parts.pop(0)
+            if part:
+                return part
+        return b''
+
+
+REPORT = generate_report(n_sql=10, seed=5).encode('utf-8')
+HEADINGS = list(_HEADING.finditer(REPORT))
+
+
+def _sections(index):
+    return [(s.title, index.slice(s)) for s in index.sections]
+
+
+@pytest.mark.parametrize('heading', [HEADINGS[0], HEADINGS[len(HEADINGS) // 2], HEADINGS[-1]],
+                         ids=['first', 'middle', 'last'])
+@pytest.mark.parametrize('keep', [None, ('SQL ordered by',)])
+def test_from_stream_boundary_at_every_offset_around_heading(heading, keep):
+    full = SectionIndex(REPORT)
+    if keep is None:
+        expected = _sections(full)
+    else:
+        expected = [(s.title, full.slice(s)) for s in full.find(*keep)]
+    assert expected
+    for offset in range(heading.start() - 3, heading.end() + 4):
+        # chunk_size larger than the report, so the only boundary is the split
+        index = SectionIndex.from_stream(SplitReader(REPORT, offset), keep=keep,
+                                         chunk_size=len(REPORT) + 1)
+        assert _sections(index) == expected, offset
+        assert index.header() == full.header(), offset
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 7, 64, 4096])
+def test_from_stream_with_small_chunks(chunk_size):
+    full = SectionIndex(REPORT)
+    expected = [(s.title, full.slice(s)) for s in full.find('SQL ordered by', 'Load Profile')]
+    index = SectionIndex.from_stream(io.BytesIO(REPORT), keep=('SQL ordered by', 'Load Profile'),
+                                     chunk_size=chunk_size)
+    assert _sections(index) == expected
@@ -0,0 +1,80 @@
+import gzip
+import io
+import zipfile
+
+import pytest
+
+from cache import content_hash, parse_report, report_digest
+from store import MetricStore
+from synth_awr import generate_report
+
+HTML = generate_report(n_sql=10, seed=2).encode('utf-8')
+TEXT = generate_report(n_sql=10, seed=2, fmt='text').encode('utf-8')
+
+
+def _zip(name, data):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(name, data)
+    return buf.getvalue()
+
+
+UPLOADS = [
+    (HTML, 'awrrpt_1.html', None),
+    (gzip.compress(HTML), 'awrrpt_1.html.gz', None),
+    (_zip('awr/awrrpt_1.html', HTML), 'reports.zip', 'awr/awrrpt_1.html'),
+    (_zip('awrrpt_1.html.gz', gzip.compress(HTML)), 'nested.zip', 'awrrpt_1.html.gz'),
+]
+
+
+def test_report_digest_ignores_packaging():
+    digests = {report_digest(data, content_hash(data), name, member) for data, name, member in UPLOADS}
+    assert digests == {content_hash(HTML)}
+
+
+def test_same_report_from_any_file_is_stored_once():
+    store = MetricStore()
+    stored = []
+    for data, name, member in UPLOADS + [(TEXT, 'awrrpt_1.txt', None)]:
+        parsed = parse_report(data, name, member)
+        stored.append(store.ingest(report_digest(data, None, name, member), parsed['metrics'],
+                                   parsed['info'], source=name))
+    assert stored == [True, False, False, False, False]
+    assert len(store.load_batch('ORCL')) == 1
+
+
+def test_load_batch_bounds():
+    store = MetricStore()
+    for day in range(1, 6):
+        for instance in ('orcl1', 'orcl2'):
+            info = {'db_name': 'ORCL', 'instance': instance,
+                    'snap_begin': f'2025-01-0{day} 10:00:00', 'snap_end': f'2025-01-0{day} 10:30:00'}
+            store.ingest(f'{day}{instance}', {'logons': day, 'physical_reads': 100.0 * day}, info)
+
+    batch = store.load_batch('ORCL', start='2025-01-02 00:00:00', end='2025-01-03 23:59:59')
+    assert batch.keys == [('2025-01-02 10:00:00', 'orcl1'), ('2025-01-02 10:00:00', 'orcl2'),
+                          ('2025-01-03 10:00:00', 'orcl1'), ('2025-01-03 10:00:00', 'orcl2')]
+    assert list(batch.column('logons')) == [2, 2, 3, 3]
+    assert list(batch.column('physical_reads')) == [200, 200, 300, 300]
+
+    batch = store.load_batch('ORCL', start='2025-01-04 00:00:00', instance='orcl2')
+    assert batch.keys == [('2025-01-04 10:00:00', 'orcl2'), ('2025-01-05 10:00:00', 'orcl2')]
+    assert list(batch.column('logons')) == [4, 5]
+
+    batch = store.load_batch('ORCL', instance='orcl1', last=3)
+    assert batch.keys == [('2025-01-03 10:00:00', 'orcl1'), ('2025-01-04 10:00:00', 'orcl1'),
+                          ('2025-01-05 10:00:00', 'orcl1')]
+    assert list(batch.column('logons')) == [3, 4, 5]
+    assert len(store.load_batch('ORCL', end='2025-01-02 23:59:59', last=3)) == 3
+
+
+def test_report_without_snapshot_times_is_rejected():
+    store = MetricStore()
+    info = {'db_name': 'ORCL', 'instance': 'orcl1', 'snap_begin': '2025-01-16 11:00:26',
+            'snap_end': None}
+    with pytest.raises(ValueError, match='snap_end'):
+        store.ingest('h1', {'logons': 5.0}, info)
+    with pytest.raises(ValueError, match='snap_begin'):
+        store.ingest_rows('h2', [({**info, 'snap_end': '2025-01-16 11:30:26'}, {'logons': 5.0}),
+                                 ({**info, 'snap_begin': None}, {'logons': 5.0})])
+    assert store.revision('ORCL') == (0, None)
@@ -0,0 +1,107 @@
+import gzip
+import hashlib
+import json
+import lzma
+import os
+import zipfile
+
+from synth_awr import generate_report
+from watch import JsonlSink, Manifest, Watcher, process_file
+
+
+def test_manifest_keys_are_resolved(tmp_path, monkeypatch):
+    report = tmp_path / 'awr' / 'awrrpt_1.html'
+    report.parent.mkdir()
+    report.write_text('<html></html>')
+    os.symlink(report.parent, tmp_path / 'link')
+    monkeypatch.chdir(tmp_path)
+
+    manifest = Manifest(str(tmp_path / 'manifest.jsonl'))
+    manifest.record('awr/awrrpt_1.html', report.stat(), 'abc')
+    for spelling in (str(report), 'awr/../awr/awrrpt_1.html', str(tmp_path / 'link' / 'awrrpt_1.html')):
+        assert not manifest.changed(spelling, report.stat())
+        assert manifest.known_hash(spelling) == 'abc'
+    manifest.close()
+
+    reopened = Manifest(str(tmp_path / 'manifest.jsonl'))
+    assert len(reopened) == 1 and reopened.known_hash('./awr/awrrpt_1.html') == 'abc'
+    reopened.close()
+
+
+def test_watcher_skips_files_ingested_under_another_spelling(tmp_path, monkeypatch):
+    (tmp_path / 'awr').mkdir()
+    (tmp_path / 'awr' / 'awrrpt_1.html').write_text(generate_report(n_sql=5, seed=1))
+    monkeypatch.chdir(tmp_path)
+    out = tmp_path / 'out.jsonl'
+
+    for directory in ('awr', str(tmp_path / 'awr')):
+        manifest = Manifest(str(tmp_path / 'manifest.jsonl'))
+        sink = JsonlSink(str(out))
+        Watcher(directory, sink, manifest, workers=1, settle=0, log=lambda message: None).run(once=True)
+        manifest.close()
+        sink.close()
+
+    rows = [json.loads(line) for line in out.read_text().splitlines()]
+    assert len(rows) == 1 and rows[0]['error'] is None
+
+
+def crash_on_bad(path, known_hash=None):
+    # Stands in for a worker killed mid-file, e.g. by the OOM killer
+    if 'bad' in os.path.basename(path):
+        os._exit(1)
+    return process_file(path, known_hash)
+
+
+def test_dead_worker_is_replaced_and_the_file_skipped(tmp_path):
+    awr = tmp_path / 'awr'
+    awr.mkdir()
+    for i in range(4):
+        (awr / f'awrrpt_{i}.html').write_text(generate_report(n_sql=5, seed=i, db_name=f'DB{i}'))
+    (awr / 'awrrpt_bad.html').write_text(generate_report(n_sql=5, seed=9))
+    out = tmp_path / 'out.jsonl'
+    messages = []
+
+    def run():
+        manifest = Manifest(str(tmp_path / 'manifest.jsonl'))
+        sink = JsonlSink(str(out))
+        Watcher(str(awr), sink, manifest, workers=2, settle=0, log=messages.append,
+                process=crash_on_bad).run(once=True)
+        manifest.close()
+        sink.close()
+        return Manifest(str(tmp_path / 'manifest.jsonl'))
+
+    manifest = run()
+    rows = [json.loads(line) for line in out.read_text().splitlines()]
+    assert sorted(row['db_name'] for row in rows) == ['DB0', 'DB1', 'DB2', 'DB3']
+    assert len(manifest) == 5
+    bad = manifest.get(str(awr / 'awrrpt_bad.html'))
+    assert bad['skipped'] and bad['hash'] is None
+    manifest.close()
+
+    # Skipped until it changes, so a restart does not hit it again
+    messages.clear()
+    run().close()
+    assert len(out.read_text().splitlines()) == 4
+    assert not any('died' in message for message in messages)
+
+
+def test_process_file_decompresses_each_report_once(tmp_path, monkeypatch):
+    import archives
+
+    html = generate_report(n_sql=5, seed=6).encode('utf-8')
+    (tmp_path / 'a.html.gz').write_bytes(gzip.compress(html))
+    (tmp_path / 'a.html.xz').write_bytes(lzma.compress(html))
+    with zipfile.ZipFile(tmp_path / 'bundle.zip', 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('a.html', html)
+        zf.writestr('b.html.gz', gzip.compress(html))
+    opened = []
+    decompress = archives.decompress
+    monkeypatch.setattr(archives, 'decompress',
+                        lambda fileobj, name: opened.append(name) or decompress(fileobj, name))
+
+    for name, reports in (('a.html.gz', 1), ('a.html.xz', 1), ('bundle.zip', 2)):
+        opened.clear()
+        _, results = process_file(str(tmp_path / name))
+        assert [r['error'] for r in results] == [None] * reports
+        assert [r['hash'] for r in results] == [hashlib.sha256(html).hexdigest()] * reports
+        assert len(opened) == reports
@@ -0,0 +1,409 @@
+"""
+Watch a directory and ingest AWR reports as collectors drop them there.
+
+    python watch.py /data/awr --store awr_metrics.db
+    python watch.py /data/awr --jsonl fleet.jsonl --interval 60 --workers 4
+
+The directory is rescanned every ``--interval`` seconds. A manifest records
+the size, mtime and content hash of every file already ingested, so only new
+or changed files are parsed, and a restart picks up where the last run
+stopped instead of re-parsing everything. Files are parsed in a bounded pool
+of worker processes; when it is busy the scan waits for a slot rather than
+queueing the whole backlog. Results go to the metric store used by the app's
+Trends view, or to a JSONL file.
+"""
+import argparse
+import hashlib
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from datetime import datetime
+
+from archives import archive_members, index_report, is_compressed
+from batch import BATCH_SECTIONS, analyze_index, find_reports
+from parser import extract_report_info_indexed
+from rac import snapshot_rows
+
+DEFAULT_MANIFEST = 'awr_watch_manifest.jsonl'
+# A file whose worker dies this many times when parsed on its own is skipped
+MAX_WORKER_DEATHS = 2
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """``cache.content_hash`` of a file's bytes, read in chunks."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def process_file(path, known_hash=None):
+    """
+    Parse every report in ``path`` (the file itself, or each member of a zip
+    archive). Returns ``(hash, results)``; ``results`` is None when the
+    content hash equals ``known_hash``, i.e. the file was only touched.
+    Errors are returned per report, not raised.
+    """
+    digest = file_hash(path)
+    if digest == known_hash:
+        return digest, None
+    try:
+        members = archive_members(path)
+    except Exception as e:
+        return digest, [{'member': None, 'hash': digest, 'error': f"{type(e).__name__}: {e}"}]
+    results = []
+    for member in members:
+        result = {'member': member, 'hash': digest, 'error': None}
+        try:
+            # A compressed report is identified by its decompressed bytes,
+            # hashed while it is indexed
+            hasher = hashlib.sha256() if is_compressed(path) else None
+            index = index_report(path, member=member, keep=BATCH_SECTIONS, hasher=hasher)
+            if hasher is not None:
+                result['hash'] = hasher.hexdigest()
+            metrics, recs, instances = analyze_index(index)
+            info = extract_report_info_indexed(index)
+            result.update(metrics=metrics, info=info, recommendations=recs,
+                          instances=len(instances) if instances is not None else None,
+                          rows=snapshot_rows(metrics, info, instances))
+        except Exception as e:
+            result['error'] = f"{type(e).__name__}: {e}"
+        results.append(result)
+    return digest, results
+
+
+class Manifest:
+    """
+    Files already ingested, ``path -> {'size', 'mtime', 'hash', 'reports',
+    'errors'}``.
+
+    Kept as an append-only JSONL log in which the last line for a path wins,
+    so finishing a file costs one short write and a crash loses at most the
+    files that were in flight. The log is compacted when it is opened.
+    Paths are stored resolved (``os.path.realpath``), so the same directory
+    given another way (relative, through a symlink) is not ingested again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as fh:
+                for line in fh:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # a line cut short by a crash
+                    entry['path'] = os.path.realpath(entry['path'])
+                    self.entries[entry['path']] = entry
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as fh:
+                for entry in self.entries.values():
+                    fh.write(json.dumps(entry) + '\n')
+            os.replace(tmp, path)
+        self._fh = open(path, 'a', encoding='utf-8')
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, path):
+        return self.entries.get(os.path.realpath(path))
+
+    def changed(self, path, stat):
+        """True unless ``path`` was ingested with this size and mtime."""
+        entry = self.get(path)
+        return entry is None or entry['size'] != stat.st_size or entry['mtime'] != stat.st_mtime
+
+    def known_hash(self, path):
+        entry = self.get(path)
+        return entry['hash'] if entry else None
+
+    def record(self, path, stat, digest, reports=0, errors=0, skipped=None):
+        """
+        Record ``path`` as done with this size and mtime. ``skipped`` gives
+        the reason a file was given up on rather than ingested; it is not
+        tried again until it changes.
+        """
+        path = os.path.realpath(path)
+        entry = {'path': path, 'size': stat.st_size, 'mtime': stat.st_mtime, 'hash': digest,
+                 'reports': reports, 'errors': errors,
+                 'ingested_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+        if skipped:
+            entry['skipped'] = skipped
+        self.entries[path] = entry
+        self._fh.write(json.dumps(entry) + '\n')
+        self._fh.flush()
+
+    def close(self):
+        self._fh.close()
+
+
+class StoreSink:
+    """
+    Writes reports to a store.MetricStore, global reports as a cluster row
+    and one row per node; reports it already has are skipped.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def write(self, path, result):
+        if result['error']:
+            return False
+        source = path if result['member'] is None else f"{path}:{result['member']}"
+        return bool(self.store.ingest_rows(result['hash'], result['rows'], source=source))
+
+    def close(self):
+        self.store.close()
+
+
+class JsonlSink:
+    """Appends one JSON row per report, with the columns of a batch.py row plus the report info."""
+
+    def __init__(self, path):
+        self._fh = open(path, 'a', encoding='utf-8')
+
+    def write(self, path, result):
+        row = {'file': path, 'member': result['member'], 'hash': result['hash'],
+               'error': result['error']}
+        if not result['error']:
+            row.update(result['info'])
+            if result['instances'] is not None:
+                row['instances'] = result['instances']
+            row.update(result['metrics'])
+            row['recommendations'] = ' | '.join(result['recommendations'])
+        self._fh.write(json.dumps(row) + '\n')
+        self._fh.flush()
+        return True
+
+    def close(self):
+        self._fh.close()
+
+
+def _worker_init():
+    # Stopping is the watcher's job: workers finish their file and exit when
+    # the pool shuts down, rather than dying mid-file on a terminal's Ctrl-C
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+
+def _log(message):
+    print(f"{datetime.now():%Y-%m-%d %H:%M:%S} {message}", file=sys.stderr)
+
+
+class Watcher:
+    """
+    Ingests new and changed reports under ``directory`` into ``sink``.
+
+    At most ``max_pending`` files (default twice the workers) are submitted
+    to the pool at a time; the scan blocks until one finishes. Files modified
+    less than ``settle`` seconds ago may still be being written and are left
+    for a later scan.
+
+    A worker that dies (e.g. killed for memory on a huge report) breaks the
+    whole pool. The pool is then replaced and the files that were in flight
+    are retried one at a time, so the file that killed it is identified; after
+    MAX_WORKER_DEATHS deaths on its own it is recorded as skipped.
+    """
+
+    def __init__(self, directory, sink, manifest, workers=None, interval=30, settle=10,
+                 max_pending=None, log=_log, process=process_file):
+        self.directory = directory
+        self.sink = sink
+        self.manifest = manifest
+        self.workers = workers or os.cpu_count() or 1
+        self.interval = interval
+        self.settle = settle
+        self.max_pending = max_pending or 2 * self.workers
+        self.log = log
+        self.process = process
+        self.stop = threading.Event()
+        self._pool = None
+        self._pending = {}  # future -> (path, stat, alone)
+        self._suspects = {}  # path -> stat of files in flight when a worker died
+        self._deaths = {}  # path -> worker deaths while parsed alone
+
+    def _new_pool(self):
+        from concurrent.futures import ProcessPoolExecutor
+
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_worker_init)
+
+    def _submit(self, path, stat, alone=False):
+        from concurrent.futures.process import BrokenProcessPool
+
+        args = (path, self.manifest.known_hash(path))
+        try:
+            future = self._pool.submit(self.process, *args)
+        except BrokenProcessPool:
+            self._new_pool()
+            future = self._pool.submit(self.process, *args)
+        self._pending[future] = (path, stat, alone)
+
+    def _finish(self, future):
+        from concurrent.futures.process import BrokenProcessPool
+
+        path, stat, alone = self._pending.pop(future)
+        try:
+            digest, results = future.result()
+        except BrokenProcessPool:
+            self._worker_died(path, stat, alone)
+            return
+        except Exception as e:
+            # Unreadable file; it has no manifest entry, so a later scan retries it
+            self.log(f"{path} ERROR {type(e).__name__}: {e}")
+            return
+        self._deaths.pop(path, None)
+        if results is None:
+            self.manifest.record(path, stat, digest, **self._counts(path))
+            return
+        for result in results:
+            try:
+                self.sink.write(path, result)
+            except ValueError as e:  # e.g. a report without snapshot times
+                result['error'] = f"{type(e).__name__}: {e}"
+            if result['error']:
+                name = path if result['member'] is None else f"{path}:{result['member']}"
+                self.log(f"{name} ERROR {result['error']}")
+        errors = sum(1 for r in results if r['error'])
+        self.manifest.record(path, stat, digest, reports=len(results), errors=errors)
+        self.log(f"{path} {len(results) - errors} ok, {errors} failed")
+
+    def _worker_died(self, path, stat, alone):
+        if self._pool._broken:
+            self._new_pool()
+        if not alone:
+            # Any of the files in flight may have killed it
+            self._suspects[path] = stat
+            self.log(f"{path}: a worker died while it was in flight; retrying it on its own")
+            return
+        deaths = self._deaths[path] = self._deaths.get(path, 0) + 1
+        if deaths < MAX_WORKER_DEATHS:
+            self._suspects[path] = stat
+            self.log(f"{path}: worker died ({deaths} of {MAX_WORKER_DEATHS}); retrying")
+            return
+        del self._deaths[path]
+        reason = f"worker died {deaths} times parsing it"
+        self.manifest.record(path, stat, None, errors=1, skipped=reason)
+        self.log(f"{path} SKIPPED: {reason}; it is retried once it changes")
+
+    def _retry_suspects(self):
+        """Parse the files in flight when a worker died, one at a time."""
+        while self._suspects and not self.stop.is_set():
+            while self._pending:
+                self._wait()
+            path = next(iter(self._suspects))
+            self._submit(path, self._suspects.pop(path), alone=True)
+            while self._pending:
+                self._wait()
+
+    def _counts(self, path):
+        entry = self.manifest.get(path) or {}
+        return {'reports': entry.get('reports', 0), 'errors': entry.get('errors', 0)}
+
+    def _wait(self, timeout=None):
+        """Record the files that finish within ``timeout`` seconds (at least one if None)."""
+        from concurrent.futures import FIRST_COMPLETED, wait
+
+        done, _ = wait(list(self._pending), timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            self._finish(future)
+
+    def scan(self):
+        """Submit every new or changed file; returns how many were submitted."""
+        self._retry_suspects()
+        in_flight = {path for path, _, _ in self._pending.values()}
+        submitted = 0
+        now = time.time()
+        for path in find_reports([self.directory]):
+            if self.stop.is_set():
+                break
+            if path in in_flight or path in self._suspects:
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue  # removed since the directory was listed
+            if not self.manifest.changed(path, stat) or now - stat.st_mtime < self.settle:
+                continue
+            # Backpressure: don't queue more than max_pending files
+            while len(self._pending) >= self.max_pending:
+                self._wait()
+            self._submit(path, stat)
+            submitted += 1
+        return submitted
+
+    def run(self, once=False):
+        """Scan until ``stop`` is set (or a single pass with ``once``), then drain the pool."""
+        self.log(f"Watching {self.directory} with {self.workers} workers; "
+                 f"{len(self.manifest)} files in the manifest")
+        self._new_pool()
+        try:
+            while not self.stop.is_set():
+                submitted = self.scan()
+                if submitted:
+                    self.log(f"Queued {submitted} new or changed files")
+                if once:
+                    break
+                # Write results as they finish while waiting for the next scan
+                deadline = time.monotonic() + self.interval
+                while not self.stop.is_set() and time.monotonic() < deadline:
+                    if self._pending:
+                        self._wait(timeout=min(1.0, deadline - time.monotonic()))
+                    else:
+                        self.stop.wait(min(1.0, deadline - time.monotonic()))
+        finally:
+            while self._pending:
+                self._wait()
+            self._retry_suspects()
+            self._pool.shutdown()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Ingest AWR reports from a directory as they arrive.")
+    ap.add_argument('directory', help="Directory the collectors write reports to")
+    sink = ap.add_mutually_exclusive_group()
+    sink.add_argument('--store', help="Metric store (SQLite) to write to "
+                                      "(default: $AWR_STORE_PATH or awr_metrics.db)")
+    sink.add_argument('--jsonl', help="Append one JSON row per report to this file instead")
+    ap.add_argument('--manifest', default=DEFAULT_MANIFEST,
+                    help=f"Manifest of ingested files (default: {DEFAULT_MANIFEST})")
+    ap.add_argument('-w', '--workers', type=int, default=os.cpu_count(),
+                    help="Worker processes (default: CPU count)")
+    ap.add_argument('--interval', type=float, default=30, help="Seconds between scans")
+    ap.add_argument('--settle', type=float, default=10,
+                    help="Skip files modified less than this many seconds ago")
+    ap.add_argument('--once', action='store_true', help="Ingest what is there now and exit")
+    args = ap.parse_args(argv)
+
+    if not os.path.isdir(args.directory):
+        ap.error(f"Not a directory: {args.directory}")
+    if args.jsonl:
+        sink = JsonlSink(args.jsonl)
+    else:
+        from store import MetricStore
+        sink = StoreSink(MetricStore(args.store or os.environ.get('AWR_STORE_PATH', 'awr_metrics.db')))
+    manifest = Manifest(args.manifest)
+    watcher = Watcher(args.directory, sink, manifest, args.workers, args.interval, args.settle)
+
+    def request_stop(signum, frame):
+        _log("Stopping after the files in progress")
+        watcher.stop.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+    try:
+        watcher.run(once=args.once)
+    finally:
+        manifest.close()
+        sink.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())